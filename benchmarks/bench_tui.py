@@ -0,0 +1,411 @@
+"""
+End-to-end latency and throughput benchmarks of the f-fee-tui.
+
+The real App and MasterScreen run headless with Textual's test harness (`App.run_test()`), driven by the stand-in
+for the DPU Processor and the core services (`f_fee_tui.standin`) that runs in a thread of the same process. The
+following is measured:
+
+* latency: the time from publishing a changed DEB mode, AEB state or DTC_IN_MOD value until the widget shows it,
+* command: the time from clicking a button until the command arrives at the stand-in, and until the App has the
+  reply, i.e. through the scheduler, worker and proxy pool of the Commander,
+* throughput: the cycles received and the event loop lag while the cycle rate is increased step by step, the
+  maximum sustained rate is the highest rate at which all cycles arrive and the loop lag stays below 250ms,
+* memory: the resident memory of the process during a long run at a high cycle rate, e.g. 2 minutes at 100x is
+  more than 3 hours of simulated operation.
+
+The results are written to a JSON file, use `--compare` to compare with the results of a previous version:
+
+    $ python benchmarks/bench_tui.py --output results-0.4.0.json --compare results-0.3.0.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+
+from textual.widgets import Button
+
+from f_fee_tui import standin
+from f_fee_tui._version import get_version
+from f_fee_tui.app import FastFEEApp
+from f_fee_tui.metrics import counters
+
+ALL_BENCHMARKS = ("latency", "command", "throughput", "memory")
+
+LAG_THRESHOLD = 0.25
+"""The loop lag [s] from which updates are considered lagging, the same threshold as the watchdog of the App."""
+
+
+def summarize(samples: list) -> dict:
+    """Returns count, mean, p50, p95 and max of the samples [s] in milliseconds."""
+
+    if not samples:
+        return {"count": 0}
+
+    samples = sorted(samples)
+
+    def percentile(fraction):
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1000
+
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.mean(samples) * 1000,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "max_ms": samples[-1] * 1000,
+    }
+
+
+def resident_memory() -> int:
+    """Returns the resident memory [bytes] of this process, the peak value where the current value isn't known."""
+
+    try:
+        with open("/proc/self/statm") as fd:
+            return int(fd.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def wait_until(predicate, timeout: float, interval: float = 0.001):
+    """Returns the time [time.perf_counter()] at which the predicate became True, or None after the timeout."""
+
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return time.perf_counter()
+        await asyncio.sleep(interval)
+    return None
+
+
+async def command(proxy, name: str, *args):
+    """Send a command to the stand-in from the bench itself, i.e. not through the App."""
+    return await asyncio.get_running_loop().run_in_executor(None, lambda: getattr(proxy, name)(*args))
+
+
+async def bench_latency(app, stand_in, proxy, args) -> dict:
+    """Publish-to-widget latency for DEB mode, AEB state and DTC_IN_MOD changes."""
+
+    screen = app.screen
+    stand_in.cycle_time = args.cycle_time
+    timeout = 10 * args.cycle_time + 2.0
+
+    def led(id_):
+        return lambda: screen.query_one(f"#{id_}").state
+
+    def label(id_):
+        return lambda: str(screen.query_one(f"#{id_}").content) != ""
+
+    # Every change is commanded at the stand-in and toggled back, both changes are measured.
+
+    changes = {
+        "deb_mode": (
+            ("deb_set_standby_mode", (), "DEB", led("deb-standby")),
+            ("deb_set_on_mode", (), "DEB", led("deb-on")),
+        ),
+        "aeb_state": (
+            ("aeb_set_config_mode", ("AEB1",), "AEB1", led("aeb1_config")),
+            ("aeb_set_init_mode", ("AEB1",), "AEB1", led("aeb1_init")),
+        ),
+        "dtc_in_mod": (
+            ("set_dtc_in_mod", (0, 2, 0, 0, 0, 0, 0, 0), "DTC_IN_MOD", label("T1-010")),
+            ("set_dtc_in_mod", (0, 0, 0, 0, 0, 0, 0, 0), "DTC_IN_MOD", lambda: not label("T1-010")()),
+        ),
+    }
+
+    await command(proxy, "deb_set_immediate_on")
+    await command(proxy, "deb_set_aeb_power_on", True, False, False, False)
+    await wait_until(led("aeb1_init"), timeout)
+
+    results = {}
+
+    for kind, steps in changes.items():
+        samples = []
+        for idx in range(args.samples):
+            name, command_args, key, shown = steps[idx % 2]
+            before = stand_in.changed_at.get(key)
+            await command(proxy, name, *command_args)
+            if (seen := await wait_until(shown, timeout)) is None or stand_in.changed_at.get(key) == before:
+                print(f"  {kind}: change {idx} was not shown within {timeout:.1f}s", file=sys.stderr)
+                continue
+            samples.append(seen - stand_in.changed_at[key])
+        results[kind] = summarize(samples)
+        print(f"latency {kind}: {results[kind]}")
+
+    return results
+
+
+async def bench_command(app, stand_in, pilot, args) -> dict:
+    """Button-to-DPU and round trip latency of the AEB power commands through the Commander."""
+
+    stand_in.cycle_time = args.cycle_time
+    screen = app.screen
+    screen.action_toggle_commanding()  # commanding is disabled at startup
+    await pilot.pause()
+
+    to_dpu = []
+    round_trip = []
+
+    for idx in range(args.samples):
+        button = "#btn-aeb1-on" if idx % 2 == 0 else "#btn-aeb1-off"
+        received = stand_in.last_command
+        finished = counters["command.finished"]
+
+        # Press the button like a click does, but without the mouse events and the waiting of the pilot.
+
+        start = time.perf_counter()
+        screen.query_one(button, Button).press()
+
+        if await wait_until(lambda: stand_in.last_command is not received, 5.0) is None:
+            print(f"  command {idx} didn't arrive at the stand-in", file=sys.stderr)
+            continue
+        to_dpu.append(stand_in.last_command[0] - start)
+
+        if (done := await wait_until(lambda: counters["command.finished"] > finished, 5.0)) is not None:
+            round_trip.append(done - start)
+
+    screen.action_toggle_commanding()
+
+    results = {"to_dpu": summarize(to_dpu), "round_trip": summarize(round_trip)}
+    print(f"command: {results}")
+
+    return results
+
+
+async def bench_throughput(app, stand_in, args) -> dict:
+    """The received cycles and the loop lag for increasing cycle rates."""
+
+    state = app.screen._monitor.state
+    steps = []
+    sustained = None
+
+    for speed in args.speeds:
+        stand_in.cycle_time = standin.NOMINAL_CYCLE_TIME / speed
+
+        # Let the App catch up with the previous step before measuring.
+
+        await asyncio.sleep(1.0)
+
+        published = counters["standin.cycles"]
+        received = state.cycle
+        frames = counters["standin.frames"]
+        max_lag = 0
+        start = time.perf_counter()
+
+        while time.perf_counter() - start < args.step_duration:
+            await asyncio.sleep(0.1)
+            max_lag = max(max_lag, counters["loop.lag_ms"])
+
+        elapsed = time.perf_counter() - start
+        n_published = counters["standin.cycles"] - published
+        n_frames = counters["standin.frames"] - frames
+
+        # Allow the frames that are on their way to arrive.
+
+        await asyncio.sleep(0.2)
+
+        n_received = state.cycle - received
+
+        step = {
+            "speed": speed,
+            "cycles_per_s": n_published / elapsed,
+            "frames_per_s": n_frames / elapsed,
+            "published": n_published,
+            "received": n_received,
+            "max_lag_ms": max_lag,
+        }
+        step["sustained"] = n_received >= 0.99 * n_published and max_lag < LAG_THRESHOLD * 1000
+        steps.append(step)
+        print(f"throughput: {step}")
+
+        if step["sustained"]:
+            sustained = step
+        else:
+            break
+
+    return {
+        "steps": steps,
+        "max_sustained_speed": sustained and sustained["speed"],
+        "max_sustained_frames_per_s": sustained and sustained["frames_per_s"],
+    }
+
+
+async def bench_memory(app, stand_in, args) -> dict:
+    """The resident memory during a long run, the growth is fitted over the run after the first 10%."""
+
+    stand_in.cycle_time = standin.NOMINAL_CYCLE_TIME / args.soak_speed
+
+    samples = []
+    start = time.perf_counter()
+
+    while (elapsed := time.perf_counter() - start) < args.soak:
+        samples.append((elapsed, resident_memory()))
+        await asyncio.sleep(1.0)
+
+    simulated_hours = args.soak * args.soak_speed / 3600
+    fitted = samples[len(samples) // 10:]
+
+    if len(fitted) >= 2:
+        # The slope of a least-squares fit, in bytes per second of the run.
+        mean_t = statistics.mean(t for t, _ in fitted)
+        mean_m = statistics.mean(m for _, m in fitted)
+        slope = (
+            sum((t - mean_t) * (m - mean_m) for t, m in fitted) / (sum((t - mean_t) ** 2 for t, _ in fitted) or 1)
+        )
+    else:
+        slope = 0.0
+
+    mib = 1 << 20
+    results = {
+        "duration_s": args.soak,
+        "speed": args.soak_speed,
+        "simulated_hours": simulated_hours,
+        "rss_start_mib": samples[0][1] / mib,
+        "rss_end_mib": samples[-1][1] / mib,
+        "rss_max_mib": max(m for _, m in samples) / mib,
+        "growth_mib_per_simulated_hour": slope * 3600 / args.soak_speed / mib,
+    }
+    print(f"memory: {results}")
+
+    return results
+
+
+async def run_benchmarks(args) -> dict:
+
+    stand_in = standin.StandIn(cycle_time=args.cycle_time, hk_size=args.hk_size, churn=args.churn)
+    stand_in.start()
+    standin.use_stand_in()
+
+    proxy = standin.StandInDPUProxy().__enter__()
+
+    results = {}
+
+    try:
+        app = FastFEEApp(decode_processes=args.decode_processes)
+        async with app.run_test(size=(200, 60)) as pilot:
+
+            # Wait for the first cycles, i.e. until the Setup is loaded and the decoders are compiled. The StartupScreen
+            # is shown first, the MasterScreen and its Monitor follow when the egse is imported.
+
+            def receiving():
+                return getattr(app.screen, "_monitor", None) is not None and app.screen._monitor.state.cycle > 2
+
+            if await wait_until(receiving, 30.0) is None:
+                raise RuntimeError("The App doesn't receive any data from the stand-in.")
+
+            if "latency" in args.only:
+                results["latency"] = await bench_latency(app, stand_in, proxy, args)
+            if "command" in args.only:
+                results["command"] = await bench_command(app, stand_in, pilot, args)
+            if "throughput" in args.only:
+                results["throughput"] = await bench_throughput(app, stand_in, args)
+            if "memory" in args.only:
+                results["memory"] = await bench_memory(app, stand_in, args)
+
+            results["counters"] = counters.as_dict()
+    finally:
+        proxy.__exit__(None, None, None)
+        stand_in.stop()
+
+    return results
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """Returns the numeric values of the results with their path, e.g. 'latency.deb_mode.p50_ms'."""
+
+    values = {}
+    for key, value in results.items():
+        if key == "counters":
+            continue
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def compare(previous: dict, current: dict) -> None:
+    """Print the values of the current results next to those of the previous results."""
+
+    old = flatten(previous["results"])
+    new = flatten(current["results"])
+
+    print(f"\n{'':50s} {previous['version']:>12s} {current['version']:>12s}   change")
+    for path in sorted(old.keys() & new.keys()):
+        change = f"{(new[path] - old[path]) / old[path] * 100:+.1f}%" if old[path] else ""
+        print(f"{path:50s} {old[path]:12.3f} {new[path]:12.3f}   {change}")
+
+
+def parse_arguments(argv: list = None) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(
+        description="End-to-end latency and throughput benchmarks of the f-fee-tui against the stand-in.",
+    )
+    parser.add_argument(
+        '--output', default=None,
+        help="the JSON file for the results [default=f-fee-tui-benchmarks-<version>-<time>.json]"
+    )
+    parser.add_argument('--compare', metavar='JSON', default=None, help="compare with the results in this file")
+    parser.add_argument(
+        '--only', default=",".join(ALL_BENCHMARKS), type=lambda value: value.split(","),
+        help=f"a comma separated list of the benchmarks to run [default={','.join(ALL_BENCHMARKS)}]"
+    )
+    parser.add_argument('--samples', type=int, default=20, help="the number of changes or commands to measure")
+    parser.add_argument(
+        '--cycle-time', type=float, default=0.25, help="the cycle time [s] for the latency and command benchmarks"
+    )
+    parser.add_argument(
+        '--speeds', default="1,10,25,50,100,200,400", type=lambda value: [float(x) for x in value.split(",")],
+        help="the speeds, relative to the nominal 2.5s cycle, for the throughput benchmark"
+    )
+    parser.add_argument('--step-duration', type=float, default=5.0, help="the duration [s] of a throughput step")
+    parser.add_argument('--soak', type=float, default=120.0, help="the duration [s] of the memory benchmark")
+    parser.add_argument('--soak-speed', type=float, default=100.0, help="the speed of the memory benchmark")
+    parser.add_argument('--hk-size', type=int, default=256, help="the size of the HK packets of the stand-in")
+    parser.add_argument('--churn', type=float, default=0.1, help="the register map churn of the stand-in")
+    parser.add_argument('--decode-processes', type=int, default=0, help="the decode processes of the App")
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None):
+
+    args = parse_arguments(argv)
+
+    if unknown := set(args.only) - set(ALL_BENCHMARKS):
+        raise SystemExit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    version = get_version() or "unknown"
+    started = time.time()
+
+    results = asyncio.run(run_benchmarks(args))
+
+    report = {
+        "version": version,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "duration_s": time.time() - started,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+
+    filename = args.output or f"f-fee-tui-benchmarks-{version}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(filename, "w") as fd:
+        json.dump(report, fd, indent=2)
+
+    print(f"Results written to {filename}")
+
+    if args.compare:
+        with open(args.compare) as fd:
+            compare(json.load(fd), report)
+
+
+if __name__ == "__main__":
+    main()
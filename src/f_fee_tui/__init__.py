@@ -0,0 +1,4 @@
+import time
+
+STARTED = time.perf_counter()
+"""The time the package was imported, the startup times of the App are measured from this moment."""
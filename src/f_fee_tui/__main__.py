@@ -4,12 +4,7 @@ import textwrap
 from f_fee_tui.app import FastFEEApp
 
 
-def main():
-    app = FastFEEApp()
-    app.run()
-
-
-if __name__ == "__main__":
+def parse_arguments(argv: list = None) -> argparse.Namespace:
 
     parser = argparse.ArgumentParser(
         description="A Textual User Interface for monitoring and commanding the F-FEE.",
@@ -24,7 +19,9 @@ if __name__ == "__main__":
 
             Additional information:
 
-            * TBW
+            * With --replay, no services need to be running, the App is driven by the recorded telemetry.
+            * With --stand-in, the App is driven by the stand-in for the DPU Processor and the core services, start it
+              with `python -m f_fee_tui.standin`.
 
         """),
         formatter_class=argparse.RawDescriptionHelpFormatter
@@ -35,6 +32,71 @@ if __name__ == "__main__":
     version = get_version()
     parser.add_argument('--version', action='version', version=f'f-fee-tui {version=}')
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '--poll-interval', type=float, default=None,
+        help="release monitored values at this interval [s] instead of at the end of each sync cycle"
+    )
+
+    parser.add_argument(
+        '--decode-processes', type=int, default=0,
+        help="decode the register maps and HK in this number of worker processes instead of in a thread"
+    )
 
+    parser.add_argument(
+        '--timings', action='store_true',
+        help="measure the latency of the monitoring pipeline from the start, see the diagnostics screen (F2)"
+    )
+
+    parser.add_argument(
+        '--record', metavar='PREFIX', default=None,
+        help="record the raw telemetry to capture files PREFIX-0001.ffcap, ... with an index PREFIX-0001.ffidx, ..."
+    )
+    parser.add_argument(
+        '--record-services', action='store_true',
+        help="when recording, also record the messages from the monitoring ports of the services"
+    )
+
+    parser.add_argument(
+        '--replay', metavar='CAPTURE', default=None,
+        help="replay a capture file, or all capture files of a recording prefix, instead of monitoring live data"
+    )
+    parser.add_argument(
+        '--speed', type=float, default=1.0,
+        help="the replay speed, 1 for real time, N for N times faster, 0 for as fast as possible [default=1]"
+    )
+    parser.add_argument(
+        '--start-cycle', type=int, default=0,
+        help="start the replay at this cycle, i.e. the number of the SYNC_TIMECODE in the recording"
+    )
+
+    parser.add_argument(
+        '--stand-in', action='store_true',
+        help="send the DPU commands to the stand-in for the DPU Processor, see `python -m f_fee_tui.standin --help`"
+    )
+    parser.add_argument(
+        '--stand-in-port', type=int, default=None,
+        help="the commanding port of the stand-in, when it was started with --commanding-port"
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None):
+    """The entry point of the f-fee-tui command, the arguments are taken from the command line by default."""
+
+    args = parse_arguments(argv)
+
+    if args.stand_in:
+        from f_fee_tui.standin import use_stand_in
+        use_stand_in(args.stand_in_port)
+
+    app = FastFEEApp(
+        poll_interval=args.poll_interval, decode_processes=args.decode_processes, enable_timings=args.timings,
+        record=args.record, record_services=args.record_services,
+        replay=args.replay, replay_speed=args.speed, replay_start_cycle=args.start_cycle,
+    )
+    app.run()
+
+
+if __name__ == "__main__":
     main()
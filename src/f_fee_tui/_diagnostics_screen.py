@@ -0,0 +1,98 @@
+"""The diagnostics dialog that shows the latency of the stages of the monitoring pipeline."""
+
+from __future__ import annotations
+
+import time
+
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.widgets import DataTable
+from textual.widgets import Footer
+from textual.widgets import Label
+
+from f_fee_tui.metrics import counters
+from f_fee_tui.metrics import timings
+
+STAGES = ("recv", "unpickle", "decode", "process", "post_message", "handler", "refresh")
+"""The stages of the monitoring pipeline, in the order a frame passes through them."""
+
+
+class DiagnosticsScreen(ModalScreen[None]):
+    """Modal dialog with the p50/p99 latency per stage and per message, refreshed every second."""
+
+    DEFAULT_CSS = """
+    DiagnosticsScreen {
+        align: center middle;
+    }
+
+    DiagnosticsScreen > Vertical {
+        border: thick $primary 50%;
+        width: 80%;
+        height: 80%;
+        background: $boost;
+    }
+
+    DiagnosticsScreen > Vertical > Label {
+        padding: 0 1;
+    }
+
+    DiagnosticsScreen > Vertical > DataTable {
+        height: 1fr;
+    }
+    """
+
+    BINDINGS = [
+        Binding("escape", "app.pop_screen", "Close"),
+        Binding("t", "toggle_timings", "Toggle timing"),
+        Binding("c", "clear_timings", "Clear"),
+        Binding("w", "write_timings", "Write to file"),
+    ]
+
+    def compose(self) -> ComposeResult:
+        with Vertical():
+            yield Label(id="timings-status")
+            yield DataTable(zebra_stripes=True, cursor_type="row")
+        yield Footer()
+
+    def on_mount(self) -> None:
+        table = self.query_one(DataTable)
+        table.add_columns("stage", "message", "count", "mean [ms]", "p50 [ms]", "p99 [ms]", "max [ms]")
+        self.update_timings()
+        self.set_interval(1.0, self.update_timings)
+
+    def update_timings(self) -> None:
+        self.query_one("#timings-status", Label).update(
+            f"Timing is {'enabled' if timings.enabled else 'disabled, press [b]t[/b] to enable'}.\n"
+            f"Startup: first paint {counters['startup.first_paint_ms']}ms, Setup {counters['startup.setup_ms']}ms, "
+            f"first data {counters['startup.first_data_ms']}ms."
+        )
+
+        table = self.query_one(DataTable)
+        table.clear()
+
+        summary = timings.summary()
+        for stage, label in sorted(summary, key=lambda key: (STAGES.index(key[0]), key[1])):
+            item = summary[(stage, label)]
+            table.add_row(
+                stage, label, item["count"],
+                *(f"{item[name]:.3f}" for name in ("mean_ms", "p50_ms", "p99_ms", "max_ms"))
+            )
+
+    def action_toggle_timings(self) -> None:
+        timings.enabled = not timings.enabled
+        self.update_timings()
+
+    def action_clear_timings(self) -> None:
+        timings.clear()
+        self.update_timings()
+
+    def action_write_timings(self) -> None:
+        filename = f"f-fee-tui-timings-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        try:
+            timings.dump(filename)
+        except OSError as exc:
+            self.notify(f"Couldn't write the timings: {exc}", severity="error")
+        else:
+            self.notify(f"Timings written to {filename}.")
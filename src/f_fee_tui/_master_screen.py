@@ -1,47 +1,66 @@
-import asyncio
+from __future__ import annotations
+
 import logging
 import platform
 import time
-from queue import Queue
+from concurrent.futures import Future
 
-import zmq
-import zmq.asyncio
-from egse.zmq import MessageIdentifier
+from egse.fee.ffee import aeb_state
+from egse.fee.ffee import f_fee_mode
 from textual import on
 from textual import work
 from textual.app import ComposeResult
 from textual.binding import Binding
 from textual.containers import Horizontal
 from textual.containers import Vertical
-from textual.css.query import NoMatches
 from textual.screen import Screen
 from textual.widgets import Button
 from textual.widgets import Footer
 from textual.widgets import Header
+from textual.worker import Worker
+
+import f_fee_tui
 
 from .aeb_command import AEBCommand
 from .aeb_state import AEBState
 from .aeb_state import get_aeb_nr
+from .capture import Recorder
 from .deb_command import DEBCommand
 from .deb_mode import DEBMode
 from .dtc_in_mod import DtcInMod
 from .general_command import GeneralCommand
 from .infobar import InfoBar
-from .messages import AebStateChanged
-from .messages import DebModeChanged
-from .messages import DtcInModChanged
+from .messages import CommandFinished
 from .messages import ExceptionCaught
+from .messages import OutboxReady
 from .messages import ProblemDetected
+from .messages import ReplayFinished
+from .messages import ServiceStatusChanged
+from .messages import StateSnapshot
 from .messages import TimeoutReached
-from .services import handle_multi_part
-from .services import handle_single_part
+from .metrics import counters
+from .metrics import timings
+from .replay import Replayer
+from .scheduler import Priority
+from .sequences import Sequence
+from .sequences import aeb_state_sequence
+from .sequences import deb_mode_sequence
+from .sequences import immediate_on_sequence
+from .sequences import set_fpga_defaults_sequence
 from .services import services
-from .workers import Command
+from .transitions import AEB_STATE_COMMANDS
+from .transitions import DEB_MODE_COMMANDS
+from .transitions import aeb_state_route
+from .transitions import deb_mode_route
+from .watchdog import LoopWatchdog
+from .workers import Commander
 from .workers import Monitor
 
 for handler in logging.getLogger().handlers:
     handler.setLevel(100)  # no logging levels to the screen
 
+_LOGGER = logging.getLogger("egse.f-fee-tui")
+
 
 class MasterScreen(Screen):
 
@@ -49,15 +68,20 @@ class MasterScreen(Screen):
         Binding("ctrl+k", "toggle_commanding", "Toggle Commanding", show=False),
     ]
 
+    shutdown_budget = 2.0
+    """The time [s] the command workers get to stop when the screen is unmounted."""
+
     def __init__(self):
         super().__init__()
-        self._command_q = Queue()
-        self._monitoring_thread = Monitor(self)
-        self._commanding_thread = Command(self, self._command_q)
+        self._monitor = Monitor(self)
+        self._watchdog = LoopWatchdog(self)
+        self._commander = Commander(self)
 
         self._commanding_disabled = False
         self._commanding_widgets = []
-        self._poll_timer = None
+
+        self._sequence: Sequence | None = None
+        self._sequence_worker: Worker | None = None
 
         self.title = "F-FEE TUI"
         self.sub_title = f"({platform.platform()})"
@@ -78,8 +102,18 @@ class MasterScreen(Screen):
             yield InfoBar()
 
     def on_mount(self) -> None:
-        self._monitoring_thread.start()
-        self._commanding_thread.start()
+        self._monitor.decode_processes = getattr(self.app, "decode_processes", 0)
+        if setup_loader := getattr(self.app, "setup_loader", None):
+            self._monitor.setup_loader = setup_loader
+        if prefix := getattr(self.app, "record", None):
+            self._monitor.recorder = Recorder(
+                prefix, ["DATA_DISTRIBUTION", *services], record_services=getattr(self.app, "record_services", False)
+            )
+        if capture := getattr(self.app, "replay", None):
+            self.run_replay(Replayer(self._monitor, capture, self.app.replay_speed, self.app.replay_start_cycle))
+        else:
+            self.run_monitor()
+        self.run_watchdog()
 
         deb_mode_widget = self.query_one(DEBMode)
         deb_mode_widget.border_title = "DEB Mode"
@@ -99,75 +133,187 @@ class MasterScreen(Screen):
         general_command_widget = self.query_one(GeneralCommand)
         general_command_widget.border_title = "General Commanding"
 
+        # Keep references to the widgets that are updated by the Monitor
+
+        self._deb_mode_widget = deb_mode_widget
+        self._deb_command_widget = deb_command_widget
+        self._aeb_command_widget = aeb_command_widget
+        self._aeb_state_widget = aeb_state_widget
+        self._dtc_in_mod_widget = in_mod_widget
+        self._info_bar = self.query_one(InfoBar)
+
         self._commanding_widgets = [
             deb_command_widget, aeb_command_widget, general_command_widget
         ]
         self.action_toggle_commanding()
 
-        self._poll_timer = self.set_timer(1.0, self.poll_services)
+        # When the App defines a poll interval, the Monitor gathers the values and only releases them when we
+        # request an update, otherwise a snapshot is released at the end of each sync cycle.
+
+        if poll_interval := getattr(self.app, "poll_interval", None):
+            self._monitor.scheduled_updates = True
+            self.set_interval(poll_interval, self._monitor.schedule_update)
 
     def on_unmount(self) -> None:
-        self._monitoring_thread.cancel()
-        if self._monitoring_thread.is_alive():
-            self._monitoring_thread.join()
+        self._monitor.cancel()
+
+        # Pending commands are canceled, a command that hangs in a control server doesn't block the shutdown.
 
-        self._command_q.join()  # FIXME: this blocks when the DPU CS is not responding or not running
+        shutdown_time = self._commander.shutdown(timeout=self.shutdown_budget)
+        self.log(f"Commander stopped in {shutdown_time * 1000:.1f}ms (budget {self.shutdown_budget}s).")
 
-        self._commanding_thread.cancel()
-        if self._commanding_thread.is_alive():
-            self._commanding_thread.join()
+    def submit_command(
+            self, target: str, command: str, args: list = None, kwargs: dict = None,
+            priority: Priority = Priority.NORMAL
+    ) -> Future:
+        """Submit the command to the Commander, a CommandFinished message is posted when it is done."""
+
+        future = self._commander.submit(target, command, args, kwargs, priority)
+        future.add_done_callback(self._command_done)
+
+        return future
+
+    def _command_done(self, future: Future):
+        if not future.cancelled():
+            self.post_message(CommandFinished(future.result()))
 
     @on(Button.Pressed, "#btn-deb-on")
     def command_deb_to_on_mode(self):
-        self._command_q.put_nowait(("DPU", "deb_set_on_mode", [], {}))
+        self.command_deb_mode(f_fee_mode.ON_MODE)
 
     @on(Button.Pressed, "#btn-deb-immediate-on")
-    async def command_deb_to_immediate_on(self):
-        self._command_q.put_nowait(("DPU", "deb_set_immediate_on", [], {}))
-        for aeb_id in "AEB1", "AEB2", "AEB3", "AEB4":
-            self._command_q.put_nowait(("DPU", "aeb_set_init_mode", [aeb_id], {}))
-        await asyncio.sleep(6.0)
-        self._command_q.put_nowait(("DPU", "deb_set_aeb_power_off", [True, True, True, True], {}))
+    def command_deb_to_immediate_on(self):
+        # IMMEDIATE ON preempts all queued commands and a running sequence, the queued mode changes are dropped
+        self.start_sequence(immediate_on_sequence(), preempt=True)
 
     @on(Button.Pressed, "#btn-deb-standby")
     def command_deb_to_standby_mode(self):
-        self._command_q.put_nowait(("DPU", "deb_set_standby_mode", [], {}))
+        self.command_deb_mode(f_fee_mode.STANDBY_MODE)
 
     @on(Button.Pressed, "#btn-deb-full-image")
     def command_deb_to_full_image_mode(self):
-        self._command_q.put_nowait(("DPU", "deb_set_full_image_mode", [], {}))
+        self.command_deb_mode(f_fee_mode.FULL_IMAGE_MODE)
 
     @on(Button.Pressed, "#btn-deb-full-image-pattern")
     def command_deb_to_full_image_pattern_mode(self):
-        self._command_q.put_nowait(("DPU", "deb_set_full_image_pattern_mode", [], {}))
+        self.command_deb_mode(f_fee_mode.FULL_IMAGE_PATTERN_MODE)
+
+    def command_deb_mode(self, mode: f_fee_mode):
+        """
+        Bring the DEB into the given mode.
+
+        The request is checked against the DEB mode from the HK. When the mode can not be reached directly, the DEB
+        is brought into the mode along a route of allowed transitions, e.g. ON -> STANDBY -> FULL_IMAGE. A request
+        for a mode that can not be reached is rejected, and so is any request while a sequence is running. When the
+        DEB mode is not known yet, the command is sent.
+        """
+
+        if self.reject_while_sequence("DEB Mode"):
+            return
+
+        if (current := self._monitor.state.deb_mode) is None:
+            self.submit_command("DPU", DEB_MODE_COMMANDS[mode])
+            return
+
+        route = deb_mode_route(current, mode)
+
+        if route is None:
+            counters.increment("command.rejected")
+            self.notify(f"{mode.name} can not be reached from {current.name}.", severity="error", title="DEB Mode")
+        elif not route:
+            self.notify(f"The DEB is already in {mode.name}.", title="DEB Mode")
+        elif len(route) == 1:
+            self.submit_command("DPU", DEB_MODE_COMMANDS[mode])
+        else:
+            self.start_sequence(deb_mode_sequence(route))
 
     @on(Button.Pressed, "#btn-set-fpga-defaults")
-    async def command_set_fpga_defaults(self):
-        self.set_fpga_defaults()
+    def command_set_fpga_defaults(self):
+        self.start_sequence(set_fpga_defaults_sequence(), lock_commanding=True)
 
-    @work()
-    async def set_fpga_defaults(self):
-        self.query_one("DEBCommand").disabled = True
-        self.query_one("AEBCommand").disabled = True
+    @property
+    def running_sequence(self) -> Sequence | None:
+        """The sequence that is running, None when no sequence is running."""
+
+        if self._sequence_worker is None or self._sequence_worker.is_finished:
+            return None
+
+        return self._sequence
+
+    def start_sequence(self, sequence: Sequence, lock_commanding: bool = False, preempt: bool = False) -> bool:
+        """
+        Start the command sequence, returns False when it is rejected.
+
+        Only one sequence runs at a time. A sequence that preempts, i.e. IMMEDIATE ON, cancels the running sequence,
+        any other sequence is rejected while a sequence runs, so that a safety or configuration sequence is never
+        interrupted halfway by a mode change.
+        """
+
+        if not preempt and self.reject_while_sequence(sequence.name):
+            return False
+
+        self._sequence = sequence
+        self._sequence_worker = self.run_sequence(sequence, lock_commanding)
+
+        return True
+
+    def reject_while_sequence(self, title: str) -> bool:
+        """Notify and return True when a sequence is running, the request with the given title is then rejected."""
+
+        if (running := self.running_sequence) is None:
+            return False
+
+        counters.increment("command.rejected")
+        self.notify(
+            f"Rejected, wait until the sequence {running.name} is finished.", severity="error", title=title
+        )
+
+        return True
+
+    @work(group="sequence", exclusive=True)
+    async def run_sequence(self, sequence: Sequence, lock_commanding: bool = False):
+        """
+        Run the command sequence, each step waits until it is confirmed by the HK, then report the durations.
+
+        Use `start_sequence()` to start a sequence, it checks that no other sequence is running. The exclusive group
+        cancels the running sequence. When `lock_commanding` is True, the DEB and AEB commands are disabled while the
+        sequence runs, except IMMEDIATE ON.
+        """
+
+        if lock_commanding:
+            self.lock_commanding(True)
+
+        self.notify(f"Started sequence {sequence.name}")
 
-        self.notify("Set FPGA defaults for the DEB")
-        self._command_q.put_nowait(("DPU", "set_fpga_defaults", ['DEB'], {}))
+        try:
+            results = await sequence.run(self.submit_command, self._monitor.state)
+        finally:
+            if lock_commanding:
+                self.lock_commanding(False)
 
-        await asyncio.sleep(2.5)
+        for result in results:
+            self.log(f"{sequence.name}: {result!r}")
 
-        power_on_sequence = [False, False, False, False]
-        for idx, aeb_id in enumerate(('AEB1', 'AEB2', 'AEB3', 'AEB4')):
-            power_on_sequence[idx] = True
-            self._command_q.put_nowait(("DPU", "deb_set_aeb_power_on", power_on_sequence, {}))
+        total = sum(result.duration for result in results)
+        report = "\n".join(repr(result) for result in results)
 
-            await asyncio.sleep(2.5)
+        if results and results[-1].error is not None:
+            self.notify(f"{report}\n\nThe sequence was aborted.", title=sequence.name, severity="error")
+        elif all(result.confirmed for result in results):
+            self.notify(f"{report}\n\nFinished in {total:.1f}s", title=sequence.name)
+        else:
+            self.notify(f"{report}\n\nNot all steps were confirmed.", title=sequence.name, severity="warning")
 
-        for unit in 'AEB1', 'AEB2', 'AEB3', 'AEB4':
-            self.notify(f"Set FPGA defaults for the {unit}")
-            self._command_q.put_nowait(("DPU", "set_fpga_defaults", [unit], {}))
+    def lock_commanding(self, locked: bool) -> None:
+        """
+        Disable or enable the DEB and AEB command buttons. IMMEDIATE ON is never disabled, it shall always be possible
+        to send it, also while a sequence runs.
+        """
 
-        self.query_one("DEBCommand").disabled = False
-        self.query_one("AEBCommand").disabled = False
+        for widget in self._deb_command_widget, self._aeb_command_widget:
+            for button in widget.query(Button):
+                if button.id != "btn-deb-immediate-on":
+                    button.disabled = locked
 
     @on(Button.Pressed, ".command.aeb.power")
     def command_aeb_power(self, message: Button.Pressed):
@@ -182,49 +328,66 @@ class MasterScreen(Screen):
 
         args = [1 if aeb_nr == x else 0 for x in (1, 2, 3, 4)]
 
-        self._command_q.put_nowait(("DPU", cmd, args, {}))
+        self.submit_command("DPU", cmd, args)
 
     @on(Button.Pressed, ".command.aeb.init")
     def command_aeb_to_init(self, message: Button.Pressed):
         button = message.button
 
-        cmd = "aeb_set_init_mode"
-
         if (aeb_nr := get_aeb_nr(button.id)) is None:
             self.notify(message=f"Couldn't match AEB number in {button.id}", severity="error", timeout=5.0)
             return
 
-        args = [f"AEB{aeb_nr}"]
-
-        self._command_q.put_nowait(("DPU", cmd, args, {}))
+        self.command_aeb_state(f"AEB{aeb_nr}", aeb_state.INIT)
 
     @on(Button.Pressed, ".command.aeb.config")
     def command_aeb_to_config(self, message: Button.Pressed):
         button = message.button
 
-        cmd = "aeb_set_config_mode"
-
         if (aeb_nr := get_aeb_nr(button.id)) is None:
             self.notify(message=f"Couldn't match AEB number in {button.id}", severity="error", timeout=5.0)
             return
 
-        args = [f"AEB{aeb_nr}"]
-
-        self._command_q.put_nowait(("DPU", cmd, args, {}))
+        self.command_aeb_state(f"AEB{aeb_nr}", aeb_state.CONFIG)
 
     @on(Button.Pressed, ".command.aeb.image")
     def command_aeb_to_image(self, message: Button.Pressed):
         button = message.button
 
-        cmd = "aeb_set_image_mode"
-
         if (aeb_nr := get_aeb_nr(button.id)) is None:
             self.notify(message=f"Couldn't match AEB number in {button.id}", severity="error", timeout=5.0)
             return
 
-        args = [f"AEB{aeb_nr}"]
+        self.command_aeb_state(f"AEB{aeb_nr}", aeb_state.IMAGE)
+
+    def command_aeb_state(self, aeb_id: str, state: aeb_state):
+        """
+        Bring the AEB into the given state.
+
+        The request is checked against the AEB state from the HK, like for the DEB mode, see `command_deb_mode()`.
+        """
+
+        if self.reject_while_sequence(aeb_id):
+            return
+
+        if (current := self._monitor.state.aeb_state.get(aeb_id)) is None:
+            self.submit_command("DPU", AEB_STATE_COMMANDS[state], [aeb_id])
+            return
 
-        self._command_q.put_nowait(("DPU", cmd, args, {}))
+        route = aeb_state_route(current, state)
+
+        if route is None:
+            counters.increment("command.rejected")
+            hint = " Power on the AEB first." if current == aeb_state.OFF else ""
+            self.notify(
+                f"{state.name} can not be reached from {aeb_state(current).name}.{hint}", severity="error", title=aeb_id
+            )
+        elif not route:
+            self.notify(f"{aeb_id} is already in {state.name}.", title=aeb_id)
+        elif len(route) == 1:
+            self.submit_command("DPU", AEB_STATE_COMMANDS[state], [aeb_id])
+        else:
+            self.start_sequence(aeb_state_sequence(aeb_id, route))
 
     @on(Button.Pressed, ".command.aeb.pattern")
     def command_aeb_to_pattern(self, message: Button.Pressed):
@@ -232,46 +395,63 @@ class MasterScreen(Screen):
 
         self.notify("AEB Pattern mode not yet implemented.", severity="warning")
 
-    def on_deb_mode_changed(self, message: DebModeChanged) -> None:
-        mode = message.deb_mode
-
-        self.query_one("#deb-full-image").state = False
-        self.query_one("#deb-full-image-pattern").state = False
-        self.query_one("#deb-windowing").state = False
-        self.query_one("#deb-windowing-pattern").state = False
-        self.query_one("#deb-standby").state = False
-        self.query_one("#deb-on").state = False
-
-        if mode == 0:
-            self.query_one("#deb-full-image").state = True
-        elif mode == 1:
-            self.query_one("#deb-full-image-pattern").state = True
-        elif mode == 2:
-            self.query_one("#deb-windowing").state = True
-        elif mode == 3:
-            self.query_one("#deb-windowing-pattern").state = True
-        elif mode == 6:
-            self.query_one("#deb-standby").state = True
-        elif mode == 7:
-            self.query_one("#deb-on").state = True
+    def on_outbox_ready(self, message: OutboxReady) -> None:
+        """Handle the messages that are waiting in the outbox of the Monitor, only the newest values are kept."""
+
+        if not timings.enabled:
+            for pending in self._monitor.outbox.take():
+                getattr(self, pending.handler_name)(pending)
+            return
+
+        for pending in self._monitor.outbox.take():
+            label = type(pending).__name__
+            if (posted := getattr(pending, "posted", None)) is not None:
+                timings.since("post_message", label, posted)
+            start = time.perf_counter()
+            getattr(self, pending.handler_name)(pending)
+            timings.since("handler", label, start)
+            self.call_after_refresh(timings.since, "refresh", label, start)
+
+    def on_state_snapshot(self, message: StateSnapshot) -> None:
+        """Apply all values of one sync cycle in a single batched update of the screen."""
+
+        if not counters["startup.first_data_ms"]:
+            counters.set("startup.first_data_ms", int((time.perf_counter() - f_fee_tui.STARTED) * 1000))
+            _LOGGER.info(f"First data after {counters['startup.first_data_ms']}ms.")
+
+        with self.app.batch_update():
+            if message.deb_mode is not None:
+                self.set_deb_mode(message.deb_mode)
+
+            for aeb_state_type, aeb_state in message.aeb_state.values():
+                self._aeb_state_widget.set_state(aeb_state_type, aeb_state)
+
+            if message.dtc_in_mod is not None:
+                self._dtc_in_mod_widget.set_state(*message.dtc_in_mod)
+
+    def set_deb_mode(self, mode: int) -> None:
+        self._deb_mode_widget.set_mode(mode)
 
         # Should only notify if new state != old state
         # from egse.fee.ffee import f_fee_mode
         # self.notify(f"F-FEE set to {f_fee_mode(mode).name}")
 
-    def on_aeb_state_changed(self, message: AebStateChanged):
-        aeb_state: bool = message.aeb_state
-        aeb_state_type: str = message.aeb_state_type
+    def on_command_finished(self, message: CommandFinished):
+        request = message.request
 
-        aeb_state_widget = self.query_one(AEBState)
-        aeb_state_widget.set_state(aeb_state_type, aeb_state)
+        counters.increment("command.finished")
+        self.log(
+            f"Command {request!r} finished in {request.latency * 1000:.1f}ms "
+            f"(waited {request.wait_time * 1000:.1f}ms in the queue)."
+        )
 
-        # Should only notify if new state != old state
-        # self.notify(f"AEB State changed: {aeb_state_type}, {aeb_state}")
+        if request.error is not None:
+            counters.increment("command.failed")
+            self.notify(f"Command {request.command} failed: {request.error}", severity="error", title="Command")
 
-    def on_dtc_in_mod_changed(self, message: DtcInModChanged):
-        dtc_in_mod_widget = self.query_one(DtcInMod)
-        dtc_in_mod_widget.set_state(message)
+    def on_service_status_changed(self, message: ServiceStatusChanged):
+        self.log(f"Service {message.name} {'timed out' if message.timed_out else 'is sending messages'}.")
+        self._info_bar.set_active(message.name, message.timed_out)
 
     def on_exception_caught(self, message: ExceptionCaught):
         self.log(str(message.exc))
@@ -280,6 +460,13 @@ class MasterScreen(Screen):
     def on_problem_detected(self, problem: ProblemDetected):
         self.notify(problem.message, severity="warning", title="WARNING")
 
+    def on_replay_finished(self, message: ReplayFinished):
+        self.notify(
+            f"Replayed {message.n_messages} messages ({message.n_cycles} cycles) in {message.elapsed:.2f}s, "
+            f"{message.n_messages / max(message.elapsed, 1e-9):.0f} messages/s.",
+            title="Replay", timeout=30
+        )
+
     def on_timeout_reached(self, message: TimeoutReached):
         self.notify(message.message, title="Timeout")
 
@@ -294,52 +481,17 @@ class MasterScreen(Screen):
             cmd_widget.disabled = self._commanding_disabled
 
     @work()
-    async def poll_services(self):
-
-        ctx = zmq.asyncio.Context.instance()
-
-        self.poller = zmq.asyncio.Poller()
-
-        for name, props in services.items():
-            sock = ctx.socket(props['type'])
-            if props['type'] == zmq.SUB:
-                sock.subscribe(props.get('subscribe', b''))
-            sock.connect(f"tcp://{props['hostname']}:{props['port']}")
-
-            props['sock'] = sock
+    async def run_monitor(self):
+        """Run the Monitor on the event loop of the App, the worker is cancelled when the screen is removed."""
+        await self._monitor.run()
 
-            self.poller.register(sock, zmq.POLLIN)
-
-        while True:
-            events = dict(await self.poller.poll(timeout=100))
-
-            current_time = time.monotonic()
-
-            try:
-                for name, props in services.items():
-                    if (sock := props['sock']) in events and events[sock] == zmq.POLLIN:
-                        message = await sock.recv()
-                        more_parts = sock.getsockopt(zmq.RCVMORE)
-
-                        if more_parts:
-                            sync_id, response = await handle_multi_part(sock, message)
-                        else:
-                            sync_id, response = await handle_single_part(sock, message)
-
-                        self.log(f"Message received for {name} and {MessageIdentifier(sync_id).name}.")
-
-                        props['callback'](self, name, sync_id, response, False)
-                        self.query_one(InfoBar).set_active(name, False)
-                        props['last_received'] = current_time
-                        props['timed-out'] = False
-                    else:
-                        if not props['timed-out'] and current_time - props['last_received'] > props['interval']:
-                            self.log(f"No message received for {name} within {props['interval']}.")
-                            props['timed-out'] = True
-                            props['callback'](self, name, None, None, True)
-                            self.query_one(InfoBar).set_active(name, True)
-            except NoMatches as exc:
-                pass
+    @work()
+    async def run_replay(self, replayer: Replayer):
+        """Replay a capture through the Monitor instead of monitoring live data."""
+        self.sub_title = f"(replay of {replayer.filenames[0]})"
+        await replayer.run()
 
-            # Sleep for a while before polling again
-            await asyncio.sleep(1.0)
+    @work()
+    async def run_watchdog(self):
+        """Measure the lag of the event loop and the frame time, see `watchdog.LoopWatchdog`."""
+        await self._watchdog.run()
@@ -0,0 +1,87 @@
+"""The startup screen that is painted at once while the egse modules are imported in the background."""
+
+import importlib
+import logging
+import time
+
+from textual import work
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import Screen
+from textual.widgets import Footer
+from textual.widgets import Header
+from textual.widgets import Label
+from textual.widgets import ProgressBar
+
+from f_fee_tui.metrics import counters
+
+_LOGGER = logging.getLogger("egse.f-fee-tui")
+
+MODULES = ("egse.settings", "egse.zmq", "egse.fee.ffee", "egse.reg", "egse.setup", "f_fee_tui._master_screen")
+"""The modules that are imported before the MasterScreen is shown, in this order."""
+
+
+class StartupScreen(Screen):
+    """Shows the progress of importing the egse, then switches to the MasterScreen."""
+
+    DEFAULT_CSS = """
+    StartupScreen {
+        align: center middle;
+    }
+
+    StartupScreen > Vertical {
+        border: round grey;
+        background: $boost;
+        padding: 1 2;
+        width: 70;
+        height: auto;
+    }
+
+    StartupScreen Label {
+        width: 100%;
+        margin: 1 0 0 0;
+    }
+    """
+
+    def compose(self) -> ComposeResult:
+        yield Header()
+        with Vertical():
+            yield Label("[b]Starting the F-FEE TUI[/b]")
+            yield ProgressBar(total=len(MODULES), show_eta=False)
+            yield Label("", id="startup-step")
+            yield Label("", id="startup-setup")
+        yield Footer()
+
+    def on_mount(self) -> None:
+        self.title = "F-FEE TUI"
+        self.update_setup_status()
+        self.set_interval(0.2, self.update_setup_status)
+        self.import_modules()
+
+    def update_setup_status(self) -> None:
+        if (loader := getattr(self.app, "setup_loader", None)) is not None:
+            self.query_one("#startup-setup", Label).update(loader.status)
+
+    def show_step(self, step: str) -> None:
+        self.query_one("#startup-step", Label).update(step)
+
+    def advance(self) -> None:
+        self.query_one(ProgressBar).advance(1)
+
+    @work(thread=True, exit_on_error=False)
+    def import_modules(self) -> None:
+        """Import the modules in a thread, so the event loop keeps painting."""
+
+        for name in MODULES:
+            self.app.call_from_thread(self.show_step, f"Importing {name}")
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as exc:
+                _LOGGER.error(f"Couldn't import {name}: {exc}", exc_info=True)
+                self.app.call_from_thread(self.show_step, f"[red]Couldn't import {name}: {exc}[/red]")
+                return
+            counters.set(f"startup.import.{name}_ms", int((time.perf_counter() - start) * 1000))
+            self.app.call_from_thread(self.advance)
+
+        self.app.call_from_thread(self.app.switch_screen, "master")
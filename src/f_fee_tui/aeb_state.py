@@ -1,11 +1,15 @@
 import re
 
+from textual import events
 from textual.app import ComposeResult
 from textual.widgets import Label
 from textual.widgets import Static
 
 from .leds import OnOffLed
 
+AEB_STATES = ("onoff", "init", "power_up", "power_down", "config", "image", "pattern")
+"""The states in the columns of the AEB State widget, the LED identifiers are 'aeb<nr>_<state>'."""
+
 
 class AEBState(Static):
     """A widget to monitor the state of the AEBs."""
@@ -56,33 +60,40 @@ class AEBState(Static):
         yield OnOffLed(id="aeb4_image")
         yield OnOffLed(id="aeb4_pattern")
 
+    def on_mount(self, event: events.Mount) -> None:
+        # The LEDs as a matrix indexed by AEB number and state
+
+        self._leds = {
+            aeb_nr: {state: self.query_one(f"#aeb{aeb_nr}_{state}", OnOffLed) for state in AEB_STATES}
+            for aeb_nr in (1, 2, 3, 4)
+        }
+
     def set_state(self, aeb_state_type: str, aeb_state: bool):
 
         if (aeb_nr := get_aeb_nr(aeb_state_type)) is None:
             self.notify(f"Couldn't derive AEB unit number from {aeb_state_type=}", severity="warning")
             return
 
-        old_onoff_state = self.query_one(f"#aeb{aeb_nr}_onoff", OnOffLed).state
-        old_other_state = self.query_one(f"#{aeb_state_type}", OnOffLed).state
+        leds = self._leds[aeb_nr]
+        state_name = aeb_state_type.split("_", 1)[1]
 
-        # When the state is init, config, image, or pattern, set the onoff led also, otherwise
-        # onoff will be cleared below.
+        # All states except ONOFF are cleared. When the state is init, config, image, or pattern, set the onoff led
+        # also, otherwise onoff is set to the given state.
 
-        if not aeb_state_type.endswith("_onoff"):
-            self.query_one(f"#aeb{aeb_nr}_onoff", OnOffLed).state = True
-            if old_onoff_state is False:
+        new_states = {state: False for state in AEB_STATES}
+        if state_name == "onoff":
+            new_states["onoff"] = aeb_state
+        else:
+            new_states["onoff"] = True
+            new_states[state_name] = aeb_state
+            if leds["onoff"].state is False:
                 self.notify(f"AEB{aeb_nr} is Powered ON")
 
-        # Clear the current states except ONOFF
-
-        self.query_one(f"#aeb{aeb_nr}_init", OnOffLed).state = False
-        self.query_one(f"#aeb{aeb_nr}_power_up", OnOffLed).state = False
-        self.query_one(f"#aeb{aeb_nr}_power_down", OnOffLed).state = False
-        self.query_one(f"#aeb{aeb_nr}_config", OnOffLed).state = False
-        self.query_one(f"#aeb{aeb_nr}_image", OnOffLed).state = False
-        self.query_one(f"#aeb{aeb_nr}_pattern", OnOffLed).state = False
+        # Only touch the LEDs that change
 
-        self.query_one(f"#{aeb_state_type}", OnOffLed).state = aeb_state
+        for state, led in leds.items():
+            if led.state != new_states[state]:
+                led.state = new_states[state]
 
 
 def get_aeb_nr(string: str):
@@ -1,23 +1,76 @@
+import logging
+import time
+from typing import Optional
+
 from textual.app import App
 from textual.binding import Binding
 
-from f_fee_tui._master_screen import MasterScreen
+import f_fee_tui
+from f_fee_tui._diagnostics_screen import DiagnosticsScreen
 from f_fee_tui._help_screen import HelpScreen
+from f_fee_tui._startup_screen import StartupScreen
+from f_fee_tui.metrics import counters
+from f_fee_tui.metrics import timings
+from f_fee_tui.setups import SetupLoader
+
+_LOGGER = logging.getLogger("egse.f-fee-tui")
+
+
+def master_screen():
+    """The MasterScreen imports the egse, it's only imported when the screen is first shown."""
+    from f_fee_tui._master_screen import MasterScreen
+
+    return MasterScreen()
 
 
 class FastFEEApp(App):
     """A Textual app to monitor and command the PLATO F-FEE."""
 
     CSS_PATH = "app.tcss"
-    SCREENS = {"master": MasterScreen, "help": HelpScreen}
+    SCREENS = {"master": master_screen, "help": HelpScreen, "diagnostics": DiagnosticsScreen}
     BINDINGS = [
         Binding("q", "quit", "Quit"),
         Binding(key="f1", action="help", description="Help", show=True, priority=True),
+        Binding(key="f2", action="diagnostics", description="Diagnostics", show=True),
         Binding("d", "toggle_dark", "Toggle dark mode"),
     ]
 
+    def __init__(
+            self, poll_interval: Optional[float] = None, decode_processes: int = 0, enable_timings: bool = False,
+            record: Optional[str] = None, record_services: bool = False, replay: Optional[str] = None,
+            replay_speed: float = 1.0, replay_start_cycle: int = 0
+    ):
+        super().__init__()
+        timings.enabled = enable_timings
+        self.poll_interval = poll_interval
+        """When given, the monitored values are released to the screen at this interval [s] instead of each cycle."""
+        self.decode_processes = decode_processes
+        """The number of worker processes that decode the data distribution frames, 0 to decode in a thread."""
+        self.record = record
+        """When given, the raw telemetry is recorded to capture files with this prefix, see `capture.Recorder`."""
+        self.record_services = record_services
+        """When True, also the messages from the monitoring ports of the services are recorded."""
+        self.replay = replay
+        """When given, this capture is replayed instead of monitoring live data, see `replay.Replayer`."""
+        self.replay_speed = replay_speed
+        self.replay_start_cycle = replay_start_cycle
+        self.setup_loader = SetupLoader()
+        """Loads the Setup in the background while the egse is imported, see `setups.SetupLoader`."""
+
     def on_mount(self):
-        self.push_screen("master")
+        self.setup_loader.start()
+        self.push_screen(StartupScreen())
+        self.call_after_refresh(self.first_paint)
+
+    def on_unmount(self):
+        self.setup_loader.stop()
+
+    def first_paint(self) -> None:
+        counters.set("startup.first_paint_ms", int((time.perf_counter() - f_fee_tui.STARTED) * 1000))
+        _LOGGER.info(f"First paint after {counters['startup.first_paint_ms']}ms.")
 
     def action_help(self) -> None:
         self.app.push_screen(HelpScreen())
+
+    def action_diagnostics(self) -> None:
+        self.app.push_screen(DiagnosticsScreen())
@@ -0,0 +1,341 @@
+"""
+Recording of the raw telemetry that is received by the Monitor.
+
+The recorder writes every raw multipart message from the data distribution, and optionally from the monitoring ports
+of the services, to an append-only capture file. The file starts with a header:
+
+    MAGIC | uint32 length | JSON metadata (version, channels, creation time)
+
+followed by the records, each with the monotonic time [s] the message was received:
+
+    float64 timestamp | uint8 channel | uint8 n_parts | n_parts x (uint32 length | bytes)
+
+The channel is the index in the 'channels' list of the metadata, channel 0 is the data distribution.
+
+Next to each capture file an index file maps the cycles to file offsets. For every SYNC_TIMECODE message, i.e. at the
+start of each cycle, the index has an entry:
+
+    uint64 cycle | int64 timecode | uint64 offset | float64 timestamp
+
+When a capture file grows beyond `max_bytes`, recording continues in a new file at the start of the next cycle. The
+files are named `<prefix>-0001.ffcap` with index `<prefix>-0001.ffidx`, etc.
+
+The `CaptureReader` reads a capture file through a memory map, the records can be read from the start of any cycle.
+"""
+
+from __future__ import annotations
+
+import bisect
+import glob
+import json
+import logging
+import mmap
+import os
+import pickle
+import queue
+import struct
+import threading
+import time
+
+from egse.zmq import MessageIdentifier
+
+from .metrics import counters
+
+_LOGGER = logging.getLogger("egse.f-fee-tui")
+
+MAGIC = b"FFEECAP\x01"
+INDEX_MAGIC = b"FFEEIDX\x01"
+VERSION = 1
+
+HEADER_LENGTH = struct.Struct("<I")
+RECORD_HEADER = struct.Struct("<dBB")
+PART_LENGTH = struct.Struct("<I")
+INDEX_ENTRY = struct.Struct("<QqQd")
+
+DATA_CHANNEL = 0
+"""The channel of the messages from the data distribution."""
+
+SYNC_TIMECODE = MessageIdentifier.SYNC_TIMECODE.to_bytes(1, byteorder='big')
+
+
+class Recorder:
+    """
+    Records raw messages to rolling capture files with a background writer thread.
+
+    `record()` only puts the message on a bounded queue, it never blocks the receive loop. When the writer can not
+    keep up and the queue is full, messages are dropped and counted in 'recorder.dropped'. The files are flushed
+    after each batch of messages and synced to disk every `fsync_interval` seconds.
+    """
+
+    def __init__(
+            self, prefix: str, channels: list, record_services: bool = False, max_bytes: int = 1 << 30,
+            fsync_interval: float = 1.0, max_queued: int = 10_000
+    ):
+        self.prefix = prefix
+        self.channels = list(channels)
+        """The names of the channels, the first channel is the data distribution."""
+        self.record_services = record_services
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_interval
+
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread: threading.Thread | None = None
+
+        self._file_number = 0
+        self._capture = None
+        self._index = None
+        self._offset = 0
+        self._cycle = 0
+
+    def start(self) -> None:
+        """Start the writer thread, the first capture file is created."""
+
+        self._open_next()
+        self._thread = threading.Thread(target=self._write_loop, name="f-fee-tui-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, channel: int, parts: list) -> None:
+        """Queue the parts of a message that was received on the given channel, this never blocks."""
+
+        try:
+            self._queue.put_nowait((time.monotonic(), channel, parts))
+        except queue.Full:
+            counters.increment("recorder.dropped")
+
+    def close(self, timeout: float = 2.0) -> None:
+        """
+        Write the queued messages, sync and close the files, waiting at most `timeout` seconds.
+
+        This never blocks longer than the timeout, also not when the writer thread stopped, e.g. on a full disk, and
+        the queue is full. The files are closed by the writer thread when it stops.
+        """
+
+        if self._thread is None:
+            return
+
+        thread, self._thread = self._thread, None
+        deadline = time.monotonic() + timeout
+
+        if thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+        if thread.is_alive():
+            _LOGGER.warning(f"The recorder didn't finish writing within {timeout}s, the last messages may be lost.")
+
+    def _write_loop(self) -> None:
+
+        last_fsync = time.monotonic()
+        dirty = False
+
+        try:
+            while True:
+                # Wait for a message, but wake up in time to sync what was written before.
+
+                try:
+                    batch = [self._queue.get(timeout=self.fsync_interval)]
+                except queue.Empty:
+                    batch = []
+
+                # Write everything that is waiting as one batch, None is queued by close().
+
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                for item in batch:
+                    if item is None:
+                        return
+                    self._write(*item)
+                    dirty = True
+
+                self._capture.flush()
+                self._index.flush()
+
+                if dirty and time.monotonic() - last_fsync >= self.fsync_interval:
+                    self._sync()
+                    last_fsync = time.monotonic()
+                    dirty = False
+        except Exception as exc:
+            _LOGGER.error(f"Recording stopped: {exc}", exc_info=True)
+        finally:
+            self._close_files()
+
+    def _write(self, timestamp: float, channel: int, parts: list) -> None:
+
+        if channel == DATA_CHANNEL and parts[0] == SYNC_TIMECODE:
+            if self._offset >= self.max_bytes:
+                self._close_files()
+                self._open_next()
+            try:
+                timecode, _ = pickle.loads(parts[1])
+            except Exception:
+                timecode = -1
+            self._index.write(INDEX_ENTRY.pack(self._cycle, timecode, self._offset, timestamp))
+            self._cycle += 1
+
+        record = [RECORD_HEADER.pack(timestamp, channel, len(parts))]
+        for part in parts:
+            record.append(PART_LENGTH.pack(len(part)))
+            record.append(part)
+
+        data = b"".join(record)
+        self._capture.write(data)
+        self._offset += len(data)
+
+        counters.increment("recorder.messages")
+        counters.increment("recorder.bytes", len(data))
+
+    def _open_next(self) -> None:
+
+        self._file_number += 1
+        filename = f"{self.prefix}-{self._file_number:04d}"
+
+        metadata = json.dumps({
+            "version": VERSION,
+            "channels": self.channels,
+            "created": time.time(),
+            "monotonic": time.monotonic(),
+            "first_cycle": self._cycle,
+        }).encode()
+
+        self._capture = open(f"{filename}.ffcap", "wb")
+        self._capture.write(MAGIC + HEADER_LENGTH.pack(len(metadata)) + metadata)
+        self._offset = self._capture.tell()
+
+        self._index = open(f"{filename}.ffidx", "wb")
+        self._index.write(INDEX_MAGIC)
+
+        _LOGGER.info(f"Recording to {filename}.ffcap")
+
+    def _sync(self) -> None:
+        os.fsync(self._capture.fileno())
+        os.fsync(self._index.fileno())
+
+    def _close_files(self) -> None:
+
+        for fd in (self._capture, self._index):
+            if fd is not None and not fd.closed:
+                try:
+                    fd.flush()
+                    os.fsync(fd.fileno())
+                except OSError as exc:
+                    _LOGGER.error(f"Couldn't write {fd.name}: {exc}")
+                finally:
+                    fd.close()
+
+
+class CaptureReader:
+    """
+    Reads the records of a capture file through a memory map.
+
+    The reader also works on a capture file that is still being written, a record that is not complete is ignored.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+        self._fd = open(filename, "rb")
+        self._mmap = mmap.mmap(self._fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{filename} is not a capture file.")
+
+        length, = HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+        start = len(MAGIC) + HEADER_LENGTH.size
+        self.metadata = json.loads(self._mmap[start:start + length])
+        self.data_offset = start + length
+
+        self.index = read_index(os.path.splitext(filename)[0] + ".ffidx")
+        """The (cycle, timecode, offset, timestamp) of each cycle in the capture file."""
+
+    @property
+    def channels(self) -> list:
+        return self.metadata["channels"]
+
+    def has_cycle(self, cycle: int) -> bool:
+        return bool(self.index) and self.index[0][0] <= cycle <= self.index[-1][0]
+
+    def offset_of_cycle(self, cycle: int) -> int:
+        """Returns the file offset of the first record of the cycle, or of the first cycle after it."""
+
+        position = bisect.bisect_left(self.index, (cycle,))
+
+        if position == len(self.index):
+            return len(self._mmap)
+
+        return self.index[position][2]
+
+    def records(self, offset: int = None):
+        """
+        Yields the (offset, timestamp, channel, parts) of the records, starting at the given file offset.
+
+        The parts are bytes objects that are copied from the memory map.
+        """
+
+        mm = self._mmap
+        size = len(mm)
+        offset = self.data_offset if offset is None else offset
+
+        while offset + RECORD_HEADER.size <= size:
+            timestamp, channel, n_parts = RECORD_HEADER.unpack_from(mm, offset)
+            position = offset + RECORD_HEADER.size
+            parts = []
+            for _ in range(n_parts):
+                if position + PART_LENGTH.size > size:
+                    return
+                length, = PART_LENGTH.unpack_from(mm, position)
+                position += PART_LENGTH.size
+                if position + length > size:
+                    return
+                parts.append(mm[position:position + length])
+                position += length
+
+            yield offset, timestamp, channel, parts
+
+            offset = position
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._fd.close()
+
+
+def read_index(filename: str) -> list:
+    """Returns the entries of the index file, an incomplete last entry is ignored."""
+
+    try:
+        with open(filename, "rb") as fd:
+            data = fd.read()
+    except FileNotFoundError:
+        _LOGGER.warning(f"No index file {filename}, seeking by cycle is not possible.")
+        return []
+
+    if data[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+        raise ValueError(f"{filename} is not a capture index file.")
+
+    data = data[len(INDEX_MAGIC):]
+    data = data[:len(data) - len(data) % INDEX_ENTRY.size]
+
+    return list(INDEX_ENTRY.iter_unpack(data))
+
+
+def find_capture_files(name: str) -> list:
+    """
+    Returns the capture files for the given name, in order of recording.
+
+    The name is a capture file, or the prefix that was used for recording, i.e. all `<prefix>-NNNN.ffcap` files.
+    """
+
+    if name.endswith(".ffcap"):
+        return [name]
+
+    if filenames := sorted(glob.glob(f"{glob.escape(name)}-[0-9][0-9][0-9][0-9].ffcap")):
+        return filenames
+
+    raise FileNotFoundError(f"No capture files found for {name}.")
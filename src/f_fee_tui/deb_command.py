@@ -8,12 +8,12 @@ from textual.widgets import Static
 BTN_DEB_ON = """
 Press this button to bring the F-FEE in ON mode. 
 
-ON mode can only be reached from STANDBY mode or FULL-IMAGE PATTERN mode.
+ON mode can only be reached from STANDBY mode, FULL-IMAGE PATTERN mode or WINDOWING PATTERN mode.
 """
 BTN_DEB_STANDBY = """
 Press this button to bring the F-FEE in STANDBY mode.
 
-STANDBY mode can only be reached from ON mode, and FULL-IMAGE mode.
+STANDBY mode can only be reached from ON mode, FULL-IMAGE mode and WINDOWING mode.
 """
 BTN_DEB_FULL_IMAGE = """
 Press this button to bring the F-FEE into FULL-IMAGE mode.
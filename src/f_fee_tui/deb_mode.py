@@ -1,8 +1,19 @@
+from textual import events
 from textual.app import ComposeResult
 from textual.widgets import Static
 
 from .leds import OnOffLedWithLabel
 
+DEB_MODE_IDS = {
+    0: "deb-full-image",
+    1: "deb-full-image-pattern",
+    2: "deb-windowing",
+    3: "deb-windowing-pattern",
+    6: "deb-standby",
+    7: "deb-on",
+}
+"""The identifiers of the LEDs for each of the DEB modes, i.e. the values of OPER_MOD."""
+
 
 class DEBMode(Static):
     """A widget to monitor the DEB mode."""
@@ -14,3 +25,12 @@ class DEBMode(Static):
         yield OnOffLedWithLabel("FULL_IMAGE_PATTERN", False, id="deb-full-image-pattern")
         yield OnOffLedWithLabel("WINDOWING", False, id="deb-windowing")
         yield OnOffLedWithLabel("WINDOWING_PATTERN", False, id="deb-windowing-pattern")
+
+    def on_mount(self, event: events.Mount) -> None:
+        self._leds = {mode: self.query_one(f"#{id_}", OnOffLedWithLabel) for mode, id_ in DEB_MODE_IDS.items()}
+
+    def set_mode(self, mode: int):
+        """Switch on the LED for the given mode and switch off the others, only LEDs that change are touched."""
+        for led_mode, led in self._leds.items():
+            if led.state != (led_mode == mode):
+                led.state = led_mode == mode
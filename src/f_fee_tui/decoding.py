@@ -0,0 +1,370 @@
+"""
+Decoding of the F-FEE telemetry that is received by the Monitor.
+
+The Monitor is only interested in a handful of fields from the register map and the HK packets. The classes in
+this module avoid decoding the full structures when the fields of interest can not have changed, and extract the
+fields directly from the raw bytes with a precompiled table of offsets, masks and shifts.
+
+The tables are derived from the egse decoders themselves (RegisterMap and HousekeepingData) by flipping bits in
+a copy of the first packet that is received and checking which fields change. This way the tables always follow
+the definitions in the Setup. The egse decoders are imported when they are first needed.
+"""
+
+from .metrics import counters
+
+try:
+    import numpy as np
+except ImportError:  # numpy is normally installed with the egse
+    np = None
+
+DTC_IN_MOD_FIELDS = (
+    ("DEB_DTC_IN_MOD_2", "T0_IN_MOD"),
+    ("DEB_DTC_IN_MOD_2", "T1_IN_MOD"),
+    ("DEB_DTC_IN_MOD_2", "T2_IN_MOD"),
+    ("DEB_DTC_IN_MOD_2", "T3_IN_MOD"),
+    ("DEB_DTC_IN_MOD_1", "T4_IN_MOD"),
+    ("DEB_DTC_IN_MOD_1", "T5_IN_MOD"),
+    ("DEB_DTC_IN_MOD_1", "T6_IN_MOD"),
+    ("DEB_DTC_IN_MOD_1", "T7_IN_MOD"),
+)
+"""The register fields for the DTC_IN_MOD panel, in the order T0 to T7."""
+
+HK_FIELDS = {
+    "DEB": (("STATUS", "OPER_MOD"),),
+    "AEB1": (("STATUS", "AEB_STATUS"),),
+    "AEB2": (("STATUS", "AEB_STATUS"),),
+    "AEB3": (("STATUS", "AEB_STATUS"),),
+    "AEB4": (("STATUS", "AEB_STATUS"),),
+}
+"""The HK fields that are monitored for each type of HK packet."""
+
+WORD_SIZE = 4
+"""The register map is organised in 32-bit words."""
+
+WINDOW = 4
+"""The number of bytes from which a field is extracted, i.e. fields can span at most 32 bits."""
+
+VECTORIZE_THRESHOLD = 8
+"""From this number of fields on, the extraction is vectorized with NumPy."""
+
+NOT_SEARCHED = object()
+"""Marks that the register words of the fields were not searched yet."""
+
+
+class FieldExtractor:
+    """
+    Extracts fields directly from the raw bytes of a packet or memory map.
+
+    Each field is described by an entry (offset, byteorder, mask, shift) in the table. The value of the field is
+    taken from the 32-bit window that starts at `offset`, interpreted with the given `byteorder`, then masked and
+    shifted. When many fields are extracted, the extraction is vectorized with NumPy.
+    """
+
+    def __init__(self, table, size: int):
+        self.table = tuple(table)
+        self.size = size
+        """The size of the raw bytes that the table applies to."""
+
+        self._vectorized = np is not None and len(self.table) >= VECTORIZE_THRESHOLD
+
+        if self._vectorized:
+            offsets = np.array([offset for offset, _, _, _ in self.table], dtype=np.intp)
+            self._indices = offsets[:, None] + np.arange(WINDOW)
+            self._big = np.array([byteorder == 'big' for _, byteorder, _, _ in self.table])
+            self._masks = np.array([mask for _, _, mask, _ in self.table], dtype=np.uint64)
+            self._shifts = np.array([shift for _, _, _, shift in self.table], dtype=np.uint64)
+
+    def extract(self, raw: bytes) -> tuple:
+        """Returns the values of the fields in the given raw bytes."""
+
+        if self._vectorized:
+            window = np.frombuffer(raw, dtype=np.uint8)[self._indices].astype(np.uint64)
+            big = (window[:, 0] << 24) | (window[:, 1] << 16) | (window[:, 2] << 8) | window[:, 3]
+            little = (window[:, 3] << 24) | (window[:, 2] << 16) | (window[:, 1] << 8) | window[:, 0]
+            values = (np.where(self._big, big, little) & self._masks) >> self._shifts
+            return tuple(int(value) for value in values)
+
+        return tuple(
+            (int.from_bytes(raw[offset:offset + WINDOW], byteorder) & mask) >> shift
+            for offset, byteorder, mask, shift in self.table
+        )
+
+    def insert(self, raw: bytearray, values) -> None:
+        """Writes the values of the fields into the raw bytes, i.e. the inverse of `extract()`."""
+
+        for (offset, byteorder, mask, shift), value in zip(self.table, values):
+            window = int.from_bytes(raw[offset:offset + WINDOW], byteorder)
+            window = (window & ~mask) | ((int(value) << shift) & mask)
+            raw[offset:offset + WINDOW] = window.to_bytes(WINDOW, byteorder)
+
+
+class RegisterMapDecoder:
+    """
+    Decodes the given fields from the raw F-FEE register memory map.
+
+    Building a RegisterMap is expensive while the memory map rarely changes from one cycle to the next. The decoder
+    keeps the raw bytes of the previous memory map and skips the decoding when
+
+    * the raw memory map is identical to the previous one, or
+    * only register words changed that do not contain any of the fields.
+
+    The register words that contain the fields are determined once, after the first decode, by flipping ranges of
+    words in a copy of the memory map and checking if the decoded values change. A FieldExtractor is then compiled
+    for the bits in those words, so that changed words are decoded without building a RegisterMap. When the words
+    can not be determined, the search is not repeated and every changed memory map is decoded with a RegisterMap.
+
+    The 'register_map.hit' and 'register_map.miss' counters report how often the decoding was skipped or needed.
+    """
+
+    def __init__(self, fields, setup):
+        self.fields = fields
+        self.setup = setup
+
+        self._raw = None
+        self._values = None
+        self._words = NOT_SEARCHED
+        self._extractor: FieldExtractor | None = None
+
+    @property
+    def words(self):
+        """The indices of the register words that contain the fields, None when not (yet) known."""
+        return None if self._words is NOT_SEARCHED else self._words
+
+    def decode(self, memory_map) -> tuple:
+        """Returns the values of the fields in the given memory map."""
+
+        raw = memoryview(memory_map).tobytes()
+
+        if self._raw is not None:
+            if raw == self._raw:
+                counters.increment("register_map.hit")
+                return self._values
+            if (
+                isinstance(self._words, set)
+                and len(raw) == len(self._raw)
+                and not self._words & changed_words(self._raw, raw)
+            ):
+                counters.increment("register_map.hit")
+                self._raw = raw
+                return self._values
+
+        counters.increment("register_map.miss")
+
+        if self._extractor is not None and len(raw) == self._extractor.size:
+            values = self._extractor.extract(raw)
+        else:
+            values = self._decode(memory_map)
+
+        if self._words is NOT_SEARCHED:
+            self._words = self._find_words(raw, memory_map)
+            self._extractor = self._compile(raw, memory_map)
+            if self._words is None:
+                counters.increment("register_map.no_words")
+
+        self._raw = raw
+        self._values = values
+
+        return values
+
+    def _decode(self, memory_map) -> tuple:
+        from egse.reg import RegisterMap
+
+        register_map = RegisterMap("F-FEE", memory_map=memory_map, setup=self.setup)
+        return tuple(register_map[reg_name, var_name] for reg_name, var_name in self.fields)
+
+    def _find_words(self, raw: bytes, memory_map):
+        """Returns the indices of the register words that contain the fields, or None when they can't be found."""
+
+        if len(raw) % WORD_SIZE:
+            return None
+
+        try:
+            return find_units(lambda probe: self._decode(like(probe, memory_map)), raw, WORD_SIZE)
+        except Exception:
+            return None
+
+    def _compile(self, raw: bytes, memory_map):
+        """Returns a FieldExtractor for the bits in the register words that contain the fields."""
+
+        if self._words is None:
+            return None
+
+        try:
+            return compile_fields(lambda probe: self._decode(like(probe, memory_map)), raw, self._words, WORD_SIZE)
+        except Exception:
+            return None
+
+
+class HousekeepingDecoder:
+    """
+    Decodes the monitored fields from the raw DEB and AEB HK packets.
+
+    Building the HousekeepingData for every HK packet is expensive while we only need one or two fields of it. On
+    the first packet of each HK type, a FieldExtractor is compiled for the fields in `HK_FIELDS`. All following
+    packets are decoded by the extractor, so the cost per packet stays flat when more fields are monitored. When
+    no extractor can be compiled, e.g. for fields that are not plain bit fields, the full HousekeepingData is used.
+
+    The 'hk.extracted' and 'hk.decoded' counters report how many packets were handled by the extractor or the
+    full decoding.
+    """
+
+    def __init__(self, fields: dict, setup):
+        self.fields = fields
+        self.setup = setup
+
+        self._extractors = {}
+
+    def decode(self, hk_type: str, data) -> tuple:
+        """Returns the values of the fields for the given HK type, e.g. 'DEB' or 'AEB1', from the HK data."""
+
+        try:
+            raw = memoryview(data).tobytes()
+        except TypeError:
+            raw = None
+
+        if raw is not None:
+            if hk_type not in self._extractors:
+                self._extractors[hk_type] = self._compile(hk_type, raw, data)
+            extractor = self._extractors[hk_type]
+            if extractor is not None and len(raw) == extractor.size:
+                counters.increment("hk.extracted")
+                return extractor.extract(raw)
+
+        counters.increment("hk.decoded")
+
+        return self._decode(hk_type, data)
+
+    def _decode(self, hk_type: str, data) -> tuple:
+        from egse.fee.ffee import HousekeepingData
+
+        hk_data = HousekeepingData(hk_type, data, self.setup)
+        return tuple(hk_data[group, name] for group, name in self.fields[hk_type])
+
+    def _compile(self, hk_type: str, raw: bytes, data):
+
+        def decode(probe):
+            return self._decode(hk_type, like(probe, data))
+
+        try:
+            return compile_fields(decode, raw, find_units(decode, raw, 1), 1)
+        except Exception:
+            return None
+
+
+def find_units(decode, raw: bytes, unit_size: int) -> set:
+    """
+    Returns the indices of the units, e.g. bytes or 32-bit words, in the raw bytes that contain any of the fields.
+
+    The `decode` function returns the values of the fields for the given raw bytes. A range of units is flipped in
+    a copy of the raw bytes, when any of the values change, the range is bisected until the single units are found.
+    """
+
+    values = decode(raw)
+    units = set()
+
+    def changes_values(lo, hi):
+        probe = bytearray(raw)
+        for idx in range(lo * unit_size, hi * unit_size):
+            probe[idx] ^= 0xFF
+        return decode(bytes(probe)) != values
+
+    def search(lo, hi):
+        if not changes_values(lo, hi):
+            return
+        if hi - lo == 1:
+            units.add(lo)
+            return
+        mid = (lo + hi) // 2
+        search(lo, mid)
+        search(mid, hi)
+
+    search(0, len(raw) // unit_size)
+
+    return units
+
+
+def compile_fields(decode, raw: bytes, units: set, unit_size: int):
+    """
+    Returns a FieldExtractor for the fields that are returned by `decode`, or None when the fields can not be
+    described by an offset, mask and shift.
+
+    Each bit in the given units is flipped in a copy of the raw bytes, the field that changes value contains the
+    bit, and the change in value gives the weight of the bit in the field.
+    """
+
+    values = decode(raw)
+    bits = [[] for _ in values]
+
+    for unit in sorted(units):
+        for byte_idx in range(unit * unit_size, (unit + 1) * unit_size):
+            for bit in range(8):
+                probe = bytearray(raw)
+                probe[byte_idx] ^= 1 << bit
+                for idx, (old, new) in enumerate(zip(values, decode(bytes(probe)))):
+                    if old != new:
+                        bits[idx].append((byte_idx, bit, int(old) ^ int(new)))
+
+    table = []
+    for field_bits in bits:
+        if (entry := _table_entry(field_bits, len(raw))) is None:
+            return None
+        table.append(entry)
+
+    extractor = FieldExtractor(table, len(raw))
+
+    # Make sure the extractor gives the same result as the full decoding
+
+    return extractor if extractor.extract(raw) == tuple(values) else None
+
+
+def _table_entry(field_bits: list, size: int):
+    """Returns the (offset, byteorder, mask, shift) for a field from its (byte index, bit, weight) list."""
+
+    if not field_bits or size < WINDOW:
+        return None
+
+    if any(weight & (weight - 1) for _, _, weight in field_bits):
+        return None
+
+    first = min(byte_idx for byte_idx, _, _ in field_bits)
+    last = max(byte_idx for byte_idx, _, _ in field_bits)
+
+    if last - first >= WINDOW:
+        return None
+
+    offset = min(first, size - WINDOW)
+
+    for byteorder in 'big', 'little':
+        mask = 0
+        shifts = set()
+        for byte_idx, bit, weight in field_bits:
+            if byteorder == 'big':
+                position = (offset + WINDOW - 1 - byte_idx) * 8 + bit
+            else:
+                position = (byte_idx - offset) * 8 + bit
+            mask |= 1 << position
+            shifts.add(position - (weight.bit_length() - 1))
+        if len(shifts) == 1 and (shift := shifts.pop()) >= 0:
+            return offset, byteorder, mask, shift
+
+    return None
+
+
+def changed_words(previous: bytes, current: bytes) -> set:
+    """Returns the indices of the 32-bit words that differ between the two raw memory maps of equal size."""
+
+    previous = memoryview(previous).cast('I')
+    current = memoryview(current).cast('I')
+
+    return {idx for idx, (x, y) in enumerate(zip(previous, current)) if x != y}
+
+
+def like(raw: bytes, memory_map):
+    """Returns the raw bytes in the same type of container as the given memory map, e.g. bytes or a numpy array."""
+
+    if isinstance(memory_map, (bytes, bytearray)):
+        return type(memory_map)(raw)
+
+    import numpy as np
+
+    return np.frombuffer(raw, dtype=memory_map.dtype).copy()
@@ -1,11 +1,10 @@
 import itertools
 
+from textual import events
 from textual.app import ComposeResult
 from textual.widgets import Label
 from textual.widgets import Static
 
-from f_fee_tui.messages import DtcInModChanged
-
 ON = "✖"
 OFF = ""
 
@@ -22,6 +21,8 @@ ALL_IDS = list(itertools.chain(
         T0.values(), T1.values(), T2.values(), T3.values(), T4.values(), T5.values(), T6.values(), T7.values()
 ))
 
+ALL_T = (T0, T1, T2, T3, T4, T5, T6, T7)
+
 
 class DtcInMod(Static):
     """A widget to monitor the state of the AEBs."""
@@ -83,39 +84,22 @@ class DtcInMod(Static):
         yield Label("E", classes="one-col footer")
         yield Label("F", classes="one-col footer")
 
-    def set_state(self, state: DtcInModChanged):
-        self.log(f"{state.t0=}, {state.t1=}, {state.t2=}, {state.t3=}, {state.t4=}, {state.t5=}, {state.t6=}, {state.t7=}")
-        for id_ in ALL_IDS:
-            self.query_one(f"#{id_}", Label).update(OFF)
-
-        if state.t0 == 0b001:
-            self.query_one("#T0-001", Label).update(ON)
-
-        if state.t1 == 0b001:
-            self.query_one("#T1-001", Label).update(ON)
-        elif state.t1 == 0b010:
-            self.query_one("#T1-010", Label).update(ON)
-
-        if state.t2 == 0b001:
-            self.query_one("#T2-001", Label).update(ON)
-        elif state.t2 == 0b010:
-            self.query_one("#T2-010", Label).update(ON)
+    def on_mount(self, event: events.Mount) -> None:
+        self._labels = {id_: self.query_one(f"#{id_}", Label) for id_ in ALL_IDS}
+        self._on_ids = set()
 
-        if state.t3 == 0b001:
-            self.query_one("#T3-001", Label).update(ON)
+    def set_state(self, t0: int, t1: int, t2: int, t3: int, t4: int, t5: int, t6: int, t7: int):
+        self.log(f"{t0=}, {t1=}, {t2=}, {t3=}, {t4=}, {t5=}, {t6=}, {t7=}")
 
-        if state.t4 == 0b001:
-            self.query_one("#T4-001", Label).update(ON)
+        on_ids = {
+            ids[value] for ids, value in zip(ALL_T, (t0, t1, t2, t3, t4, t5, t6, t7)) if value in ids
+        }
 
-        if state.t5 == 0b001:
-            self.query_one("#T5-001", Label).update(ON)
-        elif state.t5 == 0b010:
-            self.query_one("#T5-010", Label).update(ON)
+        # Only update the labels that change
 
-        if state.t6 == 0b001:
-            self.query_one("#T6-001", Label).update(ON)
-        elif state.t6 == 0b010:
-            self.query_one("#T6-010", Label).update(ON)
+        for id_ in self._on_ids - on_ids:
+            self._labels[id_].update(OFF)
+        for id_ in on_ids - self._on_ids:
+            self._labels[id_].update(ON)
 
-        if state.t7 == 0b001:
-            self.query_one("#T7-001", Label).update(ON)
+        self._on_ids = on_ids
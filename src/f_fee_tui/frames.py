@@ -0,0 +1,205 @@
+"""
+Decoding of the frames from the data distribution into compact records.
+
+The `FrameDecoder` unpickles a frame and decodes the values of interest into a record, a small tuple like
+`("deb_mode", f_fee_mode.ON_MODE)`. The decoder keeps the state of the register map and HK decoders from one frame to
+the next. It can run in a thread of the Monitor, or in a worker process so that unpickling and decoding don't compete
+with the App for the GIL, see `init_decoder_process()` and `decode_frame()`. A worker process returns its counters and
+timings together with each record, the App merges them with `merge_metrics()`.
+"""
+
+import contextlib
+import functools
+import logging
+import multiprocessing
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+
+from egse.fee.ffee import f_fee_mode
+from egse.zmq import MessageIdentifier
+
+from .decoding import DTC_IN_MOD_FIELDS
+from .decoding import HK_FIELDS
+from .decoding import HousekeepingDecoder
+from .decoding import RegisterMapDecoder
+from .metrics import counters
+from .metrics import timings
+from .setups import SetupLoader
+from .setups import read_cached_setup
+
+_LOGGER = logging.getLogger("egse.f-fee-tui")
+
+
+class FrameDecoder:
+    """
+    The decoders for the frames that are handled by the Monitor.
+
+    The timecodes are decoded without a Setup. When there is no Setup, the HK and register maps are dropped, this is
+    logged once and counted in 'decoder.no_setup'.
+    """
+
+    def __init__(self):
+        self._register_map_decoder = None
+        self._hk_decoder = None
+        self._warned_no_setup = False
+
+        self.handlers = {
+            MessageIdentifier.SYNC_TIMECODE: self.decode_timecode,
+            MessageIdentifier.F_FEE_REGISTER_MAP: self.decode_register_map,
+            MessageIdentifier.SYNC_HK_DATA: self.decode_hk_data,
+        }
+
+    def decode(self, sync_id: int, pickle_string: bytes, setup):
+        """Unpickle and decode the frame, returns a record or None when the frame is not handled."""
+
+        if (handler := self.handlers.get(sync_id)) is None:
+            return None
+
+        if not timings.enabled:
+            return handler(pickle.loads(pickle_string), setup)
+
+        label = sync_label(sync_id)
+        start = time.perf_counter()
+        data = pickle.loads(pickle_string)
+        timings.since("unpickle", label, start)
+        start = time.perf_counter()
+        record = handler(data, setup)
+        timings.since("decode", label, start)
+
+        return record
+
+    def decode_timecode(self, data, setup):
+
+        timecode, _ = data
+        return "timecode", timecode
+
+    def decode_register_map(self, data, setup):
+
+        # How can we be sure the Register Map is properly synchronised with the F-FEE?
+
+        if setup is None:
+            return self.drop_without_setup()
+
+        register_map, _ = data
+
+        if self._register_map_decoder is None or self._register_map_decoder.setup is not setup:
+            self._register_map_decoder = RegisterMapDecoder(DTC_IN_MOD_FIELDS, setup)
+
+        return "dtc_in_mod", self._register_map_decoder.decode(register_map)
+
+    def decode_hk_data(self, data, setup):
+
+        if setup is None:
+            return self.drop_without_setup()
+
+        cmd, aeb_id, data, timestamp = data
+
+        if self._hk_decoder is None or self._hk_decoder.setup is not setup:
+            self._hk_decoder = HousekeepingDecoder(HK_FIELDS, setup)
+
+        if cmd == 'command_deb_read_hk':
+            oper_mod, = self._hk_decoder.decode("DEB", data)
+            return "deb_mode", f_fee_mode(oper_mod)
+        elif cmd == 'command_aeb_read_hk':
+            aeb_id = aeb_id[0]  # this comes from the args, so it's a list
+            aeb_status, = self._hk_decoder.decode(aeb_id, data)
+            return "aeb_state", aeb_id, aeb_status
+
+        return None
+
+    def drop_without_setup(self):
+
+        counters.increment("decoder.no_setup")
+
+        if not self._warned_no_setup:
+            self._warned_no_setup = True
+            _LOGGER.warning("There is no Setup, the HK and register maps are dropped until a Setup is available.")
+
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def sync_label(sync_id: int) -> str:
+    """Returns the name of the MessageIdentifier for the sync identifier, used as a label for the timings."""
+    try:
+        return MessageIdentifier(sync_id).name
+    except ValueError:
+        return str(sync_id)
+
+
+# The decoder and the Setup of a worker process, these are created by the initializer of the process.
+
+_decoder: FrameDecoder = None
+_setup = None
+_next_setup_check = 0.0
+
+SETUP_CHECK_INTERVAL = 10.0
+"""
+The interval [s] at which a decoder process without a Setup looks for a Setup in the cache. The SetupLoader of the
+App caches the Setup when the configuration manager is reachable again.
+"""
+
+
+def create_decoder_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Returns a pool of decoder processes, every process keeps its own decoder and Setup."""
+
+    # The resource tracker process inherits the file descriptor of sys.stderr, which Textual replaces by an object
+    # without a file descriptor while the App is running. Make sure the tracker is started with the real stderr.
+
+    with contextlib.redirect_stderr(sys.__stderr__):
+        resource_tracker.ensure_running()
+
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_decoder_process,
+    )
+
+
+def init_decoder_process() -> None:
+    """Initialize a decoder process: load the Setup and create the decoder that is kept for the process lifetime."""
+
+    global _decoder, _setup
+
+    _setup = SetupLoader().load()
+    _decoder = FrameDecoder()
+
+    # The startup counters of the process shall not be added to those of the App.
+
+    counters.take()
+
+
+def decode_frame(sync_id: int, pickle_string: bytes, timing: bool = False):
+    """
+    Decode a frame in the worker process, only the compact record is sent back to the App.
+
+    Returns the record, and the counters and timings that were recorded in the process for this frame, see
+    `merge_metrics()`. The `timing` flag enables the timings in the process, like `timings.enabled` in the App.
+    """
+
+    global _setup, _next_setup_check
+
+    timings.enabled = timing
+
+    if _setup is None and time.monotonic() >= _next_setup_check:
+        _next_setup_check = time.monotonic() + SETUP_CHECK_INTERVAL
+        _setup = read_cached_setup()
+
+    record = _decoder.decode(sync_id, pickle_string, _setup)
+
+    return record, counters.take(), timings.take() if timing else {}
+
+
+def merge_metrics(result) -> tuple:
+    """Merge the counters and timings that are returned by `decode_frame()` into those of the App, return the record."""
+
+    record, (counts, gauges), histograms = result
+
+    counters.merge(counts, gauges)
+    if histograms:
+        timings.merge(histograms)
+
+    return record
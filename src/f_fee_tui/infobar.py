@@ -3,8 +3,16 @@ from textual.app import ComposeResult
 from textual.containers import Horizontal
 from textual.widgets import Label
 
+from f_fee_tui.metrics import counters
+from f_fee_tui.proxies import TARGETS
+from f_fee_tui.scheduler import Priority
 from f_fee_tui.services import services
 
+COMMAND_STATS_HELP = (
+    "Number of queued commands per priority (EMERGENCY/HIGH/NORMAL) and the maximum time [ms] a command "
+    "waited in the queue."
+)
+
 
 class InfoBar(Horizontal):
 
@@ -33,14 +41,82 @@ class InfoBar(Horizontal):
         yield Label("🔴", id="dpu_cs_active", classes="status")
         yield Label("data", id="data")
         yield Label("🔴", id="data_active", classes="status")
+        yield Label("", id="monitor-stats")
+        yield Label("", id="command-stats")
+        yield Label("", id="loop-stats")
+        yield Label("", id="setup")
 
     def on_mount(self, event: events.Mount) -> None:
 
+        self._labels = {}
+        self._active_labels = {}
+        self._timed_out = {}
+
         for name, props in services.items():
             lbl = self.query_one(f"#{name}", Label)
             tooltip = props.get('description', '')
             self.app.log(f"Added tooltip to ")
             lbl.tooltip = tooltip
+            self._labels[name] = lbl
+            self._active_labels[name] = self.query_one(f"#{name}_active", Label)
+
+        self._monitor_stats = self.query_one("#monitor-stats", Label)
+        self._command_stats = self.query_one("#command-stats", Label)
+        self._loop_stats = self.query_one("#loop-stats", Label)
+        self._setup = self.query_one("#setup", Label)
+
+        self._monitor_stats.tooltip = (
+            "Number of state snapshots posted by the Monitor and number of unchanged values that were suppressed.\n"
+            "Number of register maps for which decoding was skipped (hit) or needed (miss)."
+        )
+        self._command_stats.tooltip = COMMAND_STATS_HELP
+        self._loop_stats.tooltip = (
+            "Scheduling lag of the event loop and the time until the screen was refreshed, the current value and the "
+            "maximum of the last 5s [ms]."
+        )
+        self.set_interval(5.0, self.update_counters)
+        self.set_interval(1.0, self.update_loop_stats)
+        self.set_interval(1.0, self.update_setup)
+        self.update_setup()
 
     def set_active(self, name: str, is_active: bool):
-        self.query_one(f"#{name}_active", Label).update('🔴' if is_active else '🟢')
+        if self._timed_out.get(name) != is_active:
+            self._timed_out[name] = is_active
+            self._active_labels[name].update('🔴' if is_active else '🟢')
+
+    def update_counters(self):
+        for name, props in services.items():
+            self._labels[name].tooltip = (
+                f"{props.get('description', '')}\n\n"
+                f"queue depth: {counters[f'service.{name}.queue_depth']} "
+                f"(max {counters[f'service.{name}.max_queue_depth']})\n"
+                f"received: {counters[f'service.{name}.frames']} frames, {counters[f'service.{name}.bytes']} bytes"
+            )
+        self._monitor_stats.update(
+            f"snapshots {counters['monitor.snapshots']} · suppressed {counters['monitor.suppressed']} · "
+            f"regmap {counters['register_map.hit']}/{counters['register_map.miss']}"
+        )
+        self._command_stats.update(
+            "commands " + "/".join(str(counters[f"command.{lane.name}.depth"]) for lane in Priority) + " · wait "
+            + "/".join(str(counters[f"command.{lane.name}.max_wait_ms"]) for lane in Priority) + "ms"
+        )
+        self._command_stats.tooltip = COMMAND_STATS_HELP + "\n\n" + "\n".join(
+            f"{target}: queued {counters[f'command.{target}.depth']}, connects {counters[f'proxy.{target}.connects']}, "
+            f"failures {counters[f'proxy.{target}.failures']}"
+            for target in TARGETS
+        )
+
+    def update_loop_stats(self):
+        self._loop_stats.update(
+            f"lag {counters['loop.lag_ms']} ({counters['loop.max_lag_ms']})ms · "
+            f"frame {counters['loop.frame_ms']} ({counters['loop.max_frame_ms']})ms"
+        )
+
+    def update_setup(self):
+        if (setup_loader := getattr(self.app, "setup_loader", None)) is None:
+            return
+        self._setup.update(setup_loader.status)
+        self._setup.tooltip = (
+            f"Startup: first paint after {counters['startup.first_paint_ms']}ms, Setup available after "
+            f"{counters['startup.setup_ms']}ms, first data after {counters['startup.first_data_ms']}ms."
+        )
@@ -1,33 +1,46 @@
 from textual.message import Message
 
 
-class DebModeChanged(Message):
-    """This message is sent when the Monitor detects a change in the DEB mode."""
-    def __init__(self, deb_mode: int):
+class StateSnapshot(Message):
+    """This message carries all the values that the Monitor decoded during one sync cycle.
+
+    The snapshot is keyed on the timecode of the cycle. Values that were not received during the cycle are None,
+    the AEB states are given as a dictionary {aeb_id: (aeb_state_type, aeb_state)}.
+    """
+    def __init__(self, timecode, deb_mode=None, aeb_state=None, dtc_in_mod=None):
         super().__init__()
+        self.timecode = timecode
         self.deb_mode = deb_mode
+        self.aeb_state = aeb_state or {}
+        self.dtc_in_mod = dtc_in_mod
+
+
+class OutboxReady(Message):
+    """This message is sent when the Outbox of the Monitor has messages waiting, see `outbox.Outbox`."""
+
+
+class ServiceStatusChanged(Message):
+    """This message is sent when a service starts or stops sending messages on its monitoring port."""
+    def __init__(self, name: str, timed_out: bool):
+        super().__init__()
+        self.name = name
+        self.timed_out = timed_out
 
 
-class AebStateChanged(Message):
-    """This message reports on the State of the AEBs."""
-    def __init__(self, aeb_state_type, aeb_state):
+class CommandFinished(Message):
+    """This message is sent when the Commanding thread finished a command, the request holds result and timing."""
+    def __init__(self, request):
         super().__init__()
-        self.aeb_state_type = aeb_state_type
-        self.aeb_state = aeb_state
+        self.request = request
 
 
-class DtcInModChanged(Message):
-    """This message reports on the State of the AEBs."""
-    def __init__(self, t0, t1, t2, t3, t4, t5, t6, t7):
+class ReplayFinished(Message):
+    """This message is sent when the replay of a capture finished, with the throughput of the replay."""
+    def __init__(self, n_messages: int, n_cycles: int, elapsed: float):
         super().__init__()
-        self.t0 = t0
-        self.t1 = t1
-        self.t2 = t2
-        self.t3 = t3
-        self.t4 = t4
-        self.t5 = t5
-        self.t6 = t6
-        self.t7 = t7
+        self.n_messages = n_messages
+        self.n_cycles = n_cycles
+        self.elapsed = elapsed
 
 
 class ExceptionCaught(Message):
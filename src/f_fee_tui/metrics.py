@@ -0,0 +1,212 @@
+"""
+Counters that report on what happens in the monitoring and commanding paths of the App.
+
+Next to counters that are incremented, the same collection also keeps gauges, i.e. values that are set to the
+last measured value or to the maximum value that was measured.
+
+The latency of the stages of the monitoring pipeline is kept in histograms, see `Timings`. Timing is disabled by
+default, the hooks in the pipeline only check `timings.enabled` in that case.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import Counter
+
+
+class Counters:
+    """
+    A thread-safe collection of named counters.
+
+    A name that is updated with `set()` or `maximum()` is a gauge. When counters are merged, e.g. those of the
+    decoder processes, the counters are added while a gauge takes the last value or the maximum value.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._gauges = {}
+        """The kind of each gauge, 'set' or 'maximum', i.e. how it's merged."""
+
+    def increment(self, name: str, value: int = 1):
+        with self._lock:
+            self._counts[name] += value
+
+    def set(self, name: str, value: int):
+        with self._lock:
+            self._counts[name] = value
+            self._gauges[name] = "set"
+
+    def maximum(self, name: str, value: int):
+        with self._lock:
+            self._counts[name] = max(self._counts[name], value)
+            self._gauges[name] = "maximum"
+
+    def __getitem__(self, name: str) -> int:
+        with self._lock:
+            return self._counts[name]
+
+    def as_dict(self) -> dict:
+        """Returns a copy of all counters."""
+        with self._lock:
+            return dict(self._counts)
+
+    def take(self) -> tuple:
+        """
+        Returns all counters and resets them, a decoder process hands off its counters to the App this way.
+
+        Returns the counts of the counters and the (kind, value) of the gauges, both keyed on name, see `merge()`.
+        """
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            gauges = {name: (self._gauges[name], counts.pop(name)) for name in list(counts) if name in self._gauges}
+        return dict(counts), gauges
+
+    def merge(self, counts: dict, gauges: dict = None):
+        """
+        Merge the counters and gauges that were taken from e.g. a decoder process.
+
+        The counts are added, a gauge is set to the given value or to the maximum of both values, by its kind.
+        """
+        with self._lock:
+            self._counts.update(counts)
+            for name, (kind, value) in (gauges or {}).items():
+                self._gauges[name] = kind
+                self._counts[name] = max(self._counts[name], value) if kind == "maximum" else value
+
+
+counters = Counters()
+"""The counters for the App, the Monitor and Command threads increment these."""
+
+
+class Histogram:
+    """
+    A histogram of durations with logarithmic buckets, four buckets per doubling starting at 1µs.
+
+    Percentiles are approximated by the upper edge of the bucket in which they fall, i.e. within 19%.
+    """
+
+    BUCKETS_PER_DOUBLING = 4
+    N_BUCKETS = 4 * 28  # up to about 268s
+
+    def __init__(self):
+        self.buckets = [0] * self.N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration: float):
+        """Add a duration [s] to the histogram."""
+
+        micro = duration * 1_000_000
+        index = int(math.log2(micro) * self.BUCKETS_PER_DOUBLING) + 1 if micro > 1.0 else 0
+
+        self.buckets[min(index, self.N_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def merge(self, other: 'Histogram'):
+        """Add the durations of the other histogram to this histogram."""
+
+        self.buckets = [x + y for x, y in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction: float) -> float:
+        """Returns the duration [s] below which the given fraction of the durations fall."""
+
+        if not self.count:
+            return 0.0
+
+        rank = fraction * self.count
+        cumulative = 0
+
+        for index, count in enumerate(self.buckets):
+            cumulative += count
+            if cumulative >= rank:
+                return min(2 ** (index / self.BUCKETS_PER_DOUBLING) / 1_000_000, self.max)
+
+        return self.max
+
+    def summary(self) -> dict:
+        """Returns the count, mean, p50, p99 and max of the durations in milliseconds."""
+
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class Timings:
+    """
+    The latency histograms of the monitoring pipeline, per stage and per label.
+
+    The stages are 'recv', 'unpickle', 'decode', 'post_message', 'handler' and 'refresh', the label is the name of
+    the MessageIdentifier or the message type. The hooks in the pipeline follow this pattern:
+
+        if timings.enabled:
+            start = time.perf_counter()
+            ...
+            timings.record("decode", label, time.perf_counter() - start)
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, stage: str, label: str, duration: float):
+        with self._lock:
+            if (histogram := self._histograms.get((stage, label))) is None:
+                histogram = self._histograms[(stage, label)] = Histogram()
+            histogram.add(duration)
+
+    def since(self, stage: str, label: str, start: float):
+        """Record the duration from the `time.perf_counter()` value `start` until now."""
+        self.record(stage, label, time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        """Returns the summary of each histogram, keyed on (stage, label)."""
+        with self._lock:
+            return {key: histogram.summary() for key, histogram in self._histograms.items()}
+
+    def clear(self):
+        with self._lock:
+            self._histograms = {}
+
+    def take(self) -> dict:
+        """Returns the histograms keyed on (stage, label) and clears them, a decoder process hands off its timings."""
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+        return histograms
+
+    def merge(self, histograms: dict):
+        """Add the given histograms, e.g. the timings that were taken from a decoder process."""
+        with self._lock:
+            for key, histogram in histograms.items():
+                if (own := self._histograms.get(key)) is None:
+                    self._histograms[key] = histogram
+                else:
+                    own.merge(histogram)
+
+    def dump(self, filename: str):
+        """Write the summaries and the histogram buckets to a JSON file."""
+
+        with self._lock:
+            data = [
+                {"stage": stage, "label": label, **histogram.summary(), "buckets": histogram.buckets}
+                for (stage, label), histogram in self._histograms.items()
+            ]
+
+        with open(filename, "w") as fd:
+            json.dump({"created": time.time(), "timings": data}, fd, indent=2)
+
+
+timings = Timings()
+"""The latency histograms for the App, enabled with `--timings` or from the diagnostics screen."""
@@ -0,0 +1,121 @@
+"""
+The hand-off of the messages from the Monitor to the screen.
+
+When the event loop of the App stalls, e.g. behind a modal screen or a slow terminal, messages that are posted
+directly pile up in the message queue of the screen and are replayed as stale updates afterwards. The Outbox keeps
+only the newest value per message type instead: snapshots are merged (newest DEB mode, newest state per AEB, newest
+DTC_IN_MOD), the newest status per service and the newest timeout are kept, and only the last few exceptions and
+problems. At most one `OutboxReady` message is waiting in the queue of the screen at any time.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+
+from textual.message import Message
+
+from .messages import OutboxReady
+from .messages import ServiceStatusChanged
+from .messages import StateSnapshot
+from .messages import TimeoutReached
+from .metrics import counters
+from .metrics import timings
+
+
+class Outbox:
+    """
+    A bounded, newest-value-per-type hand-off between the Monitor and the screen.
+
+    The Monitor calls `put()` from any thread, the screen calls `take()` when it handles the OutboxReady message.
+    Messages that are replaced by a newer value before the screen took them are counted in 'outbox.dropped'.
+    """
+
+    def __init__(self, target, max_events: int = 8):
+        self._target = target
+        self._lock = threading.Lock()
+        self._snapshot: StateSnapshot | None = None
+        self._service_status: dict[str, ServiceStatusChanged] = {}
+        self._timeout: TimeoutReached | None = None
+        self._events = deque(maxlen=max_events)
+        self._ready_posted = False
+
+    def put(self, message: Message) -> None:
+        """Keep the message for the screen, replacing or merging with an older message of the same kind."""
+
+        dropped = 0
+
+        if timings.enabled:
+            message.posted = time.perf_counter()
+
+        with self._lock:
+            if isinstance(message, StateSnapshot):
+                if self._snapshot is not None:
+                    dropped = merge_snapshot(self._snapshot, message)
+                self._snapshot = message
+            elif isinstance(message, ServiceStatusChanged):
+                dropped = int(self._service_status.pop(message.name, None) is not None)
+                self._service_status[message.name] = message
+            elif isinstance(message, TimeoutReached):
+                dropped = int(self._timeout is not None)
+                self._timeout = message
+            else:
+                dropped = int(len(self._events) == self._events.maxlen)
+                self._events.append(message)
+
+            post_ready = not self._ready_posted
+            self._ready_posted = True
+
+        if dropped:
+            counters.increment("outbox.dropped", dropped)
+
+        if post_ready:
+            self._target.post_message(OutboxReady())
+
+    def take(self) -> list:
+        """Returns the waiting messages and empties the outbox, the snapshot is always the last message."""
+
+        with self._lock:
+            messages = [*self._events, *self._service_status.values()]
+            if self._timeout is not None:
+                messages.append(self._timeout)
+            if self._snapshot is not None:
+                messages.append(self._snapshot)
+
+            self._snapshot = None
+            self._service_status = {}
+            self._timeout = None
+            self._events.clear()
+            self._ready_posted = False
+
+        return messages
+
+
+def merge_snapshot(older: StateSnapshot, newer: StateSnapshot) -> int:
+    """
+    Merge the values of the older snapshot into the newer one where the newer snapshot has no value.
+
+    Returns the number of values of the older snapshot that were replaced by newer values.
+    """
+
+    dropped = 0
+
+    if newer.deb_mode is None:
+        newer.deb_mode = older.deb_mode
+    elif older.deb_mode is not None:
+        dropped += 1
+
+    for aeb_id, state in older.aeb_state.items():
+        if aeb_id in newer.aeb_state:
+            dropped += 1
+        else:
+            newer.aeb_state[aeb_id] = state
+
+    if newer.dtc_in_mod is None:
+        newer.dtc_in_mod = older.dtc_in_mod
+    elif older.dtc_in_mod is not None:
+        dropped += 1
+
+    return dropped
+
@@ -0,0 +1,182 @@
+"""
+The connections to the control servers that receive commands from the App.
+
+Every command target, e.g. 'DPU' or 'SM', has its own pool of proxies. A proxy is only created when the first
+command for its target is dispatched, the proxy class is imported at that moment. When a control server can not be
+reached, the pool backs off exponentially before it tries to connect again, and a proxy that has been idle for a
+while is probed with a ping before it is used. This way a control server that is down or restarting only affects
+the commands to that target.
+"""
+
+import importlib
+import logging
+import threading
+import time
+
+from .metrics import counters
+
+_LOGGER = logging.getLogger("egse.f-fee-tui")
+
+TARGETS = {
+    'DPU': ("egse.dpu.fdpu", "FastCameraDPUProxy"),
+    'CM': ("egse.confman", "ConfigurationManagerProxy"),
+    'SM': ("egse.storage", "StorageProxy"),
+    'PM': ("egse.procman", "ProcessManagerProxy"),
+}
+"""The command targets and the (module, class) of the proxy for their control server."""
+
+
+def load_proxy_class(target: str):
+    """Import and return the proxy class for the given target."""
+
+    try:
+        module_name, class_name = TARGETS[target]
+    except KeyError:
+        raise ValueError(f"Unknown command target: {target}") from None
+
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class ProxyPool:
+    """
+    A pool of connected proxies for one command target.
+
+    Proxies are not thread-safe, a proxy is used by one thread at a time, see `acquire()` and `release()`. When
+    connecting fails, the next attempt is delayed by `min_backoff` seconds, doubling on each failure up to
+    `max_backoff` seconds. A proxy that was idle for more than `probe_after` seconds is pinged before it is handed
+    out and it is replaced when it doesn't respond.
+
+    The counters 'proxy.<target>.connects', 'proxy.<target>.failures' and 'proxy.<target>.probes' keep track of the
+    connection attempts.
+    """
+
+    def __init__(
+            self, target: str, factory=None, min_backoff: float = 0.5, max_backoff: float = 30.0,
+            probe_after: float = 10.0
+    ):
+        self.target = target
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.probe_after = probe_after
+
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._idle = []
+        """The (proxy, last_used) of the connected proxies that are not in use."""
+        self._backoff = min_backoff
+        self._next_attempt = 0.0
+        self._closed = False
+
+    def acquire(self, timeout: float, canceled: threading.Event):
+        """
+        Returns a connected proxy, creating a new one when no healthy proxy is idle.
+
+        Raises a ConnectionError when no connection could be made within `timeout` seconds, i.e. also when the next
+        connection attempt is scheduled after the timeout, or when `canceled` is set while waiting.
+        """
+
+        while (item := self._pop_idle()) is not None:
+            proxy, last_used = item
+            if time.monotonic() - last_used < self.probe_after or self.probe(proxy):
+                return proxy
+            self._disconnect(proxy)
+
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise ConnectionError(f"The proxy pool for {self.target} is closed.")
+                delay = self._next_attempt - time.monotonic()
+
+            if delay > 0:
+                if time.monotonic() + delay > deadline:
+                    raise ConnectionError(
+                        f"Couldn't connect to the {self.target} control server, next attempt in {delay:.1f}s."
+                    )
+                if canceled.wait(delay):
+                    raise ConnectionError(f"Canceled while connecting to the {self.target} control server.")
+
+            if (proxy := self._connect()) is not None:
+                return proxy
+
+    def release(self, proxy, healthy: bool = True) -> None:
+        """Return the proxy to the pool, an unhealthy proxy is disconnected and not reused."""
+
+        if healthy:
+            with self._lock:
+                if not self._closed:
+                    self._idle.append((proxy, time.monotonic()))
+                    return
+
+        self._disconnect(proxy)
+
+    def reset(self) -> None:
+        """Disconnect the idle proxies and forget the backoff, the next `acquire()` connects immediately."""
+
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._backoff = self.min_backoff
+            self._next_attempt = 0.0
+
+        for proxy, _ in idle:
+            self._disconnect(proxy)
+
+    def close(self) -> None:
+        """Disconnect all idle proxies, proxies that are released later are disconnected too."""
+
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+
+        for proxy, _ in idle:
+            self._disconnect(proxy)
+
+    def _pop_idle(self):
+        with self._lock:
+            return self._idle.pop() if self._idle else None
+
+    def _connect(self):
+        """Create and connect a proxy, returns None and schedules the next attempt when that fails."""
+
+        counters.increment(f"proxy.{self.target}.connects")
+
+        try:
+            if self._factory is None:
+                self._factory = load_proxy_class(self.target)
+            proxy = self._factory()
+            proxy.__enter__()
+            if not proxy.ping():
+                self._disconnect(proxy)
+                raise ConnectionError(f"The {self.target} control server doesn't respond to a ping.")
+        except (ImportError, ValueError):
+            raise
+        except Exception as exc:
+            counters.increment(f"proxy.{self.target}.failures")
+            with self._lock:
+                self._next_attempt = time.monotonic() + self._backoff
+                _LOGGER.warning(f"Couldn't connect to {self.target}, retrying in {self._backoff:.1f}s: {exc}")
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+            return None
+
+        with self._lock:
+            self._backoff = self.min_backoff
+            self._next_attempt = 0.0
+
+        return proxy
+
+    def probe(self, proxy) -> bool:
+        """Returns True when the control server responds to a ping over the given proxy."""
+
+        counters.increment(f"proxy.{self.target}.probes")
+        try:
+            return proxy.ping()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _disconnect(proxy) -> None:
+        try:
+            proxy.__exit__(None, None, None)
+        except Exception as exc:
+            _LOGGER.debug(f"Error while disconnecting {proxy}: {exc}")
@@ -0,0 +1,140 @@
+"""
+Replay of recorded telemetry through the monitoring pipeline of the App.
+
+The `Replayer` reads the capture files that were written by the `capture.Recorder` and feeds the messages from the
+data distribution to `Monitor.handle_messages()`, i.e. the same decode, snapshot and render path as for live data.
+No DPU, feesim or core services are needed. The messages are replayed in real time, N times faster, or as fast as
+possible, which makes the replay a throughput benchmark of the decode-and-render pipeline.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import pickle
+import time
+from typing import TYPE_CHECKING
+
+from .capture import CaptureReader
+from .capture import DATA_CHANNEL
+from .capture import find_capture_files
+from .messages import ReplayFinished
+from .metrics import counters
+
+if TYPE_CHECKING:
+    from .workers import Monitor
+
+_LOGGER = logging.getLogger("egse.f-fee-tui")
+
+
+class Replayer:
+    """
+    Replays capture files through the Monitor.
+
+    Args:
+        monitor: the Monitor that decodes the messages and posts the snapshots to the screen
+        name: a capture file or the prefix of a recording, see `capture.find_capture_files()`
+        speed: 1.0 for real time, N for N times faster, 0 for as fast as possible
+        start_cycle: the cycle to start the replay from
+    """
+
+    def __init__(self, monitor: 'Monitor', name: str, speed: float = 1.0, start_cycle: int = 0):
+        self.monitor = monitor
+        self.filenames = find_capture_files(name)
+        self.speed = speed
+        self.start_cycle = start_cycle
+
+        self._seek: int | None = start_cycle or None
+        self._base: tuple | None = None
+        """The (timestamp, loop time) from which the pace of the replay is calculated."""
+
+    def seek(self, cycle: int) -> None:
+        """Continue the replay from the start of the given cycle, this can be called while replaying."""
+        self._seek = cycle
+
+    async def run(self) -> None:
+        """Replay all the capture files, a ReplayFinished message is posted when done."""
+
+        loop = asyncio.get_running_loop()
+
+        # The Setup is taken from the cache when the configuration manager is not running. Without a Setup, only the
+        # timecodes are replayed, see `FrameDecoder`.
+
+        if (setup := await asyncio.wrap_future(self.monitor.setup_loader.start())) is None:
+            _LOGGER.warning("No Setup, only the timecodes are replayed.")
+
+        readers = [CaptureReader(filename) for filename in self.filenames]
+
+        n_messages = 0
+        start = time.perf_counter()
+
+        try:
+            position = (0, None)
+
+            while position is not None:
+                file_number, offset = position
+                reader = readers[file_number]
+                position = None
+
+                for _, timestamp, channel, parts in reader.records(offset):
+                    if self._seek is not None:
+                        position = self.locate(readers, self._seek)
+                        self._seek = None
+                        self._base = None
+                        break
+
+                    await self.pace(loop, timestamp)
+
+                    if channel == DATA_CHANNEL:
+                        sync_id, pickle_string = parts
+                        self.monitor.handle_shared_services(sync_id, pickle_string, time.monotonic())
+                        sync_id = int.from_bytes(sync_id, byteorder='big')
+                        if sync_id in self.monitor.handlers:
+                            self.monitor.handle_messages(sync_id, pickle.loads(pickle_string), setup)
+                    else:
+                        self.monitor.set_service_status(reader.channels[channel], False)
+
+                    n_messages += 1
+
+                else:
+                    if file_number + 1 < len(readers):
+                        position = (file_number + 1, None)
+
+            self.monitor.release_snapshot()
+
+        finally:
+            for reader in readers:
+                reader.close()
+
+        elapsed = time.perf_counter() - start
+
+        counters.set("replay.messages", n_messages)
+        counters.set("replay.elapsed_ms", int(elapsed * 1000))
+
+        self.monitor.outbox.put(ReplayFinished(n_messages, self.monitor.state.cycle, elapsed))
+
+    async def pace(self, loop: asyncio.AbstractEventLoop, timestamp: float) -> None:
+        """Wait until the message with the given timestamp is due, or only yield to the App when replaying at max."""
+
+        if not self.speed:
+            await asyncio.sleep(0)
+            return
+
+        if self._base is None:
+            self._base = (timestamp, loop.time())
+
+        delay = self._base[1] + (timestamp - self._base[0]) / self.speed - loop.time()
+
+        await asyncio.sleep(max(0.0, delay))
+
+    @staticmethod
+    def locate(readers: list, cycle: int) -> tuple | None:
+        """Returns the (file number, offset) of the given cycle, or of the start when the cycle wasn't recorded."""
+
+        for file_number, reader in enumerate(readers):
+            if reader.has_cycle(cycle):
+                return file_number, reader.offset_of_cycle(cycle)
+
+        _LOGGER.warning(f"Cycle {cycle} is not in the capture, replaying from the start.")
+
+        return 0, None
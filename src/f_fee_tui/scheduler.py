@@ -0,0 +1,162 @@
+"""
+The scheduler for the commands that are sent to the F-FEE.
+
+Commands are queued in priority lanes. The Command thread always takes the oldest command from the most urgent
+lane, so an emergency command like IMMEDIATE ON is never stuck behind a backlog of normal commands. Each command
+target has its own scheduler, a target that is not responding doesn't hold up the commands to the other targets.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from enum import IntEnum
+
+from .metrics import counters
+
+
+class Priority(IntEnum):
+    """The priority lanes of the command scheduler, lower values are dispatched first."""
+
+    EMERGENCY = 0
+    HIGH = 1
+    NORMAL = 2
+
+
+OBSOLETED_BY = {
+    "deb_set_immediate_on": frozenset({
+        "deb_set_on_mode",
+        "deb_set_standby_mode",
+        "deb_set_full_image_mode",
+        "deb_set_full_image_pattern_mode",
+        "deb_set_windowing_mode",
+        "deb_set_windowing_pattern_mode",
+        "aeb_set_init_mode",
+        "aeb_set_config_mode",
+        "aeb_set_image_mode",
+        "aeb_set_pattern_mode",
+        "set_fpga_defaults",
+        "deb_set_aeb_power_on",
+    }),
+}
+"""
+The queued commands that are dropped when the key command is submitted. IMMEDIATE ON drops the mode changes, the
+FPGA defaults and powering on the AEBs. Powering off the AEBs is kept, it's part of the Immediate ON sequence itself.
+"""
+
+
+class CommandScheduler:
+    """
+    A priority queue for the commands to one target, shared between the App and the command workers of the target.
+
+    * Commands are dispatched by priority, and in order of submission within the same priority.
+    * When a command is submitted that makes queued commands obsolete (see OBSOLETED_BY), those are canceled.
+    * A command that is identical to a command that is still queued is coalesced with it, i.e. the future of the
+      queued command is returned.
+
+    The queue depth of each lane over all targets is kept in the 'command.<lane>.depth' counter and the queue depth of
+    the target in 'command.<target>.depth'. The time the last dispatched command
+    of a lane waited in the queue in 'command.<lane>.wait_ms' and the maximum in 'command.<lane>.max_wait_ms'.
+    """
+
+    def __init__(self, target: str = "DPU"):
+        self.target = target
+        self._condition = threading.Condition()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._closed = False
+
+    def submit(self, request) -> Future:
+        """Queue the request, returns the future that resolves when the command is finished."""
+
+        with self._condition:
+            if self._closed:
+                future = Future()
+                future.cancel()
+                return future
+
+            for _, _, future, queued in self._heap:
+                if self._is_same(queued, request) and not future.cancelled():
+                    counters.increment("command.coalesced")
+                    return future
+
+            if obsolete := OBSOLETED_BY.get(request.command):
+                self._drop(lambda queued: queued.command in obsolete)
+
+            future = Future()
+            heapq.heappush(self._heap, (request.priority, next(self._sequence), future, request))
+            self._update_depth(request.priority, 1)
+            self._condition.notify()
+
+        return future
+
+    def get(self, timeout: float = None):
+        """
+        Returns the next (future, request) to dispatch, blocking until a command is available.
+
+        Returns None when the scheduler is closed or when the timeout expired.
+        """
+
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._heap or self._closed, timeout):
+                return None
+            if self._closed:
+                return None
+
+            priority, _, future, request = heapq.heappop(self._heap)
+            self._update_depth(priority, -1)
+
+        lane = Priority(priority).name
+        wait_ms = int((time.monotonic() - request.enqueued) * 1000)
+        counters.set(f"command.{lane}.wait_ms", wait_ms)
+        counters.maximum(f"command.{lane}.max_wait_ms", wait_ms)
+
+        return future, request
+
+    def clear(self) -> None:
+        """Cancel all queued commands, new commands are still accepted."""
+
+        with self._condition:
+            self._drop(lambda queued: True)
+
+    def close(self) -> None:
+        """Cancel all queued commands and wake up the Command thread, no commands are accepted anymore."""
+
+        with self._condition:
+            self._closed = True
+            self._drop(lambda queued: True)
+            self._condition.notify_all()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._heap)
+
+    def _drop(self, is_obsolete) -> None:
+        """Cancel and remove the queued commands for which `is_obsolete(request)` is True."""
+
+        keep = []
+        for item in self._heap:
+            if is_obsolete(item[3]):
+                item[2].cancel()
+                counters.increment("command.dropped")
+                self._update_depth(item[0], -1)
+            else:
+                keep.append(item)
+
+        heapq.heapify(keep)
+        self._heap = keep
+
+    def _update_depth(self, priority: int, delta: int) -> None:
+        counters.increment(f"command.{Priority(priority).name}.depth", delta)
+        counters.increment(f"command.{self.target}.depth", delta)
+
+    @staticmethod
+    def _is_same(queued, request) -> bool:
+        return (
+            queued.priority == request.priority
+            and queued.target == request.target
+            and queued.command == request.command
+            and list(queued.args) == list(request.args)
+            and queued.kwargs == request.kwargs
+        )
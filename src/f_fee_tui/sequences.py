@@ -0,0 +1,248 @@
+"""
+Command sequences that are confirmed by the HK of the F-FEE.
+
+Each step of a sequence sends its commands and then waits until the monitored state confirms the step, e.g. the
+DEB reached ON mode, or until the timeout of the step expires. A sequence therefore finishes as soon as the F-FEE
+confirms each step instead of waiting a fixed time after each command. Only HK that arrived after the commands of the
+step were sent can confirm the step. When a command of a step fails, the sequence is aborted.
+"""
+
+import asyncio
+import time
+
+from egse.fee.ffee import aeb_state
+from egse.fee.ffee import f_fee_mode
+
+from .scheduler import Priority
+from .state import MonitoredState
+from .transitions import AEB_STATE_COMMANDS
+from .transitions import DEB_MODE_COMMANDS
+
+AEB_IDS = ("AEB1", "AEB2", "AEB3", "AEB4")
+
+HK_CYCLE = 2.5
+"""
+The nominal time [s] between two HK packets of the same unit, i.e. the sync cycle of the F-FEE. A step waits at
+least two cycles for its confirmation, a confirmation in the first HK after the command can arrive a full cycle
+plus the latency of the DPU and the HK later.
+"""
+
+
+class Step:
+    """
+    A step in a command sequence.
+
+    Args:
+        description: a short description of the step, used in the report
+        commands: a list of (target, command, args) that are submitted at the start of the step
+        condition: a predicate `condition(state, since)` that confirms the step, or None. The `since` is the
+            revision of the MonitoredState before the commands were sent, see `MonitoredState.updated_since()`.
+        cycles: the number of sync cycles to wait when there is no condition
+        timeout: the maximum time [s] to wait for the confirmation
+        priority: the priority of the commands
+    """
+
+    def __init__(
+            self, description: str, commands: list, condition=None, cycles: int = 0, timeout: float = 5.0,
+            priority: Priority = Priority.NORMAL
+    ):
+        self.description = description
+        self.commands = commands
+        self.condition = condition
+        self.cycles = cycles
+        self.timeout = timeout
+        self.priority = priority
+
+
+class CommandFailed(Exception):
+    """A command of a step failed or was canceled."""
+
+
+class StepResult:
+    """The outcome of a step: was it confirmed and how long [s] did it take, the error when a command failed."""
+
+    def __init__(self, step: Step, confirmed: bool, duration: float, error: Exception = None):
+        self.step = step
+        self.confirmed = confirmed
+        self.duration = duration
+        self.error = error
+
+    def __repr__(self):
+        if self.error is not None:
+            return f"{self.step.description}: FAILED after {self.duration:.1f}s, {self.error}"
+        return f"{self.step.description}: {'confirmed' if self.confirmed else 'TIMEOUT'} after {self.duration:.1f}s"
+
+
+class Sequence:
+    """A named list of steps that are executed one after the other."""
+
+    def __init__(self, name: str, steps: list):
+        self.name = name
+        self.steps = steps
+
+    async def run(self, submit_command, state: MonitoredState) -> list:
+        """
+        Run the steps of the sequence, returns a list of StepResult.
+
+        The sequence is aborted when a command of a step fails, the result of that step is the last in the list.
+
+        Args:
+            submit_command: the function to submit a command, called as `submit_command(target, command, args,
+                priority=priority)`, it returns a Future that resolves with the finished CommandRequest
+            state: the monitored state to wait on
+        """
+
+        results = []
+
+        for step in self.steps:
+            start = time.monotonic()
+            since = state.revision
+
+            futures = [
+                submit_command(target, command, args, priority=step.priority) for target, command, args in step.commands
+            ]
+
+            try:
+                confirmed = await confirm_step(step, futures, state, since)
+            except CommandFailed as exc:
+                results.append(StepResult(step, False, time.monotonic() - start, exc))
+                break
+
+            results.append(StepResult(step, confirmed, time.monotonic() - start))
+
+        return results
+
+
+async def confirm_step(step: Step, futures: list, state: MonitoredState, since: int) -> bool:
+    """
+    Wait until the step is confirmed, returns False when it wasn't confirmed before the timeout of the step.
+
+    Raises CommandFailed as soon as one of the commands of the step fails. A step without condition or cycles is
+    confirmed when all its commands finished without error.
+    """
+
+    commands = asyncio.ensure_future(wait_for_commands(futures))
+
+    if step.condition is not None:
+        confirmation = state.wait_for(lambda s: step.condition(s, since), step.timeout)
+    elif step.cycles:
+        target_cycle = state.cycle + step.cycles
+        confirmation = state.wait_for(lambda s: s.cycle >= target_cycle, step.timeout)
+    else:
+        await commands
+        return True
+
+    confirmation = asyncio.ensure_future(confirmation)
+
+    try:
+        done, _ = await asyncio.wait({commands, confirmation}, return_when=asyncio.FIRST_COMPLETED)
+        if commands in done:
+            commands.result()  # raises CommandFailed
+        return await confirmation
+    finally:
+        commands.cancel()
+        confirmation.cancel()
+
+
+async def wait_for_commands(futures: list) -> None:
+    """Wait until all commands are finished, raises CommandFailed when a command failed or was canceled."""
+
+    for future in futures:
+        try:
+            # The command itself is not canceled when the wait is canceled.
+            request = await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            if future.cancelled():
+                raise CommandFailed("the command was canceled") from None
+            raise
+        if request.error is not None:
+            raise CommandFailed(f"{request.command} failed: {request.error}")
+
+
+def deb_in_mode(mode: f_fee_mode):
+    """Returns a condition that is True when DEB HK that arrived after the commands reports the given mode."""
+    return lambda state, since: state.updated_since("deb_mode", since) and state.deb_mode == mode
+
+
+def aeb_in_state(aeb_id: str, *states: aeb_state):
+    """Returns a condition that is True when AEB HK that arrived after the commands reports one of the given states."""
+    return lambda state, since: state.updated_since(aeb_id, since) and state.aeb_state.get(aeb_id) in states
+
+
+def all_aebs_in_state(*states: aeb_state):
+    """
+    Returns a condition that is True when all AEBs that reported HK are in one of the given states, and HK of at least
+    one AEB arrived after the commands. The condition is never True when no AEB reported HK.
+    """
+
+    def condition(state, since):
+        return (
+            bool(state.aeb_state)
+            and any(state.updated_since(aeb_id, since) for aeb_id in state.aeb_state)
+            and all(aeb_status in states for aeb_status in state.aeb_state.values())
+        )
+
+    return condition
+
+
+def immediate_on_sequence() -> Sequence:
+    """The Immediate ON Sequence (Section 9.2 in F-FEE CD ICD v2.6)."""
+
+    return Sequence("IMMEDIATE ON", [
+        Step(
+            "DEB to ON mode", [("DPU", "deb_set_immediate_on", [])],
+            condition=deb_in_mode(f_fee_mode.ON_MODE), timeout=5.0, priority=Priority.EMERGENCY
+        ),
+        Step(
+            "AEBs to INIT", [("DPU", "aeb_set_init_mode", [aeb_id]) for aeb_id in AEB_IDS],
+            condition=all_aebs_in_state(aeb_state.INIT, aeb_state.OFF), timeout=6.0, priority=Priority.HIGH
+        ),
+        Step(
+            "AEBs power OFF", [("DPU", "deb_set_aeb_power_off", [True, True, True, True])],
+            condition=all_aebs_in_state(aeb_state.OFF), timeout=5.0, priority=Priority.HIGH
+        ),
+    ])
+
+
+def set_fpga_defaults_sequence() -> Sequence:
+    """Set the FPGA defaults for the DEB, power on the AEBs one by one, then set the FPGA defaults for the AEBs."""
+
+    steps = [Step("FPGA defaults for the DEB", [("DPU", "set_fpga_defaults", ["DEB"])], cycles=1, timeout=2 * HK_CYCLE)]
+
+    # A powered on AEB passes through POWER_UP before it reports INIT, allow an extra cycle for that.
+
+    power_on_sequence = [False, False, False, False]
+    for idx, aeb_id in enumerate(AEB_IDS):
+        power_on_sequence[idx] = True
+        steps.append(Step(
+            f"{aeb_id} power ON", [("DPU", "deb_set_aeb_power_on", list(power_on_sequence))],
+            condition=aeb_in_state(aeb_id, aeb_state.INIT), timeout=3 * HK_CYCLE
+        ))
+
+    steps.append(Step("FPGA defaults for the AEBs", [("DPU", "set_fpga_defaults", [aeb_id]) for aeb_id in AEB_IDS]))
+
+    return Sequence("Set FPGA Defaults", steps)
+
+
+def deb_mode_sequence(route: list) -> Sequence:
+    """Bring the DEB into the last mode of the route, confirming each mode on the way."""
+
+    return Sequence(f"DEB to {route[-1].name}", [
+        Step(
+            f"DEB to {mode.name}", [("DPU", DEB_MODE_COMMANDS[mode], [])],
+            condition=deb_in_mode(mode), timeout=5.0
+        )
+        for mode in route
+    ])
+
+
+def aeb_state_sequence(aeb_id: str, route: list) -> Sequence:
+    """Bring the AEB into the last state of the route, confirming each state on the way."""
+
+    return Sequence(f"{aeb_id} to {route[-1].name}", [
+        Step(
+            f"{aeb_id} to {state.name}", [("DPU", AEB_STATE_COMMANDS[state], [aeb_id])],
+            condition=aeb_in_state(aeb_id, state), timeout=5.0
+        )
+        for state in route
+    ])
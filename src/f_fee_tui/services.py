@@ -11,6 +11,10 @@ def log_message(app, name, sync_id, message, timed_out: bool):
     ...
 
 
+# The 'decode' key determines if the messages of a service are unpickled. Most services are only monitored for
+# liveness, i.e. we only need to know that a message arrived. For those services the frames and bytes are counted
+# in the 'service.<name>.frames' and 'service.<name>.bytes' counters, but the payload is never deserialized.
+
 services = {
     'cm_cs': {
         'description': "The Configuration Control Server",
@@ -18,6 +22,7 @@ services = {
         'port': 6001,
         'type': zmq.SUB,
         'multipart': False,
+        'decode': False,
         'sock': None,
         'interval': 3,
         'last_received': time.monotonic(),
@@ -30,6 +35,7 @@ services = {
         'port': 6101,
         'type': zmq.SUB,
         'multipart': False,
+        'decode': False,
         'sock': None,
         'interval': 3,
         'last_received': time.monotonic(),
@@ -42,6 +48,7 @@ services = {
         'port': 6201,
         'type': zmq.SUB,
         'multipart': False,
+        'decode': False,
         'sock': None,
         'interval': 3,
         'last_received': time.monotonic(),
@@ -54,6 +61,7 @@ services = {
         'port': 6205,
         'type': zmq.SUB,
         'multipart': False,
+        'decode': False,
         'sock': None,
         'interval': 3,
         'last_received': time.monotonic(),
@@ -68,6 +76,7 @@ services = {
         'type': zmq.SUB,
         'subscribe': MessageIdentifier.STATUS.to_bytes(1, byteorder='big'),
         'multipart': True,
+        'decode': False,
         'sock': None,
         'interval': 3,
         'last_received': time.monotonic(),
@@ -80,6 +89,7 @@ services = {
         'port': 6601,  # MONITORING_PORT
         'type': zmq.SUB,
         'multipart': False,
+        'decode': False,
         'sock': None,
         'interval': 3,
         'last_received': time.monotonic(),
@@ -87,14 +97,18 @@ services = {
         'callback': log_message
     },
     # Monitor DATA_DISTRIBUTION port, this data is sent out by the Data Processor,
-    # Subscribe to the SYNC_TIMECODE which is sent out every 2.5s for the F-CAM. Other sync identifiers are ignored.
+    # Follow the SYNC_TIMECODE which is sent out every 2.5s for the F-CAM. Other sync identifiers are ignored.
+    # This service is 'shared', i.e. it has no socket of its own, the messages are taken from the subscription
+    # of the Monitor on the same port.
     "data": {
         'description': "The Data Distribution by the Data Processor",
         'hostname': 'localhost',
         'port': 30103,  # DATA_DISTRIBUTION_PORT
         'type': zmq.SUB,
         'subscribe': MessageIdentifier.SYNC_TIMECODE.to_bytes(1, byteorder='big'),
+        'shared': True,
         'multipart': True,
+        'decode': False,
         'sock': None,
         'interval': 5,
         'last_received': time.monotonic(),
@@ -104,11 +118,15 @@ services = {
 }
 
 
-async def handle_multi_part(sock: zmq.Socket, message_id: bytes) -> Tuple[int, list]:
+async def handle_multi_part(sock: zmq.Socket, message_id: bytes, raw_parts: list = None) -> Tuple[int, list]:
     message_parts = []
+    if raw_parts is not None:
+        raw_parts.append(message_id)
     message_id = int.from_bytes(message_id, byteorder='big')
     while True:
         part = await sock.recv()
+        if raw_parts is not None:
+            raw_parts.append(part)
         message_parts.append(pickle.loads(part))
         if not sock.getsockopt(zmq.RCVMORE):
             break
@@ -116,8 +134,40 @@ async def handle_multi_part(sock: zmq.Socket, message_id: bytes) -> Tuple[int, l
     return message_id, message_parts
 
 
-async def handle_single_part(sock: zmq.Socket, message: bytes) -> Tuple[int, list]:
+async def handle_liveness(sock: zmq.Socket, message: bytes, raw_parts: list = None) -> Tuple[int, int, int]:
+    """
+    Receives the remaining parts of the message without deserializing them.
+
+    Returns the message identifier, the number of frames, and the number of bytes of the message. For multipart
+    messages, the message identifier is taken from the first frame, for single part messages it is ALL. When a
+    `raw_parts` list is given, the raw parts of the message are appended to it, e.g. for recording.
+    """
+    n_frames = 1
+    n_bytes = len(message)
+
+    if raw_parts is not None:
+        raw_parts.append(message)
+
+    if not sock.getsockopt(zmq.RCVMORE):
+        return MessageIdentifier.ALL, n_frames, n_bytes
+
+    message_id = int.from_bytes(message, byteorder='big')
+    while True:
+        part = await sock.recv(copy=False)
+        n_frames += 1
+        n_bytes += len(part)
+        if raw_parts is not None:
+            raw_parts.append(part.bytes)
+        if not sock.getsockopt(zmq.RCVMORE):
+            break
+
+    return message_id, n_frames, n_bytes
+
+
+async def handle_single_part(sock: zmq.Socket, message: bytes, raw_parts: list = None) -> Tuple[int, list]:
     message_id = MessageIdentifier.ALL
+    if raw_parts is not None:
+        raw_parts.append(message)
     response = pickle.loads(message)
 
     return message_id, [response]
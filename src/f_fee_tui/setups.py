@@ -0,0 +1,219 @@
+"""
+Loading of the Setup in the background, with a cache on disk for warm starts.
+
+Loading the Setup needs a round trip to the configuration manager, while the App only needs the register and HK
+definitions from it to decode the telemetry. The `SetupLoader` loads the Setup in a thread. When a Setup was cached
+by a previous run, it's used at once and replaced when the configuration manager has a Setup with another id. When
+the configuration manager can not be reached, the cached Setup is used and loading is retried in the background.
+
+The Setups are cached as pickle files `setup-<id>.pickle` in `$XDG_CACHE_HOME/f-fee-tui` (`~/.cache/f-fee-tui` by
+default), the file `latest` holds the id of the Setup that was loaded last.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+from .metrics import counters
+
+_LOGGER = logging.getLogger("egse.f-fee-tui")
+
+CACHE_SIZE = 5
+"""The number of Setups that are kept in the cache."""
+
+
+def cache_directory() -> Path:
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "f-fee-tui"
+
+
+def get_setup_id(setup) -> str | None:
+    """Returns the id of the Setup, or None when it has no id."""
+    try:
+        return str(setup.get_id())
+    except Exception:
+        return None
+
+
+def read_cached_setup(directory: Path = None):
+    """Returns the Setup that was loaded last, or None when no Setup is cached or it can't be read."""
+
+    directory = directory or cache_directory()
+
+    try:
+        setup_id = (directory / "latest").read_text().strip()
+        with open(directory / f"setup-{setup_id}.pickle", "rb") as fd:
+            return pickle.load(fd)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        _LOGGER.warning(f"Couldn't read the cached Setup from {directory}: {exc}")
+        return None
+
+
+def write_cached_setup(setup, directory: Path = None) -> None:
+    """Cache the Setup under its id, only the last `CACHE_SIZE` Setups are kept."""
+
+    if (setup_id := get_setup_id(setup)) is None:
+        return
+
+    directory = directory or cache_directory()
+
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first, so that another App never reads a partial file.
+
+        filename = directory / f"setup-{setup_id}.pickle"
+        temporary = filename.with_suffix(f".{os.getpid()}.tmp")
+        with open(temporary, "wb") as fd:
+            pickle.dump(setup, fd, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, filename)
+
+        temporary = directory / f"latest.{os.getpid()}.tmp"
+        temporary.write_text(setup_id)
+        os.replace(temporary, directory / "latest")
+
+        for old in sorted(directory.glob("setup-*.pickle"), key=lambda path: path.stat().st_mtime)[:-CACHE_SIZE]:
+            old.unlink()
+    except Exception as exc:
+        _LOGGER.warning(f"Couldn't cache Setup {setup_id} in {directory}: {exc}")
+
+
+class SetupLoader:
+    """
+    Loads the Setup in a background thread, a cached Setup is used until the configuration manager confirms it.
+
+    `start()` returns a future that resolves as soon as a Setup is available, from the cache or from the
+    configuration manager. When no Setup is available at all, the future resolves with None, like `load()` returns
+    None, and the status is 'No Setup'. The loader keeps trying in the background and publishes the Setup when the
+    configuration manager has one, see `start()`. Take the Setup from `setup` each time it's needed, it's replaced
+    when the configuration manager has another Setup than the cached one. The `status` describes where the Setup came
+    from, it is shown in the App. The time until the first Setup was available is kept in the 'startup.setup_ms'
+    counter.
+    """
+
+    def __init__(
+            self, use_cache: bool = True, directory: Path = None, retry_interval: float = 1.0,
+            max_retry_interval: float = 60.0
+    ):
+        self.use_cache = use_cache
+        self.directory = directory
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+
+        self.setup = None
+        self.status = "Loading the Setup"
+        self.confirmed = False
+        """True when the Setup was loaded from the configuration manager."""
+
+        self._future = Future()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = None
+        self._failures = 0
+
+    def start(self) -> Future:
+        """
+        Start loading in a background thread, when not yet started. Returns the future of the first Setup.
+
+        While the configuration manager can not be reached, the thread tries again after `retry_interval` seconds,
+        doubling up to `max_retry_interval` seconds, and publishes the Setup when it arrives. The retries are
+        counted in 'setup.retries'.
+        """
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="f-fee-tui-setup-loader", daemon=True)
+                self._thread.start()
+
+        return self._future
+
+    def stop(self) -> None:
+        """Stop retrying to load the Setup."""
+        self._stop.set()
+
+    def load(self):
+        """Load the Setup in the current thread, returns the Setup or None when no Setup is available."""
+
+        self._started = time.monotonic()
+
+        cached = read_cached_setup(self.directory) if self.use_cache else None
+        cached_id = get_setup_id(cached)
+
+        if cached is not None:
+            self._publish(cached, f"Setup {cached_id} (cached)")
+
+        self.status = (
+            f"Setup {cached_id} (cached, checking)" if cached is not None
+            else "Loading the Setup from the configuration manager"
+        )
+
+        self._load_from_configuration_manager()
+
+        return self.setup
+
+    def _run(self) -> None:
+
+        self.load()
+
+        interval = self.retry_interval
+
+        while not self.confirmed and not self._stop.wait(interval):
+            counters.increment("setup.retries")
+            self._load_from_configuration_manager()
+            interval = min(interval * 2, self.max_retry_interval)
+
+    def _load_from_configuration_manager(self) -> None:
+        """Load the Setup from the configuration manager, it replaces the current Setup when it has another id."""
+
+        current, current_id = self.setup, get_setup_id(self.setup)
+
+        # Only the first failure is reported, the retries are logged at debug level.
+
+        log = _LOGGER.warning if not self._failures else _LOGGER.debug
+
+        try:
+            from egse.setup import load_setup
+
+            if (setup := load_setup()) is None:
+                raise ConnectionError("The configuration manager returned no Setup.")
+        except Exception as exc:
+            self._failures += 1
+            if current is not None:
+                self.status = f"Setup {current_id} (cached, configuration manager not reachable)"
+                log(f"Couldn't load the Setup, using the cached Setup {current_id}: {exc}")
+            else:
+                log(f"Couldn't load the Setup, only the timecodes can be decoded: {exc}")
+                self._publish(None, "No Setup")
+            return
+
+        self.confirmed = True
+        setup_id = get_setup_id(setup)
+
+        if current is None or setup_id is None or setup_id != current_id:
+            if current is not None:
+                _LOGGER.info(f"The cached Setup {current_id} is replaced by Setup {setup_id}.")
+            elif self._failures:
+                _LOGGER.info(f"Setup {setup_id} loaded, the configuration manager is reachable again.")
+            self._publish(setup, "Setup loaded" if setup_id is None else f"Setup {setup_id}")
+        else:
+            self.status = f"Setup {setup_id}"
+
+        if self.use_cache:
+            write_cached_setup(setup, self.directory)
+
+    def _publish(self, setup, status: str) -> None:
+
+        self.setup = setup
+        self.status = status
+
+        if not self._future.done():
+            counters.set("startup.setup_ms", int((time.monotonic() - self._started) * 1000))
+            self._future.set_result(setup)
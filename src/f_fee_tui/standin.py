@@ -0,0 +1,619 @@
+"""
+A stand-in for the DPU Processor and the core services, for load testing the App on a laptop or in CI.
+
+The App only shows something when the core services and the DPU Processor are live. The stand-in publishes on the
+same ports:
+
+* the SYNC_TIMECODE, SYNC_HK_DATA (DEB and AEB1 to AEB4) and F_FEE_REGISTER_MAP frames on the data distribution
+  port, once every cycle,
+* a heartbeat on the monitoring port of each service in `services.services`,
+
+and it accepts commands on the commanding port of the DPU Processor. The DEB mode, the AEB states and the DTC_IN_MOD
+values follow the commands, they are written into the HK packets and the register map with the same field tables
+that the App uses for decoding, see `decoding.FieldExtractor.insert()`. The cycle time and the payload sizes are
+configurable, e.g. to run at 10 times the nominal cycle of 2.5s:
+
+    $ python -m f_fee_tui.standin --speed 10
+    $ f-fee-tui --stand-in
+
+The commanding protocol of the egse is not reproduced. A command is a JSON request {"command", "args", "kwargs"}
+on a REQ/REP socket and the reply is {"status": "ok", "value"} or {"status": "error", "error", "message"}, the
+stand-in never unpickles what it receives. Use the `StandInDPUProxy` for the DPU target of the App, see
+`use_stand_in()`.
+
+The sockets are bound to 127.0.0.1 by default, use `--address '*'` to drive the stand-in from another host.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import pickle
+import random
+import threading
+import time
+
+import zmq
+from egse.fee.ffee import HousekeepingData
+from egse.fee.ffee import aeb_state
+from egse.fee.ffee import f_fee_mode
+from egse.reg import RegisterMap
+from egse.settings import Settings
+from egse.zmq import MessageIdentifier
+
+from .decoding import DTC_IN_MOD_FIELDS
+from .decoding import FieldExtractor
+from .decoding import HK_FIELDS
+from .decoding import WORD_SIZE
+from .decoding import compile_fields
+from .decoding import find_units
+from .metrics import counters
+from .proxies import TARGETS
+from .sequences import AEB_IDS
+from .services import services
+from .setups import SetupLoader
+from .transitions import AEB_TRANSITIONS
+from .transitions import DEB_TRANSITIONS
+
+try:
+    import numpy as np
+except ImportError:  # numpy is normally installed with the egse
+    np = None
+
+_LOGGER = logging.getLogger("egse.f-fee-tui")
+
+NOMINAL_CYCLE_TIME = 2.5
+"""The time [s] between two sync pulses of the F-FEE."""
+
+DEFAULT_COMMANDING_PORT = 6600
+"""The commanding port of the stand-in when the DPU Processor settings have no COMMANDING_PORT."""
+
+TIMECODE_MODULO = 64
+"""The timecode wraps around like a SpaceWire time-code."""
+
+
+class SimulatedFEE:
+    """
+    The DEB mode, AEB states and DTC_IN_MOD values of the stand-in.
+
+    The public methods are the commands that the stand-in accepts. Like the F-FEE, a mode or state command that is
+    not allowed from the current mode or state is ignored. Powering an AEB on or off takes one cycle, during that
+    cycle the AEB is in POWER_UP or POWER_DOWN.
+    """
+
+    COMMANDS = (
+        "ping",
+        "deb_set_immediate_on", "deb_set_on_mode", "deb_set_standby_mode", "deb_set_full_image_mode",
+        "deb_set_full_image_pattern_mode",
+        "aeb_set_init_mode", "aeb_set_config_mode", "aeb_set_image_mode",
+        "deb_set_aeb_power_on", "deb_set_aeb_power_off",
+        "set_fpga_defaults", "set_dtc_in_mod",
+    )
+    """The commands that are accepted, all other commands raise an AttributeError in the proxy."""
+
+    def __init__(self):
+        self.deb_mode = f_fee_mode.ON_MODE
+        self.aeb_state = {aeb_id: aeb_state.OFF for aeb_id in AEB_IDS}
+        self.dtc_in_mod = (0,) * len(DTC_IN_MOD_FIELDS)
+
+    def next_cycle(self) -> None:
+        """Finish the transitions that take a cycle."""
+
+        for aeb_id, state in self.aeb_state.items():
+            if state == aeb_state.POWER_UP:
+                self.aeb_state[aeb_id] = aeb_state.INIT
+            elif state == aeb_state.POWER_DOWN:
+                self.aeb_state[aeb_id] = aeb_state.OFF
+
+    def ping(self) -> bool:
+        return True
+
+    def deb_set_immediate_on(self) -> None:
+        self.deb_mode = f_fee_mode.ON_MODE
+
+    def deb_set_on_mode(self) -> None:
+        self._set_deb_mode(f_fee_mode.ON_MODE)
+
+    def deb_set_standby_mode(self) -> None:
+        self._set_deb_mode(f_fee_mode.STANDBY_MODE)
+
+    def deb_set_full_image_mode(self) -> None:
+        self._set_deb_mode(f_fee_mode.FULL_IMAGE_MODE)
+
+    def deb_set_full_image_pattern_mode(self) -> None:
+        self._set_deb_mode(f_fee_mode.FULL_IMAGE_PATTERN_MODE)
+
+    def aeb_set_init_mode(self, aeb_id: str) -> None:
+        self._set_aeb_state(aeb_id, aeb_state.INIT)
+
+    def aeb_set_config_mode(self, aeb_id: str) -> None:
+        self._set_aeb_state(aeb_id, aeb_state.CONFIG)
+
+    def aeb_set_image_mode(self, aeb_id: str) -> None:
+        self._set_aeb_state(aeb_id, aeb_state.IMAGE)
+
+    def deb_set_aeb_power_on(self, aeb1, aeb2, aeb3, aeb4) -> None:
+        for aeb_id, power in zip(AEB_IDS, (aeb1, aeb2, aeb3, aeb4)):
+            if power and self.aeb_state[aeb_id] == aeb_state.OFF:
+                self.aeb_state[aeb_id] = aeb_state.POWER_UP
+
+    def deb_set_aeb_power_off(self, aeb1, aeb2, aeb3, aeb4) -> None:
+        for aeb_id, power in zip(AEB_IDS, (aeb1, aeb2, aeb3, aeb4)):
+            if power and self.aeb_state[aeb_id] != aeb_state.OFF:
+                self.aeb_state[aeb_id] = aeb_state.POWER_DOWN
+
+    def set_fpga_defaults(self, unit: str) -> None:
+        ...
+
+    def set_dtc_in_mod(self, *values) -> None:
+        """Set the T0 to T7 IN_MOD values, this command only exists for the stand-in, e.g. for benchmarks."""
+        if len(values) != len(self.dtc_in_mod):
+            raise ValueError(f"Expected {len(self.dtc_in_mod)} DTC_IN_MOD values, got {len(values)}.")
+        self.dtc_in_mod = tuple(int(value) for value in values)
+
+    def _set_deb_mode(self, mode: f_fee_mode) -> None:
+        if mode in DEB_TRANSITIONS.get(self.deb_mode, ()):
+            self.deb_mode = mode
+        else:
+            _LOGGER.debug(f"Ignored DEB {mode.name}, not allowed from {f_fee_mode(self.deb_mode).name}.")
+
+    def _set_aeb_state(self, aeb_id: str, state: aeb_state) -> None:
+        if state in AEB_TRANSITIONS.get(self.aeb_state[aeb_id], ()):
+            self.aeb_state[aeb_id] = state
+        else:
+            _LOGGER.debug(f"Ignored {aeb_id} {state.name}, not allowed from {self.aeb_state[aeb_id].name}.")
+
+
+class PayloadEncoder:
+    """
+    Creates the raw HK packets and register memory map with the values of the SimulatedFEE.
+
+    The field tables are compiled, like in the App, by probing the egse decoders with the given Setup, so the App
+    decodes the same values from the payloads. When a table can not be compiled, e.g. because the payload is smaller
+    than the offset of a field, the payload is published without the values and a warning is logged.
+
+    The HK packets are filled with new random bytes every cycle, like HK values that change all the time. The
+    register map is filled once, after that only the fields and, with `churn`, a random register word change.
+    """
+
+    def __init__(self, setup, hk_size: int = 256, register_map_size: int = 4096, churn: float = 0.0):
+        self.setup = setup
+        self.hk_size = hk_size
+        self.register_map_size = register_map_size - register_map_size % WORD_SIZE
+        self.churn = churn
+
+        self._hk_encoders = {
+            hk_type: self._compile(
+                f"{hk_type} HK", lambda raw, hk_type=hk_type: self._decode_hk(hk_type, raw), hk_size, 1
+            )
+            for hk_type in HK_FIELDS
+        }
+        self._register_map_encoder = self._compile(
+            "register map", self._decode_register_map, self.register_map_size, WORD_SIZE
+        )
+        self._register_map = bytearray(os.urandom(self.register_map_size))
+
+    def hk_packet(self, hk_type: str, values: tuple) -> bytes:
+        raw = bytearray(os.urandom(self.hk_size))
+        if (encoder := self._hk_encoders[hk_type]) is not None:
+            encoder.insert(raw, values)
+        return bytes(raw)
+
+    def register_map(self, values: tuple):
+        raw = self._register_map
+        if self.churn and random.random() < self.churn:
+            word = random.randrange(len(raw) // WORD_SIZE) * WORD_SIZE
+            raw[word:word + WORD_SIZE] = os.urandom(WORD_SIZE)
+        if self._register_map_encoder is not None:
+            self._register_map_encoder.insert(raw, values)
+        return as_memory_map(bytes(raw))
+
+    def _decode_hk(self, hk_type: str, raw: bytes) -> tuple:
+        hk_data = HousekeepingData(hk_type, raw, self.setup)
+        return tuple(hk_data[group, name] for group, name in HK_FIELDS[hk_type])
+
+    def _decode_register_map(self, raw: bytes) -> tuple:
+        register_map = RegisterMap("F-FEE", memory_map=as_memory_map(raw), setup=self.setup)
+        return tuple(register_map[reg_name, var_name] for reg_name, var_name in DTC_IN_MOD_FIELDS)
+
+    @staticmethod
+    def _compile(name: str, decode, size: int, unit_size: int) -> FieldExtractor | None:
+
+        raw = bytes(size)
+
+        try:
+            encoder = compile_fields(decode, raw, find_units(decode, raw, unit_size), unit_size)
+        except Exception as exc:
+            encoder = None
+            _LOGGER.debug(f"Compiling the fields of the {name} failed: {exc}")
+
+        if encoder is None:
+            _LOGGER.warning(f"The monitored fields can not be written into a {name} of {size} bytes.")
+
+        return encoder
+
+
+def as_memory_map(raw: bytes):
+    """Returns the raw memory map as a numpy array, like the DPU Processor sends it, or as bytes without numpy."""
+    return raw if np is None else np.frombuffer(raw, dtype=np.uint8).copy()
+
+
+class StandIn:
+    """
+    Publishes the data distribution and the service heartbeats, and executes the commands, in a single thread.
+
+    Args:
+        cycle_time: the time [s] between two timecodes, 2.5s for the F-FEE
+        hk_size: the size [bytes] of the HK packets
+        register_map_size: the size [bytes] of the register memory map
+        heartbeat_interval: the time [s] between two heartbeats of the services
+        churn: the fraction of cycles in which a random register word changes
+        address: the address the sockets are bound to, only the local host by default
+        commanding_port: the port for the commands, by default the commanding port of the DPU Processor, see
+            `load_commanding_port()`
+        setup: the Setup for the field tables, by default the Setup is loaded like in the App, see `SetupLoader`
+
+    The counters 'standin.cycles', 'standin.frames', 'standin.bytes', 'standin.commands' and 'standin.overruns'
+    report what was published and executed. An overrun is a cycle that started more than a cycle time late.
+    """
+
+    def __init__(
+            self, cycle_time: float = NOMINAL_CYCLE_TIME, hk_size: int = 256, register_map_size: int = 4096,
+            heartbeat_interval: float = 1.0, churn: float = 0.0, address: str = "127.0.0.1",
+            commanding_port: int = None, setup=None
+    ):
+        self.cycle_time = cycle_time
+        self.heartbeat_interval = heartbeat_interval
+        self.address = address
+        self.commanding_port = load_commanding_port() if commanding_port is None else commanding_port
+
+        self.fee = SimulatedFEE()
+        self.encoder = PayloadEncoder(
+            SetupLoader().load() if setup is None else setup, hk_size, register_map_size, churn
+        )
+
+        self.changed_at = {}
+        """
+        The time [time.perf_counter()] the published value of 'DEB', 'AEB1' to 'AEB4' and 'DTC_IN_MOD' last changed,
+        e.g. to measure the latency until the App shows the new value.
+        """
+        self.last_command = None
+        """The (time.perf_counter(), command) of the last command that was received."""
+
+        self._published = {}
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._started = threading.Event()
+
+    def start(self) -> None:
+        """Run the stand-in in a background thread, returns when the sockets are bound."""
+
+        self._thread = threading.Thread(target=self.run, name="f-fee-tui-standin", daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run(self) -> None:
+        """Publish and execute commands until `stop()` is called."""
+
+        context = zmq.Context.instance()
+        sockets = []
+
+        try:
+            data = context.socket(zmq.PUB)
+            data.bind(f"tcp://{self.address}:{Settings.load('DPU Processor').DATA_DISTRIBUTION_PORT}")
+            sockets.append(data)
+
+            commanding = context.socket(zmq.REP)
+            commanding.bind(f"tcp://{self.address}:{self.commanding_port}")
+            sockets.append(commanding)
+
+            heartbeats = {}
+            for name, props in services.items():
+                if props.get('shared', False):
+                    continue
+                sock = context.socket(zmq.PUB)
+                sock.bind(f"tcp://{self.address}:{props['port']}")
+                sockets.append(sock)
+                heartbeats[name] = sock
+
+            self._started.set()
+
+            self._run(data, commanding, heartbeats)
+
+        finally:
+            self._started.set()
+            for sock in sockets:
+                sock.close(linger=0)
+
+    def _run(self, data: zmq.Socket, commanding: zmq.Socket, heartbeats: dict) -> None:
+
+        poller = zmq.Poller()
+        poller.register(commanding, zmq.POLLIN)
+
+        timecode = 0
+        next_cycle = next_heartbeat = time.monotonic()
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+
+            if now >= next_cycle:
+                if now - next_cycle > self.cycle_time:
+                    counters.increment("standin.overruns")
+                    next_cycle = now
+                self.publish_cycle(data, timecode)
+                timecode = (timecode + 1) % TIMECODE_MODULO
+                next_cycle += self.cycle_time
+
+            if now >= next_heartbeat:
+                self.publish_heartbeats(heartbeats)
+                next_heartbeat = now + self.heartbeat_interval
+
+            # Wait for commands until the next frame is due, but check the stop flag regularly.
+
+            timeout = min(next_cycle, next_heartbeat, now + 0.1) - time.monotonic()
+
+            if poller.poll(max(0, int(timeout * 1000))):
+                self.execute(commanding)
+
+    def publish_cycle(self, sock: zmq.Socket, timecode: int) -> None:
+        """Publish the timecode, the DEB and AEB HK, and the register map of a new cycle."""
+
+        fee = self.fee
+        fee.next_cycle()
+        timestamp = time.time()
+
+        self._publish(sock, MessageIdentifier.SYNC_TIMECODE, (timecode, timestamp))
+
+        self._publish(sock, MessageIdentifier.SYNC_HK_DATA, (
+            'command_deb_read_hk', [], self.encoder.hk_packet("DEB", (fee.deb_mode,)), timestamp
+        ), "DEB", fee.deb_mode)
+        for aeb_id in AEB_IDS:
+            self._publish(sock, MessageIdentifier.SYNC_HK_DATA, (
+                'command_aeb_read_hk', [aeb_id], self.encoder.hk_packet(aeb_id, (fee.aeb_state[aeb_id],)), timestamp
+            ), aeb_id, fee.aeb_state[aeb_id])
+
+        self._publish(sock, MessageIdentifier.F_FEE_REGISTER_MAP, (
+            self.encoder.register_map(fee.dtc_in_mod), timestamp
+        ), "DTC_IN_MOD", fee.dtc_in_mod)
+
+        counters.increment("standin.cycles")
+
+    def publish_heartbeats(self, heartbeats: dict) -> None:
+
+        payload = pickle.dumps({"timestamp": time.time()})
+
+        for name, sock in heartbeats.items():
+            props = services[name]
+            if props['multipart']:
+                sock.send_multipart([props.get('subscribe', b'\x00'), payload])
+            else:
+                sock.send(payload)
+
+    def execute(self, sock: zmq.Socket) -> None:
+        """Execute a JSON command request, the reply has the value or the error of the command."""
+
+        try:
+            command, args, kwargs = parse_request(sock.recv())
+        except ValueError as exc:
+            sock.send_json(error_reply(exc))
+            return
+
+        self.last_command = time.perf_counter(), command
+        counters.increment("standin.commands")
+
+        if command not in SimulatedFEE.COMMANDS:
+            reply = error_reply(AttributeError(f"No such command for the stand-in: {command}"))
+        else:
+            try:
+                reply = {"status": "ok", "value": getattr(self.fee, command)(*args, **kwargs)}
+            except Exception as exc:
+                reply = error_reply(exc)
+
+        sock.send_json(reply)
+
+    def _publish(self, sock: zmq.Socket, sync_id: MessageIdentifier, payload, name: str = None, value=None) -> None:
+
+        pickle_string = pickle.dumps(payload)
+        sock.send_multipart([sync_id.to_bytes(1, byteorder='big'), pickle_string])
+
+        if name is not None and self._published.get(name) != value:
+            self._published[name] = value
+            self.changed_at[name] = time.perf_counter()
+
+        counters.increment("standin.frames")
+        counters.increment("standin.bytes", len(pickle_string))
+
+
+class StandInDPUProxy:
+    """
+    A proxy for the commanding port of the stand-in, with the commands of the FastCameraDPUProxy that the App uses.
+
+    Like the proxies of the egse, the connection is made in `__enter__()` and closed in `__exit__()`. A command that
+    doesn't get a reply within `timeout` seconds raises a TimeoutError, the proxy can be used again after that.
+
+    The App creates the proxy without arguments, the port is then `PORT`, see `use_stand_in()`, or the commanding
+    port of the DPU Processor.
+    """
+
+    PORT: int | None = None
+    """The commanding port of the stand-in, None for the port from the settings."""
+
+    def __init__(self, hostname: str = "localhost", port: int = None, timeout: float = 5.0):
+        self.hostname = hostname
+        self.port = port or self.PORT or load_commanding_port()
+        self.timeout = timeout
+
+        self._sock = None
+
+    def __enter__(self):
+        self._sock = zmq.Context.instance().socket(zmq.REQ)
+        self._sock.setsockopt(zmq.REQ_RELAXED, 1)
+        self._sock.setsockopt(zmq.REQ_CORRELATE, 1)
+        self._sock.connect(f"tcp://{self.hostname}:{self.port}")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._sock is not None:
+            self._sock.close(linger=0)
+            self._sock = None
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def command(*args, **kwargs):
+            return self._send(name, args, kwargs)
+
+        command.__name__ = name
+
+        return command
+
+    def ping(self) -> bool:
+        try:
+            return self._send("ping", (), {})
+        except (TimeoutError, zmq.ZMQError):
+            return False
+
+    def _send(self, command: str, args, kwargs: dict):
+
+        if self._sock is None:
+            raise ConnectionError("The proxy is not connected to the stand-in, use it as a context manager.")
+
+        self._sock.send_json({"command": command, "args": list(args), "kwargs": kwargs})
+
+        if not self._sock.poll(int(self.timeout * 1000)):
+            raise TimeoutError(f"No reply from the stand-in for {command} within {self.timeout}s.")
+
+        reply = self._sock.recv_json()
+
+        if reply["status"] == "error":
+            raise ERRORS.get(reply["error"], RuntimeError)(reply["message"])
+
+        return reply["value"]
+
+
+ERRORS = {error.__name__: error for error in (AttributeError, TypeError, ValueError, KeyError)}
+"""The errors of a command that are raised again by the proxy, any other error is raised as a RuntimeError."""
+
+
+def parse_request(message: bytes) -> tuple:
+    """Returns the (command, args, kwargs) of a JSON command request, raises a ValueError for an invalid request."""
+
+    try:
+        request = json.loads(message)
+        command, args, kwargs = request["command"], request.get("args", []), request.get("kwargs", {})
+    except (ValueError, TypeError, KeyError) as exc:
+        raise ValueError(f"Invalid command request: {exc!r}") from None
+
+    if not isinstance(command, str) or not isinstance(args, list) or not isinstance(kwargs, dict):
+        raise ValueError("Invalid command request: expected a command name, a list of args and a dict of kwargs.")
+
+    return command, args, kwargs
+
+
+def error_reply(exc: Exception) -> dict:
+    return {"status": "error", "error": type(exc).__name__, "message": str(exc)}
+
+
+def load_commanding_port() -> int:
+    """Returns the COMMANDING_PORT of the DPU Processor settings, or DEFAULT_COMMANDING_PORT when there is none."""
+
+    return getattr(Settings.load('DPU Processor'), "COMMANDING_PORT", DEFAULT_COMMANDING_PORT)
+
+
+def use_stand_in(port: int = None) -> None:
+    """
+    Send the DPU commands of the App to the stand-in instead of the DPU Processor.
+
+    Args:
+        port: the commanding port of the stand-in, by default the commanding port of the DPU Processor
+    """
+
+    TARGETS['DPU'] = (__name__, "StandInDPUProxy")
+    StandInDPUProxy.PORT = port
+
+
+def parse_arguments(argv: list = None) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(
+        prog="python -m f_fee_tui.standin",
+        description="A stand-in for the DPU Processor and the core services, for load testing the f-fee-tui.",
+        epilog="Start the App with `f-fee-tui --stand-in` to send the DPU commands to the stand-in.",
+    )
+
+    parser.add_argument(
+        '--speed', type=float, default=1.0,
+        help=f"publish N times faster than the nominal cycle of {NOMINAL_CYCLE_TIME}s [default=1]"
+    )
+    parser.add_argument(
+        '--cycle-time', type=float, default=None,
+        help="the time [s] between two timecodes, overrides --speed"
+    )
+    parser.add_argument('--hk-size', type=int, default=256, help="the size of the HK packets [default=256 bytes]")
+    parser.add_argument(
+        '--register-map-size', type=int, default=4096, help="the size of the register map [default=4096 bytes]"
+    )
+    parser.add_argument(
+        '--heartbeat-interval', type=float, default=1.0,
+        help="the time [s] between two heartbeats on the monitoring ports of the services [default=1]"
+    )
+    parser.add_argument(
+        '--churn', type=float, default=0.0,
+        help="the fraction of cycles in which a random word of the register map changes [default=0]"
+    )
+    parser.add_argument(
+        '--address', default="127.0.0.1",
+        help="the address to bind the sockets to, use '*' to accept other hosts [default=127.0.0.1]"
+    )
+    parser.add_argument(
+        '--commanding-port', type=int, default=None,
+        help=f"the port for the commands [default=COMMANDING_PORT of the DPU Processor, or {DEFAULT_COMMANDING_PORT}]"
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None):
+
+    args = parse_arguments(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-8s %(message)s")
+
+    cycle_time = args.cycle_time or NOMINAL_CYCLE_TIME / args.speed
+
+    stand_in = StandIn(
+        cycle_time=cycle_time, hk_size=args.hk_size, register_map_size=args.register_map_size,
+        heartbeat_interval=args.heartbeat_interval, churn=args.churn, address=args.address,
+        commanding_port=args.commanding_port,
+    )
+    stand_in.start()
+
+    _LOGGER.info(
+        f"Stand-in running with a cycle time of {cycle_time:.3f}s, commanding on port {stand_in.commanding_port}, "
+        f"press Ctrl-C to stop."
+    )
+
+    try:
+        while True:
+            time.sleep(10.0)
+            _LOGGER.info(
+                f"cycles={counters['standin.cycles']}, frames={counters['standin.frames']}, "
+                f"commands={counters['standin.commands']}, overruns={counters['standin.overruns']}"
+            )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stand_in.stop()
+
+
+if __name__ == "__main__":
+    main()
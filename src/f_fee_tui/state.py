@@ -0,0 +1,89 @@
+"""
+The monitored state of the F-FEE as it is known to the App.
+
+The Monitor updates the state for every decoded message, i.e. also when the values didn't change and no snapshot
+is posted to the screen. Command sequences use the state to wait until the F-FEE confirms a step.
+"""
+
+import asyncio
+
+
+class MonitoredState:
+    """The latest values that were decoded by the Monitor."""
+
+    def __init__(self):
+        self.cycle = 0
+        """The number of timecodes that were received, i.e. the number of sync cycles."""
+        self.timecode = None
+        self.deb_mode = None
+        """The DEB mode from the DEB HK, an f_fee_mode."""
+        self.aeb_state = {}
+        """The AEB status from the AEB HK, an aeb_state, for each AEB id that was received, e.g. 'AEB1'."""
+        self.dtc_in_mod = None
+        """The (T0, ..., T7) IN_MOD values from the register map."""
+
+        self.revision = 0
+        """The number of updates, take it before sending a command to check which values arrived after it."""
+        self._revisions = {}
+
+        self._waiters = []
+
+    def update(self, kind: str, *values) -> None:
+        """Update the state with the decoded values of the given kind and wake up the waiters that are satisfied."""
+
+        self.revision += 1
+
+        if kind == "timecode":
+            self.cycle += 1
+            self.timecode, = values
+        elif kind == "deb_mode":
+            self.deb_mode, = values
+        elif kind == "aeb_state":
+            aeb_id, aeb_status = values
+            self.aeb_state[aeb_id] = aeb_status
+            kind = aeb_id
+        elif kind == "dtc_in_mod":
+            self.dtc_in_mod, = values
+
+        self._revisions[kind] = self.revision
+
+        for predicate, future in list(self._waiters):
+            if not future.done() and predicate(self):
+                future.set_result(True)
+
+    def invalidate(self) -> None:
+        """
+        Forget the DEB mode, AEB states and DTC_IN_MOD, e.g. when no data arrived for a while and they may be stale.
+        The mode commands are not validated while these are unknown.
+        """
+        self.deb_mode = None
+        self.aeb_state.clear()
+        self.dtc_in_mod = None
+
+    def updated_since(self, name: str, revision: int) -> bool:
+        """
+        Returns True when the value was updated after the given revision.
+
+        The name is the kind of value, e.g. 'deb_mode' or 'dtc_in_mod', or the AEB id for the AEB status, e.g. 'AEB1'.
+        """
+        return self._revisions.get(name, 0) > revision
+
+    async def wait_for(self, predicate, timeout: float) -> bool:
+        """
+        Wait until `predicate(state)` is True, returns False when this didn't happen within `timeout` seconds.
+
+        This shall be awaited on the event loop of the App, i.e. the loop that runs the Monitor.
+        """
+
+        if predicate(self):
+            return True
+
+        waiter = (predicate, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+
+        try:
+            return await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.remove(waiter)
@@ -0,0 +1,90 @@
+"""
+The transition model for the DEB modes and the AEB states.
+
+The DEB and the AEBs only accept a mode change from specific modes (see the tooltips of the DEB commanding panel
+and the F-FEE ICD). Commands are validated against the monitored state before they are queued. When the requested
+mode can not be reached directly, a route of allowed transitions is returned that can be run as a sequence.
+"""
+
+from collections import deque
+
+from egse.fee.ffee import aeb_state
+from egse.fee.ffee import f_fee_mode
+
+DEB_TRANSITIONS = {
+    f_fee_mode.ON_MODE: (
+        f_fee_mode.STANDBY_MODE, f_fee_mode.FULL_IMAGE_PATTERN_MODE, f_fee_mode.WINDOWING_PATTERN_MODE
+    ),
+    f_fee_mode.STANDBY_MODE: (f_fee_mode.ON_MODE, f_fee_mode.FULL_IMAGE_MODE, f_fee_mode.WINDOWING_MODE),
+    f_fee_mode.FULL_IMAGE_MODE: (f_fee_mode.STANDBY_MODE,),
+    f_fee_mode.FULL_IMAGE_PATTERN_MODE: (f_fee_mode.ON_MODE,),
+    f_fee_mode.WINDOWING_MODE: (f_fee_mode.STANDBY_MODE,),
+    f_fee_mode.WINDOWING_PATTERN_MODE: (f_fee_mode.ON_MODE,),
+}
+"""
+The DEB modes that can be reached directly from each DEB mode. IMMEDIATE ON is allowed from any mode. The windowing
+modes are entered and left like the full image modes, from STANDBY mode and from ON mode for the pattern mode.
+"""
+
+DEB_MODE_COMMANDS = {
+    f_fee_mode.ON_MODE: "deb_set_on_mode",
+    f_fee_mode.STANDBY_MODE: "deb_set_standby_mode",
+    f_fee_mode.FULL_IMAGE_MODE: "deb_set_full_image_mode",
+    f_fee_mode.FULL_IMAGE_PATTERN_MODE: "deb_set_full_image_pattern_mode",
+}
+"""The command that brings the DEB into the given mode."""
+
+AEB_TRANSITIONS = {
+    aeb_state.INIT: (aeb_state.CONFIG,),
+    aeb_state.CONFIG: (aeb_state.INIT, aeb_state.IMAGE),
+    aeb_state.IMAGE: (aeb_state.INIT, aeb_state.CONFIG),
+    aeb_state.PATTERN: (aeb_state.INIT, aeb_state.CONFIG),
+}
+"""
+The AEB states that can be reached directly from each AEB state. An AEB that is OFF shall first be powered on,
+POWER_UP and POWER_DOWN are transitional states that can not be commanded.
+"""
+
+AEB_STATE_COMMANDS = {
+    aeb_state.INIT: "aeb_set_init_mode",
+    aeb_state.CONFIG: "aeb_set_config_mode",
+    aeb_state.IMAGE: "aeb_set_image_mode",
+}
+"""The command that brings an AEB into the given state."""
+
+
+def find_route(transitions: dict, current, target):
+    """
+    Returns the shortest list of states to pass through to go from the current state to the target state.
+
+    The list ends with the target state and doesn't include the current state, it is empty when the current state
+    is the target state. Returns None when the target can not be reached.
+    """
+
+    previous = {current: None}
+    queue = deque([current])
+
+    while queue:
+        state = queue.popleft()
+        if state == target:
+            route = []
+            while state != current:
+                route.append(state)
+                state = previous[state]
+            return route[::-1]
+        for next_state in transitions.get(state, ()):
+            if next_state not in previous:
+                previous[next_state] = state
+                queue.append(next_state)
+
+    return None
+
+
+def deb_mode_route(current: f_fee_mode, target: f_fee_mode):
+    """Returns the route of DEB modes from the current to the target mode, None when not reachable."""
+    return find_route(DEB_TRANSITIONS, current, target)
+
+
+def aeb_state_route(current: aeb_state, target: aeb_state):
+    """Returns the route of AEB states from the current to the target state, None when not reachable."""
+    return find_route(AEB_TRANSITIONS, current, target)
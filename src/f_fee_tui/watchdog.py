@@ -0,0 +1,84 @@
+"""
+The watchdog for the event loop of the App.
+
+The Monitor, the command sequences and all message handlers share the event loop of the App. When the loop falls
+behind, e.g. during a burst of notifications or while a large Markdown document is rendered, the display is no
+longer current. The watchdog measures how late the loop wakes up from a sleep (scheduling lag) and how long it takes
+until a requested screen refresh is done (frame time), and warns when the lag exceeds a threshold.
+"""
+
+import asyncio
+import time
+
+from .messages import ProblemDetected
+from .metrics import counters
+
+
+class LoopWatchdog:
+    """
+    Measures the scheduling lag of the event loop and the frame time of the screen.
+
+    The measurements are kept in the counters 'loop.lag_ms', 'loop.max_lag_ms', 'loop.frame_ms' and
+    'loop.max_frame_ms'. The maximum values are for the last `window` seconds. A ProblemDetected message is posted to
+    the target when the lag exceeds `lag_threshold` seconds, at most once every `warn_interval` seconds.
+    """
+
+    def __init__(
+            self, target, interval: float = 0.1, lag_threshold: float = 0.25, window: float = 5.0,
+            warn_interval: float = 10.0
+    ):
+        self._target = target
+        self.interval = interval
+        self.lag_threshold = lag_threshold
+        self.window = window
+        self.warn_interval = warn_interval
+
+        self._last_warning = 0.0
+        self._window_start = 0.0
+        self._max_lag = 0.0
+        self._max_frame = 0.0
+        self._frame_pending = False
+
+    async def run(self) -> None:
+        """Measure until the task is cancelled, run this on the event loop of the App."""
+
+        loop = asyncio.get_running_loop()
+        self._window_start = loop.time()
+
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+
+            self.record_lag(max(0.0, now - expected), now)
+
+            if not self._frame_pending:
+                self._frame_pending = True
+                self._target.call_after_refresh(self.record_frame, time.perf_counter())
+
+    def record_lag(self, lag: float, now: float) -> None:
+
+        if now - self._window_start >= self.window:
+            self._window_start = now
+            self._max_lag = self._max_frame = 0.0
+
+        self._max_lag = max(self._max_lag, lag)
+
+        counters.set("loop.lag_ms", int(lag * 1000))
+        counters.set("loop.max_lag_ms", int(self._max_lag * 1000))
+
+        if lag > self.lag_threshold and now - self._last_warning >= self.warn_interval:
+            self._last_warning = now
+            self._target.post_message(
+                ProblemDetected(f"The event loop is lagging {lag * 1000:.0f}ms behind, the display may not be current.")
+            )
+
+    def record_frame(self, start: float) -> None:
+
+        frame_time = time.perf_counter() - start
+
+        self._frame_pending = False
+        self._max_frame = max(self._max_frame, frame_time)
+
+        counters.set("loop.frame_ms", int(frame_time * 1000))
+        counters.set("loop.max_frame_ms", int(self._max_frame * 1000))
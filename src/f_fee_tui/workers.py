@@ -1,178 +1,963 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import pickle
-import queue
 import threading
 import time
 import traceback
-from queue import Queue
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING
 
 import zmq
-from egse.dpu.fdpu import FastCameraDPUProxy
-from egse.fee.ffee import HousekeepingData
+import zmq.asyncio
 from egse.fee.ffee import aeb_state
 from egse.fee.ffee import f_fee_mode
-from egse.reg import RegisterMap
-from egse.settings import Settings
-from egse.setup import load_setup
 from egse.zmq import MessageIdentifier
 
-from .messages import AebStateChanged
-from .messages import DebModeChanged
-from .messages import DtcInModChanged
+from .capture import DATA_CHANNEL
+from .capture import Recorder
+from .frames import FrameDecoder
+from .frames import create_decoder_pool
+from .frames import decode_frame
+from .frames import merge_metrics
+from .frames import sync_label
 from .messages import ExceptionCaught
+from .messages import ProblemDetected
+from .messages import ServiceStatusChanged
+from .messages import StateSnapshot
 from .messages import TimeoutReached
+from .metrics import counters
+from .metrics import timings
+from .outbox import Outbox
+from .proxies import ProxyPool
+from .proxies import TARGETS
+from .scheduler import CommandScheduler
+from .scheduler import Priority
+from .services import handle_liveness
+from .services import handle_multi_part
+from .services import handle_single_part
+from .services import services
+from .setups import SetupLoader
+from .state import MonitoredState
 
 if TYPE_CHECKING:
     from .app import FastFEEApp
 
 _LOGGER = logging.getLogger("egse.f-fee-tui")
 
-dpu = Settings.load("DPU Processor")
 
+def load_dpu_settings() -> tuple:
+    """Returns the hostname and the data distribution port of the DPU Processor from the egse settings."""
 
-class Command(threading.Thread):
-    def __init__(self, app: 'FastFEEApp', command_q: Queue) -> None:
-        super().__init__()
+    from egse.settings import Settings
+
+    dpu = Settings.load("DPU Processor")
+
+    return dpu.HOSTNAME, dpu.DATA_DISTRIBUTION_PORT
+
+
+class CommandRequest:
+    """
+    A command that is submitted to the Commander.
+
+    When the command is finished, the future of the command resolves with this request, containing the return value
+    or the error of the command, and the timestamps [time.monotonic()] of its round trip.
+    """
+
+    def __init__(self, target: str, command: str, args: list, kwargs: dict, priority: Priority = Priority.NORMAL):
+        self.target = target
+        self.command = command
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+
+        self.result = None
+        self.error: Exception | None = None
+
+        self.enqueued = time.monotonic()
+        self.dispatched: float | None = None
+        self.completed: float | None = None
+
+    @property
+    def wait_time(self) -> float:
+        """The time [s] the command waited in the queue before it was dispatched."""
+        return self.dispatched - self.enqueued
+
+    @property
+    def latency(self) -> float:
+        """The round trip time [s] from submitting the command until it completed."""
+        return self.completed - self.enqueued
+
+    def __repr__(self):
+        return f"{self.target}.{self.command}(*{self.args}, **{self.kwargs})"
+
+
+class CommandWorker(threading.Thread):
+    """
+    A thread that dispatches the commands for one target.
+
+    The worker takes the commands from the scheduler of its target and executes them with a proxy from the pool of
+    the target. A command fails with a ConnectionError when the control server can not be reached within
+    `connect_timeout` seconds, the worker keeps running and reconnects for the next command.
+    """
+
+    def __init__(
+            self, app: 'FastFEEApp', scheduler: CommandScheduler, pool: ProxyPool, connect_timeout: float = 5.0
+    ) -> None:
+        # This is a daemon thread, a command that hangs in the proxy shall not prevent the App from exiting.
+        super().__init__(daemon=True, name=f"CommandWorker-{scheduler.target}")
         self._app = app
-        self._command_q = command_q
-        self._f_dpu: FastCameraDPUProxy | None = None
+        self._scheduler = scheduler
+        self._pool = pool
         self._canceled = threading.Event()
+        self.connect_timeout = connect_timeout
 
     def run(self) -> None:
 
-        with FastCameraDPUProxy() as self._f_dpu:
-            while True:
-                if self._canceled.is_set():
-                    break
-                try:
-                    target, command, args, kwargs = self._command_q.get_nowait()
-                    self.execute_command(target, command, args, kwargs)
-                    self._command_q.task_done()
-                except queue.Empty:
-                    time.sleep(0.1)  # Sleep briefly to avoid busy-waiting
-                    continue
-                except Exception as exc:
-                    _LOGGER.error(f"Caught and exception: {exc}")
-                    tb = traceback.format_exc()
-                    self._app.post_message(ExceptionCaught(exc, tb))
+        while True:
+            # Block until a command is scheduled, None is returned when the scheduler is closed.
+            if (item := self._scheduler.get()) is None:
+                break
+            future, request = item
+            # The command was taken from the scheduler, so it's no longer canceled by closing the scheduler.
+            if self._canceled.is_set():
+                future.cancel()
+                break
+            if future.set_running_or_notify_cancel():
+                self.dispatch(request)
+                future.set_result(request)
+
+    def dispatch(self, request: CommandRequest):
+        """Execute the command, the return value or the error and the timestamps are kept in the request."""
+
+        request.dispatched = time.monotonic()
+        try:
+            proxy = self._pool.acquire(self.connect_timeout, self._canceled)
+            try:
+                request.result = self.execute_command(proxy, request.command, request.args, request.kwargs)
+            except AttributeError:
+                self._pool.release(proxy)
+                raise
+            except Exception:
+                # The command failed, only keep the connection when the control server still responds.
+                self._pool.release(proxy, healthy=self._pool.probe(proxy))
+                raise
+            else:
+                self._pool.release(proxy)
+        except Exception as exc:
+            _LOGGER.error(f"Caught and exception: {exc}")
+            request.error = exc
+            tb = traceback.format_exc()
+            self._app.post_message(ExceptionCaught(exc, tb))
+        request.completed = time.monotonic()
 
     def cancel(self) -> None:
         self._canceled.set()
 
-    def execute_command(self, target: str, command: str, args: list, kwargs: dict):
-        if target == "DPU":
-            try:
-                return getattr(self._f_dpu, command)(*args, **kwargs)
-            except AttributeError as exc:
-                _LOGGER.error(f"No such command for DPU: {command}", exc_info=True)
+    def execute_command(self, proxy, command: str, args: list, kwargs: dict):
+        try:
+            return getattr(proxy, command)(*args, **kwargs)
+        except AttributeError:
+            _LOGGER.error(f"No such command for {self._scheduler.target}: {command}", exc_info=True)
+            raise
+
+
+class Commander:
+    """
+    Executes the commands of the App with one or more workers per target.
+
+    Every target, see `proxies.TARGETS`, has its own scheduler, proxy pool and workers. These are created when the
+    first command for the target is submitted. The number of workers for a target is taken from `workers`, the
+    default is one worker, i.e. the commands to a target are executed in order of priority and submission.
+    """
+
+    def __init__(self, app: 'FastFEEApp', workers: dict = None) -> None:
+        self._app = app
+        self._workers = workers or {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.schedulers: dict[str, CommandScheduler] = {}
+        self.pools: dict[str, ProxyPool] = {}
+        self.threads: dict[str, list[CommandWorker]] = {}
+
+    def submit(
+            self, target: str, command: str, args: list = None, kwargs: dict = None,
+            priority: Priority = Priority.NORMAL
+    ) -> Future:
+        """Submit a command for execution, returns a Future that resolves with the finished CommandRequest."""
+
+        request = CommandRequest(target, command, args or [], kwargs or {}, priority)
+
+        if target not in TARGETS:
+            request.dispatched = request.completed = time.monotonic()
+            request.error = ValueError(f"Unknown target for command {command}: {target}")
+            future = Future()
+            future.set_result(request)
+            return future
+
+        return self._get_scheduler(target).submit(request)
+
+    def _get_scheduler(self, target: str) -> CommandScheduler:
+        """Returns the scheduler of the target, after the Commander was canceled a closed scheduler is returned."""
+
+        with self._lock:
+            if self._closed:
+                # No workers are started anymore, the closed scheduler cancels the command at once.
+                scheduler = CommandScheduler(target)
+                scheduler.close()
+                return scheduler
+            if (scheduler := self.schedulers.get(target)) is None:
+                scheduler = self.schedulers[target] = CommandScheduler(target)
+                pool = self.pools[target] = ProxyPool(target)
+                self.threads[target] = [
+                    CommandWorker(self._app, scheduler, pool) for _ in range(self._workers.get(target, 1))
+                ]
+                for thread in self.threads[target]:
+                    thread.start()
+
+        return scheduler
+
+    def cancel(self) -> None:
+        """Cancel the pending commands of all targets and stop the workers."""
+
+        # No schedulers are added once the Commander is closed, so the snapshot covers all workers.
+
+        with self._lock:
+            self._closed = True
+            schedulers = list(self.schedulers.items())
+
+        for target, scheduler in schedulers:
+            for thread in self.threads.get(target, []):
+                thread.cancel()
+            scheduler.close()
+            self.pools[target].close()
+
+    def cancel_pending(self, target: str = None) -> None:
+        """Cancel the queued commands for the given target, or for all targets, the workers keep running."""
+
+        with self._lock:
+            schedulers = list(self.schedulers.items())
+
+        for name, scheduler in schedulers:
+            if target is None or name == target:
+                scheduler.clear()
+
+    def reconnect(self, target: str) -> None:
+        """Drop the idle connections of the target, the next command connects again without waiting for a backoff."""
+
+        if (pool := self.pools.get(target)) is not None:
+            pool.reset()
+
+    def shutdown(self, timeout: float = 2.0) -> float:
+        """
+        Cancel the pending commands and stop the workers, waiting at most `timeout` seconds in total.
+
+        Idle workers wake up immediately, only a command that is being executed can delay the shutdown. Returns the
+        time [s] it took, this is also kept in the 'command.shutdown_ms' counter.
+        """
 
+        start = time.monotonic()
+        deadline = start + timeout
+
+        self.cancel()
+
+        for target, threads in list(self.threads.items()):
+            for thread in threads:
+                thread.join(max(0.0, deadline - time.monotonic()))
+                if thread.is_alive():
+                    _LOGGER.warning(f"{thread.name} didn't finish within {timeout}s, a command is probably hanging.")
+
+        shutdown_time = time.monotonic() - start
+        counters.set("command.shutdown_ms", int(shutdown_time * 1000))
+
+        return shutdown_time
+
+
+class Monitor:
+    """
+    The monitoring engine of the App.
+
+    The Monitor runs as an asyncio task on the Textual event loop, see `run()`. It multiplexes the DATA_DISTRIBUTION
+    port of the DPU Processor and the monitoring ports of all the services in `services.services` on one poller.
+    The unpickling and decoding of the data distribution messages is offloaded to an executor, the decoded values
+    are gathered into one snapshot per sync cycle and posted to the screen.
+    """
 
-class Monitor(threading.Thread):
     def __init__(self, app: 'FastFEEApp') -> None:
         self._app = app
         self._canceled = threading.Event()
-        self.hostname = dpu.HOSTNAME
-        self.port = dpu.DATA_DISTRIBUTION_PORT
+        self.hostname = None
+        self.port = None
+        """The data distribution endpoint, taken from the egse settings when the Monitor starts unless set before."""
+
+        # The settings that determine the latency of the Monitor.
+
+        self.quiet_period = 0.2
+        """
+        The snapshot is released when no data arrived during this period [s] after the last message. This is only a
+        fallback, normally the snapshot is released as soon as the packets that are expected for the cycle arrived.
+        """
+        self.data_timeout = 3.0
+        """A TimeoutReached is posted when no data arrived during this period [s]."""
+        self.max_drain = 256
+        """
+        The maximum number of frames that are drained from the data distribution in one wake-up. The frames that
+        are left are drained after the App had its turn, a publisher that is faster than the Monitor can then not
+        starve the event loop.
+        """
+        self.max_waiting = 1024
+        """The maximum number of frames that are kept while the Setup is loaded, older frames are dropped."""
+
+        # The values that were last sent to the App, only changes with respect to these values are posted.
+        # The DEB Mode widget starts in ON mode.
 
         self.previous_deb_mode = f_fee_mode.ON_MODE
         self.previous_aeb_state = {}
+        self.previous_dtc_in_mod = None
 
-        super().__init__()
+        self.outbox = Outbox(app)
+        """The messages for the App are handed off through the outbox, which keeps only the newest values."""
 
-    def run(self) -> None:
+        self.state = MonitoredState()
+        """The latest decoded values, updated for every message, also when no snapshot is posted."""
 
-        n_timeouts = 0
-        """The timeout is 1s, we count the number of timeouts to detect if the DPU or N-FEE might be dead or stalled."""
+        self.scheduled_updates = False
+        """When True, snapshots are only released when the App requests an update with `schedule_update()`."""
 
-        context = zmq.Context.instance()
-        receiver = context.socket(zmq.SUB)
-        receiver.setsockopt_string(zmq.SUBSCRIBE, "")
-        receiver.connect(f"tcp://{self.hostname}:{self.port}")
+        # The values that are gathered during the current sync cycle
 
-        setup = load_setup()
+        self._timecode = None
+        self._deb_mode = None
+        self._aeb_state = {}
+        self._dtc_in_mod = None
 
-        while True:
-            if self._canceled.is_set():
-                break
+        # The packets that arrived during the current cycle and those that arrived during the previous cycle. When all
+        # the packets of the previous cycle arrived again, the cycle is complete and its snapshot is released.
+
+        self._cycle_packets = set()
+        self._expected_packets = set()
+        self._cycle_complete = False
+
+        # The handlers that decode the messages from the data distribution, the Monitor only subscribes to the
+        # sync identifiers that have a handler, all other messages are dropped by ZeroMQ.
+
+        self.decoder = FrameDecoder()
+        """The decoder for the frames, it's only used from the executor."""
+
+        self.handlers = dict(self.decoder.handlers)
+        self._receiver: zmq.asyncio.Socket | None = None
+        self._subscriptions = set()
+
+        self.recorder: Recorder | None = None
+        """When set, the raw messages are recorded, see `capture.Recorder`. It's started and closed by `run()`."""
+
+        self.decode_processes = 0
+        """The number of worker processes that decode the frames, when 0 the frames are decoded in a thread."""
+
+        self._executor: ThreadPoolExecutor | None = None
+        self._process_pool: ProcessPoolExecutor | None = None
+        self.setup_loader = SetupLoader()
+        """Loads the Setup for decoding in the background, the App can share its loader with the Monitor."""
+        self._setup_future: asyncio.Future | None = None
+        self._waiting = deque()
+        """The (sync_id, pickle_string) of the frames that arrived while the Setup was loaded."""
+
+        # The status of the services as last reported to the App, None when not yet reported
+
+        self._service_timed_out = {}
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
 
-            socket_list, _, _ = zmq.select([receiver], [], [], timeout=1.0)
+        # The control socket wakes up the monitoring loop for a flush or a reconfiguration, see `control()`.
 
-            if receiver in socket_list:
-                n_timeouts = 0
+        self._control_address = f"inproc://f-fee-tui-monitor-control-{id(self)}"
+        self._control: zmq.asyncio.Socket | None = None
+        self._endpoint: str | None = None
+
+        self.shutdown_budget = 0.1
+        """The time [s] the Monitor may take to stop after it is canceled, a warning is logged when it takes longer."""
+        self.shutdown_time: float | None = None
+        """The time [s] the Monitor took to stop after it was last canceled."""
+        self._cancel_requested: float | None = None
+
+    async def run(self) -> None:
+        """Monitor the data distribution and the services until the Monitor is canceled."""
+
+        loop = asyncio.get_running_loop()
+
+        # A single worker, the decoders keep state from one message to the next. Optionally, the frames are decoded
+        # in worker processes, every process keeps its own decoder and Setup.
+
+        executor = self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="f-fee-tui-decoder")
+
+        if self.decode_processes:
+            self._process_pool = create_decoder_pool(self.decode_processes)
+
+        context = zmq.asyncio.Context.instance()
+        poller = zmq.asyncio.Poller()
+
+        # Loading the Setup needs a round trip to the configuration manager, don't wait for it here.
+
+        self._setup_future = asyncio.wrap_future(self.setup_loader.start())
+
+        if self.hostname is None or self.port is None:
+            hostname, port = await loop.run_in_executor(executor, load_dpu_settings)
+            self.hostname = self.hostname or hostname
+            self.port = self.port or port
+
+        receiver = self._receiver = context.socket(zmq.SUB)
+        self.update_subscriptions()
+        self._endpoint = f"tcp://{self.hostname}:{self.port}"
+        receiver.connect(self._endpoint)
+        poller.register(receiver, zmq.POLLIN)
+
+        control = self._control = context.socket(zmq.PULL)
+        control.bind(self._control_address)
+        poller.register(control, zmq.POLLIN)
+
+        # The frames that arrive while the Setup is loaded are kept, the loop is woken up to decode them when the
+        # Setup is available.
+
+        self._setup_future.add_done_callback(lambda _: self.control(b"setup"))
+
+        for name, props in services.items():
+            if props.get('shared', False):
+                continue
+            sock = context.socket(props['type'])
+            if props['type'] == zmq.SUB:
+                sock.subscribe(props.get('subscribe', b''))
+            sock.connect(f"tcp://{props['hostname']}:{props['port']}")
+            props['sock'] = sock
+            poller.register(sock, zmq.POLLIN)
+
+        self._loop = loop
+        self._task = asyncio.current_task()
+
+        last_data = time.monotonic()
+        last_timeout = last_data
+        snapshot_pending = False
+
+        try:
+            if self.recorder is not None:
                 try:
-                    sync_id, pickle_string = receiver.recv_multipart()
-                    sync_id = int.from_bytes(sync_id, byteorder='big')
-                    data = pickle.loads(pickle_string)
-                    self.handle_messages(sync_id, data, setup)
-                except Exception as exc:
-                    tb = traceback.format_exc()
-                    self._app.post_message(ExceptionCaught(exc, tb))
-
-            if len(socket_list) == 0:
-                n_timeouts += 1
-                if n_timeouts > 3:  # at least a timecode should arrive every 2.5s
-                    self._app.post_message(TimeoutReached("Timeout reached after 3s on monitoring channel."))
-                    n_timeouts = 0
-
-        receiver.disconnect(f"tcp://{self.hostname}:{self.port}")
-        receiver.close()
+                    self.recorder.start()
+                except OSError as exc:
+                    self.outbox.put(ProblemDetected(f"Couldn't start recording, continuing without: {exc}"))
+                    self.recorder = None
+
+            while not self._canceled.is_set():
+
+                # Sleep until a message arrives or the next deadline passes: a service heartbeat that is due,
+                # the data timeout, or the end of the quiet period after which the snapshot is released.
+
+                deadlines = [last_timeout + self.data_timeout]
+                if snapshot_pending and not self.scheduled_updates:
+                    deadlines.append(last_data + self.quiet_period)
+                deadlines.extend(
+                    props['last_received'] + props['interval'] for props in services.values() if not props['timed-out']
+                )
+                timeout = max(0.0, min(deadlines) - time.monotonic())
+
+                events = dict(await poller.poll(timeout=timeout * 1000))
+
+                current_time = time.monotonic()
+                decoded = []
+
+                if control in events:
+                    while control.get(zmq.EVENTS) & zmq.POLLIN:
+                        command = await control.recv()
+                        if command == b"flush":
+                            self.release_snapshot()
+                            snapshot_pending = False
+                        elif command == b"reconfigure":
+                            self.reconnect()
+                        elif command == b"setup":
+                            if self.setup_loader.setup is None:
+                                self.outbox.put(ProblemDetected("No Setup, only the timecodes are decoded."))
+                            decoded.extend(self.submit_waiting())
+
+                if receiver in events:
+                    last_data = last_timeout = current_time
+                    n_drained = 0
+                    while n_drained < self.max_drain and receiver.get(zmq.EVENTS) & zmq.POLLIN:
+                        n_drained += 1
+                        try:
+                            start = time.perf_counter()
+                            sync_id, pickle_string = await receiver.recv_multipart()
+                            if self.recorder is not None:
+                                self.recorder.record(DATA_CHANNEL, (sync_id, pickle_string))
+                            if timings.enabled:
+                                timings.since("recv", sync_label(int.from_bytes(sync_id, byteorder='big')), start)
+                            self.handle_shared_services(sync_id, pickle_string, current_time)
+                            if (future := self.submit_decode(sync_id, pickle_string)) is not None:
+                                decoded.append(future)
+                        except Exception as exc:
+                            tb = traceback.format_exc()
+                            self.outbox.put(ExceptionCaught(exc, tb))
+                    set_queue_depth("monitor", n_drained)
+
+                # The frames are decoded concurrently when there are several decoder processes, the records are
+                # applied in the order the frames were received.
+
+                for future in decoded:
+                    try:
+                        self.apply(await future)
+                    except Exception as exc:
+                        tb = traceback.format_exc()
+                        self.outbox.put(ExceptionCaught(exc, tb))
+
+                # The snapshot is already released when all expected packets of the cycle arrived.
+
+                if decoded:
+                    snapshot_pending = not self._cycle_complete
+
+                elif snapshot_pending and receiver not in events and current_time - last_data >= self.quiet_period:
+                    # The channel is quiet, so all packets of the current cycle have arrived.
+                    if not self.scheduled_updates:
+                        self.release_snapshot()
+                        snapshot_pending = False
+
+                if current_time - last_timeout >= self.data_timeout:  # at least a timecode should arrive every 2.5s
+                    self.outbox.put(TimeoutReached("Timeout reached after 3s on monitoring channel."))
+                    self.state.invalidate()
+                    last_timeout = current_time
+
+                await self.handle_services(events, current_time)
+
+        finally:
+            self._task = None
+            for props in services.values():
+                if (sock := props['sock']) is not None:
+                    sock.close(linger=0)
+                    props['sock'] = None
+            receiver.close(linger=0)
+            control.close(linger=0)
+            self._receiver = self._control = None
+            self._waiting.clear()
+            self._subscriptions = set()
+            executor.shutdown(wait=False)
+            if self.recorder is not None:
+                self.recorder.close()
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False)
+                self._process_pool = None
+
+            if self._cancel_requested is not None:
+                self.shutdown_time = time.monotonic() - self._cancel_requested
+                counters.set("monitor.shutdown_ms", int(self.shutdown_time * 1000))
+                if self.shutdown_time > self.shutdown_budget:
+                    _LOGGER.warning(
+                        f"The Monitor took {self.shutdown_time:.3f}s to stop, the budget is {self.shutdown_budget}s."
+                    )
+
+    async def handle_services(self, events: dict, current_time: float) -> None:
+        """
+        Drain all messages that are waiting for the services and check which services timed out.
+
+        Only services with 'decode' set get their messages unpickled, for the other services the messages are
+        only counted.
+
+        The number of messages that were waiting in the receive queue of a service is kept in the
+        'service.<name>.queue_depth' and 'service.<name>.max_queue_depth' counters.
+        """
+
+        recorder = self.recorder if self.recorder is not None and self.recorder.record_services else None
+
+        for channel, (name, props) in enumerate(services.items(), start=1):
+            n_messages = 0
+
+            if (sock := props['sock']) in events and events[sock] == zmq.POLLIN:
+                while sock.get(zmq.EVENTS) & zmq.POLLIN:
+                    n_messages += 1
+                    message = await sock.recv()
+                    raw_parts = None if recorder is None else []
+
+                    if props['decode']:
+                        if sock.getsockopt(zmq.RCVMORE):
+                            sync_id, response = await handle_multi_part(sock, message, raw_parts)
+                        else:
+                            sync_id, response = await handle_single_part(sock, message, raw_parts)
+                    else:
+                        sync_id, n_frames, n_bytes = await handle_liveness(sock, message, raw_parts)
+                        counters.increment(f"service.{name}.frames", n_frames)
+                        counters.increment(f"service.{name}.bytes", n_bytes)
+                        response = None
+
+                    if recorder is not None:
+                        recorder.record(channel, raw_parts)
+
+                    props['callback'](self._app, name, sync_id, response, False)
+
+                set_queue_depth(f"service.{name}", n_messages)
+
+            if n_messages:
+                props['last_received'] = current_time
+                props['timed-out'] = False
+                self.set_service_status(name, False)
+            else:
+                if not props['timed-out'] and current_time - props['last_received'] >= props['interval']:
+                    props['timed-out'] = True
+                    props['callback'](self._app, name, None, None, True)
+                    self.set_service_status(name, True)
+
+    def handle_shared_services(self, sync_id: bytes, pickle_string: bytes, current_time: float) -> None:
+        """
+        Update the liveness of the services that share the data distribution subscription of the Monitor.
+
+        A shared service has no socket of its own, its 'subscribe' prefix selects the messages from the data
+        distribution that count as a heartbeat.
+        """
+
+        for name, props in services.items():
+            if props.get('shared', False) and sync_id.startswith(props.get('subscribe', b'')):
+                counters.increment(f"service.{name}.frames", 2)
+                counters.increment(f"service.{name}.bytes", len(sync_id) + len(pickle_string))
+                props['callback'](self._app, name, int.from_bytes(sync_id, byteorder='big'), None, False)
+                props['last_received'] = current_time
+                props['timed-out'] = False
+                self.set_service_status(name, False)
+
+    def set_service_status(self, name: str, timed_out: bool) -> None:
+        """Post the status of the service to the App, but only when it changed."""
+        if self._service_timed_out.get(name) != timed_out:
+            self._service_timed_out[name] = timed_out
+            self.outbox.put(ServiceStatusChanged(name, timed_out))
 
     def cancel(self) -> None:
+        """Stop the Monitor, this takes effect immediately, also when the Monitor is waiting for messages."""
+        self._cancel_requested = time.monotonic()
         self._canceled.set()
+        if self._task is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+    def flush(self) -> None:
+        """Release the values gathered so far as a snapshot now, this can be called from any thread."""
+        self.control(b"flush")
+
+    def reconfigure(self, hostname: str = None, port: int = None) -> None:
+        """Connect to the data distribution at the given hostname and port, this can be called from any thread."""
+        self.hostname = hostname or self.hostname
+        self.port = port or self.port
+        self.control(b"reconfigure")
+
+    def control(self, command: bytes) -> None:
+        """
+        Send a command to the monitoring loop over its inproc control socket, the loop wakes up immediately.
+
+        The command is ignored when the Monitor is not running.
+        """
+
+        if self._control is None:
+            return
+
+        context = zmq.Context.shadow(zmq.asyncio.Context.instance().underlying)
+        with context.socket(zmq.PUSH) as sock:
+            sock.linger = 100
+            sock.connect(self._control_address)
+            sock.send(command)
+
+    def reconnect(self) -> None:
+        """Connect the receiver to the current hostname and port when they changed."""
+
+        endpoint = f"tcp://{self.hostname}:{self.port}"
+
+        if endpoint != self._endpoint:
+            _LOGGER.info(f"Monitor reconnects from {self._endpoint} to {endpoint}.")
+            self._receiver.disconnect(self._endpoint)
+            self._receiver.connect(endpoint)
+            self._endpoint = endpoint
+
+    def schedule_update(self) -> None:
+        """Release the values gathered so far as a single snapshot, call this from the event loop of the App."""
+        self.release_snapshot()
+
+    def release_snapshot(self) -> None:
+        """
+        Post the values gathered for the current cycle as one StateSnapshot message and start a new snapshot.
+
+        Only values that changed with respect to what was sent before are included in the snapshot, unchanged
+        values are counted in the 'monitor.suppressed' counter. No message is posted when nothing changed.
+        """
+
+        deb_mode = self._deb_mode
+        aeb_state = self._aeb_state
+        dtc_in_mod = self._dtc_in_mod
+
+        self._deb_mode = None
+        self._aeb_state = {}
+        self._dtc_in_mod = None
+
+        n_suppressed = 0
+
+        if deb_mode is not None:
+            if deb_mode == self.previous_deb_mode:
+                deb_mode = None
+                n_suppressed += 1
+            else:
+                self.previous_deb_mode = deb_mode
+
+        for aeb_id, state in list(aeb_state.items()):
+            if state == self.previous_aeb_state.get(aeb_id):
+                del aeb_state[aeb_id]
+                n_suppressed += 1
+            else:
+                self.previous_aeb_state[aeb_id] = state
+
+        if dtc_in_mod is not None:
+            if dtc_in_mod == self.previous_dtc_in_mod:
+                dtc_in_mod = None
+                n_suppressed += 1
+            else:
+                self.previous_dtc_in_mod = dtc_in_mod
+
+        if n_suppressed:
+            counters.increment("monitor.suppressed", n_suppressed)
+
+        if deb_mode is None and not aeb_state and dtc_in_mod is None:
+            return
+
+        counters.increment("monitor.snapshots")
+
+        self.outbox.put(StateSnapshot(self._timecode, deb_mode, aeb_state, dtc_in_mod))
 
     def handle_messages(self, sync_id, data, setup):
+        """Decode the message and gather the decoded values into the current snapshot."""
+        self.apply(self.decode_message(sync_id, data, setup))
+
+    def submit_decode(self, sync_id: bytes, pickle_string: bytes) -> asyncio.Future | None:
+        """
+        Submit the raw multipart message for decoding, returns the future of the record.
+
+        Messages for the handlers of the FrameDecoder go to the decoder processes when these are used, messages for
+        handlers that were added with `add_handler()` are always decoded in the thread of the Monitor.
+
+        The monitoring loop never waits for the Setup. While the Setup is loaded, the timecodes are decoded, the other
+        messages for the thread of the Monitor are kept and None is returned. They are submitted in order by
+        `submit_waiting()` when the Setup is available, or dropped when the next timecode arrives first. When more
+        than `max_waiting` messages arrive, the oldest are dropped. The dropped messages are counted in
+        'monitor.waiting_dropped'. Without a Setup, only the timecodes are decoded, see `FrameDecoder`.
+        """
+
+        loop = asyncio.get_running_loop()
+        sync_id = int.from_bytes(sync_id, byteorder='big')
+
+        if self._process_pool is not None and self.handlers.get(sync_id) == self.decoder.handlers.get(sync_id):
+            future = loop.run_in_executor(self._process_pool, decode_frame, sync_id, pickle_string, timings.enabled)
+            if timings.enabled:
+                # The round trip to the decoder process, i.e. unpickle and decode including the transfer.
+                label, start = sync_label(sync_id), time.perf_counter()
+                future.add_done_callback(lambda _: timings.since("process", label, start))
+            return asyncio.ensure_future(self.receive_from_process(future))
+
+        # The timecodes don't need a Setup. While the Setup is loaded, a timecode is decoded at once and the messages
+        # of the previous cycle that are still waiting are dropped, they would be applied to the new cycle.
+
+        if sync_id == MessageIdentifier.SYNC_TIMECODE and not self._setup_future.done():
+            counters.increment("monitor.waiting_dropped", len(self._waiting))
+            self._waiting.clear()
+            return self.submit_to_thread(sync_id, pickle_string)
+
+        # Messages that arrive before the waiting messages are submitted, are kept behind them to keep the order.
+
+        if not self._setup_future.done() or self._waiting:
+            if len(self._waiting) >= self.max_waiting:
+                self._waiting.popleft()
+                counters.increment("monitor.waiting_dropped")
+            self._waiting.append((sync_id, pickle_string))
+            return None
+
+        return self.submit_to_thread(sync_id, pickle_string)
+
+    @staticmethod
+    async def receive_from_process(future: asyncio.Future):
+        """Returns the record from the decoder process, its counters and timings are merged into those of the App."""
+        return merge_metrics(await future)
+
+    def submit_waiting(self) -> list:
+        """Submit the messages that were kept while the Setup was loaded, returns the futures of their records."""
+
+        waiting, self._waiting = self._waiting, deque()
+
+        return [self.submit_to_thread(sync_id, pickle_string) for sync_id, pickle_string in waiting]
+
+    def submit_to_thread(self, sync_id: int, pickle_string: bytes) -> asyncio.Future:
+        """Submit the message for decoding in the thread of the Monitor."""
+
+        # The Setup can be replaced, e.g. when the cached Setup is outdated, so take the current one.
+
+        loop = asyncio.get_running_loop()
+
+        return loop.run_in_executor(self._executor, self.decode, sync_id, pickle_string, self.setup_loader.setup)
+
+    def decode(self, sync_id: int, pickle_string: bytes, setup):
+        """Decode the raw message from the data distribution, this runs in the executor."""
+
+        if not timings.enabled:
+            return self.decode_message(sync_id, pickle.loads(pickle_string), setup)
+
+        label = sync_label(sync_id)
+        start = time.perf_counter()
+        data = pickle.loads(pickle_string)
+        timings.since("unpickle", label, start)
+        start = time.perf_counter()
+        record = self.decode_message(sync_id, data, setup)
+        timings.since("decode", label, start)
 
-        if sync_id == MessageIdentifier.F_FEE_REGISTER_MAP:
+        return record
 
-            # How can we be sure the Register Map is properly synchronised with the F-FEE?
+    def decode_message(self, sync_id, data, setup):
+        """
+        Decode the message and return a record with the values of interest, or None when the message is not used.
 
-            register_map, _ = data
-            register_map = RegisterMap("F-FEE", memory_map=register_map, setup=setup)
+        The record is a tuple that starts with the kind of value, i.e. 'timecode', 'dtc_in_mod', 'deb_mode' or
+        'aeb_state'.
+        """
 
-            t0 = register_map["DEB_DTC_IN_MOD_2", "T0_IN_MOD"]
-            t1 = register_map["DEB_DTC_IN_MOD_2", "T1_IN_MOD"]
-            t2 = register_map["DEB_DTC_IN_MOD_2", "T2_IN_MOD"]
-            t3 = register_map["DEB_DTC_IN_MOD_2", "T3_IN_MOD"]
-            t4 = register_map["DEB_DTC_IN_MOD_1", "T4_IN_MOD"]
-            t5 = register_map["DEB_DTC_IN_MOD_1", "T5_IN_MOD"]
-            t6 = register_map["DEB_DTC_IN_MOD_1", "T6_IN_MOD"]
-            t7 = register_map["DEB_DTC_IN_MOD_1", "T7_IN_MOD"]
+        if (handler := self.handlers.get(sync_id)) is None:
+            return None
 
+        return handler(data, setup)
+
+    def add_handler(self, sync_id: int, handler) -> None:
+        """
+        Register a handler for the messages with the given sync identifier and subscribe to those messages.
+
+        The handler is called as `handler(data, setup)` and returns a record or None. Call this from the event loop.
+        """
+        self.handlers[sync_id] = handler
+        self.update_subscriptions()
+
+    def remove_handler(self, sync_id: int) -> None:
+        """Remove the handler for the given sync identifier and unsubscribe from those messages."""
+        self.handlers.pop(sync_id, None)
+        self.update_subscriptions()
+
+    def get_subscriptions(self) -> set:
+        """Returns the topic prefixes that are needed by the handlers and by the shared services."""
+
+        topics = {int(sync_id).to_bytes(1, byteorder='big') for sync_id in self.handlers}
+        topics.update(
+            props.get('subscribe', b'') for props in services.values() if props.get('shared', False)
+        )
+
+        return topics
+
+    def update_subscriptions(self) -> None:
+        """Bring the subscriptions of the data distribution socket in line with the handlers."""
+
+        if self._receiver is None:
+            return
+
+        topics = self.get_subscriptions()
+
+        for topic in self._subscriptions - topics:
+            self._receiver.unsubscribe(topic)
+        for topic in topics - self._subscriptions:
+            self._receiver.subscribe(topic)
+
+        self._subscriptions = topics
+
+    def apply(self, record) -> None:
+        """Gather the decoded values from the record into the current snapshot."""
+
+        if record is None:
+            return
+
+        self.state.update(*record)
+
+        kind = record[0]
+
+        if kind == "timecode":
+
+            # A new cycle starts, release what was gathered during the previous cycle.
+
+            if not self.scheduled_updates:
+                self.release_snapshot()
+            self._timecode = record[1]
+
+            if self._cycle_packets:
+                self._expected_packets = self._cycle_packets
+            self._cycle_packets = set()
+            self._cycle_complete = False
+
+            return
+
+        elif kind == "dtc_in_mod":
+
+            t0, t1, t2, t3, t4, t5, t6, t7 = self._dtc_in_mod = record[1]
             self._app.log(f"{t0=}, {t1=}, {t2=}, {t3=}, {t4=}, {t5=}, {t6=}, {t7=}")
 
-            self._app.post_message(DtcInModChanged(t0, t1, t2, t3, t4, t5, t6, t7))
-
-        elif sync_id == MessageIdentifier.SYNC_HK_DATA:
-
-            cmd, aeb_id, data, timestamp = data
-
-            if cmd == 'command_deb_read_hk':
-                hk_data = HousekeepingData("DEB", data, setup)
-                deb_mode = f_fee_mode(hk_data["STATUS", "OPER_MOD"])
-                self._app.log(f"DEB_MODE = {deb_mode.name}")
-                self._app.post_message(DebModeChanged(deb_mode))
-            elif cmd == 'command_aeb_read_hk':
-                aeb_id = aeb_id[0]  # this comes from the args, so it's a list
-                hk_data = HousekeepingData(aeb_id, data, setup)
-                aeb_status = hk_data["STATUS", "AEB_STATUS"]
-                self._app.log(f"AEB_STATE = {aeb_state(aeb_status).name}")
-
-                # Power in handled by the DEB_DTC_AEB_ONOFF state from the DEB register map above.
-
-                if aeb_status == aeb_state.OFF:
-                    self._app.post_message(AebStateChanged(f"{aeb_id.lower()}_onoff", False))
-                elif aeb_status == aeb_state.INIT:
-                    self._app.post_message(AebStateChanged(f"{aeb_id.lower()}_init", True))
-                elif aeb_status == aeb_state.POWER_UP:
-                    self._app.post_message(AebStateChanged(f"{aeb_id.lower()}_power_up", True))
-                elif aeb_status == aeb_state.POWER_DOWN:
-                    self._app.post_message(AebStateChanged(f"{aeb_id.lower()}_power_down", True))
-                elif aeb_status == aeb_state.CONFIG:
-                    self._app.post_message(AebStateChanged(f"{aeb_id.lower()}_config", True))
-                elif aeb_status == aeb_state.IMAGE:
-                    self._app.post_message(AebStateChanged(f"{aeb_id.lower()}_image", True))
-                elif aeb_status == aeb_state.PATTERN:
-                    self._app.post_message(AebStateChanged(f"{aeb_id.lower()}_pattern", True))
+        elif kind == "deb_mode":
+
+            self._deb_mode = record[1]
+            self._app.log(f"DEB_MODE = {self._deb_mode.name}")
+
+        elif kind == "aeb_state":
+
+            _, aeb_id, aeb_status = record
+            self._app.log(f"AEB_STATE = {aeb_state(aeb_status).name}")
+
+            # Power in handled by the DEB_DTC_AEB_ONOFF state from the DEB register map above.
+
+            if (state := get_aeb_state_type(aeb_id, aeb_status)) is not None:
+                self._aeb_state[aeb_id] = state
+
+        self.packet_arrived(record[:2] if kind == "aeb_state" else kind)
+
+    def packet_arrived(self, packet) -> None:
+        """
+        Keep track of the packets of the current cycle, the snapshot is released when the cycle is complete.
+
+        A cycle is complete when all the packets arrived that arrived during the previous cycle, so the Monitor
+        doesn't have to wait for the quiet period or the next timecode. The 'monitor.early_release' counter counts the
+        snapshots that were released this way.
+        """
+
+        if packet in self._cycle_packets:
+            return
+
+        self._cycle_packets.add(packet)
+
+        if not self._cycle_complete and self._expected_packets and self._cycle_packets >= self._expected_packets:
+            self._cycle_complete = True
+            if not self.scheduled_updates:
+                counters.increment("monitor.early_release")
+                self.release_snapshot()
+
+
+def set_queue_depth(name: str, n_messages: int):
+    """Keep the number of messages that were drained in one go from a receive queue."""
+    counters.set(f"{name}.queue_depth", n_messages)
+    counters.maximum(f"{name}.max_queue_depth", n_messages)
+
+
+def get_aeb_state_type(aeb_id: str, aeb_status: int):
+    """
+    Returns the (aeb_state_type, aeb_state) for the AEB State widget that matches the given AEB status.
+
+    The aeb_state_type is the identifier of the LED in the AEB State widget, e.g. 'aeb1_init'. Returns None when
+    the AEB status is not represented in the widget.
+    """
+    aeb_id = aeb_id.lower()
+
+    if aeb_status == aeb_state.OFF:
+        return f"{aeb_id}_onoff", False
+    elif aeb_status == aeb_state.INIT:
+        return f"{aeb_id}_init", True
+    elif aeb_status == aeb_state.POWER_UP:
+        return f"{aeb_id}_power_up", True
+    elif aeb_status == aeb_state.POWER_DOWN:
+        return f"{aeb_id}_power_down", True
+    elif aeb_status == aeb_state.CONFIG:
+        return f"{aeb_id}_config", True
+    elif aeb_status == aeb_state.IMAGE:
+        return f"{aeb_id}_image", True
+    elif aeb_status == aeb_state.PATTERN:
+        return f"{aeb_id}_pattern", True
+
+    return None
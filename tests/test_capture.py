@@ -0,0 +1,162 @@
+import pickle
+import time
+
+import pytest
+
+pytest.importorskip("egse.zmq")
+
+from f_fee_tui.capture import CaptureReader  # noqa: E402
+from f_fee_tui.capture import DATA_CHANNEL  # noqa: E402
+from f_fee_tui.capture import INDEX_ENTRY  # noqa: E402
+from f_fee_tui.capture import INDEX_MAGIC  # noqa: E402
+from f_fee_tui.capture import Recorder  # noqa: E402
+from f_fee_tui.capture import SYNC_TIMECODE  # noqa: E402
+from f_fee_tui.capture import find_capture_files  # noqa: E402
+from f_fee_tui.capture import read_index  # noqa: E402
+
+HK_DATA = b"\x05"
+
+
+def record_cycles(recorder: Recorder, n_cycles: int, payload_size: int = 100) -> list:
+    """Record a timecode, an HK packet and a heartbeat per cycle, returns the (channel, parts) that were recorded."""
+
+    messages = []
+    for cycle in range(n_cycles):
+        messages.append((DATA_CHANNEL, [SYNC_TIMECODE, pickle.dumps((cycle % 64, time.time()))]))
+        messages.append((DATA_CHANNEL, [HK_DATA, bytes([cycle % 256]) * payload_size]))
+        messages.append((1, [b"heartbeat"]))
+
+    for channel, parts in messages:
+        recorder.record(channel, parts)
+
+    return messages
+
+
+def test_capture_round_trip(tmp_path):
+
+    recorder = Recorder(str(tmp_path / "run"), ["data", "cm_cs"])
+    recorder.start()
+    messages = record_cycles(recorder, 10)
+    recorder.close()
+
+    assert find_capture_files(str(tmp_path / "run")) == [str(tmp_path / "run-0001.ffcap")]
+
+    reader = CaptureReader(str(tmp_path / "run-0001.ffcap"))
+    try:
+        assert reader.channels == ["data", "cm_cs"]
+        assert reader.metadata["first_cycle"] == 0
+
+        records = list(reader.records())
+        assert [(channel, parts) for _, _, channel, parts in records] == messages
+
+        timestamps = [timestamp for _, timestamp, _, _ in records]
+        assert timestamps == sorted(timestamps)
+
+        # One index entry per timecode, pointing at the timecode record.
+
+        assert [(cycle, timecode) for cycle, timecode, _, _ in reader.index] == [(cycle, cycle) for cycle in range(10)]
+        offsets = {offset: parts for offset, _, _, parts in records}
+        for cycle, _, offset, _ in reader.index:
+            assert offsets[offset][0] == SYNC_TIMECODE
+            assert reader.offset_of_cycle(cycle) == offset
+    finally:
+        reader.close()
+
+
+def test_seek_to_a_cycle(tmp_path):
+
+    recorder = Recorder(str(tmp_path / "run"), ["data", "cm_cs"])
+    recorder.start()
+    messages = record_cycles(recorder, 10)
+    recorder.close()
+
+    reader = CaptureReader(str(tmp_path / "run-0001.ffcap"))
+    try:
+        records = list(reader.records(reader.offset_of_cycle(7)))
+        assert [parts for _, _, _, parts in records] == [parts for _, parts in messages[7 * 3:]]
+
+        assert reader.has_cycle(9) and not reader.has_cycle(10)
+        assert list(reader.records(reader.offset_of_cycle(10))) == []
+    finally:
+        reader.close()
+
+
+def test_recording_rolls_over_at_a_cycle_boundary(tmp_path):
+
+    recorder = Recorder(str(tmp_path / "run"), ["data", "cm_cs"], max_bytes=1000)
+    recorder.start()
+    messages = record_cycles(recorder, 10, payload_size=400)
+    recorder.close()
+
+    filenames = find_capture_files(str(tmp_path / "run"))
+    assert len(filenames) > 1
+
+    recorded = []
+    first_cycles = []
+    for filename in filenames:
+        reader = CaptureReader(filename)
+        try:
+            first_cycles.append(reader.metadata["first_cycle"])
+            records = list(reader.records())
+            assert records[0][3][0] == SYNC_TIMECODE, "every file starts with a timecode"
+            assert reader.index[0][0] == reader.metadata["first_cycle"]
+            recorded.extend((channel, parts) for _, _, channel, parts in records)
+        finally:
+            reader.close()
+
+    assert recorded == messages
+    assert first_cycles == sorted(first_cycles) and first_cycles[0] == 0
+
+
+def test_incomplete_records_and_index_entries_are_ignored(tmp_path):
+
+    recorder = Recorder(str(tmp_path / "run"), ["data"])
+    recorder.start()
+    record_cycles(recorder, 3)
+    recorder.close()
+
+    capture = tmp_path / "run-0001.ffcap"
+    index = tmp_path / "run-0001.ffidx"
+
+    # A recording that is still being written ends with a partial record and index entry.
+
+    capture.write_bytes(capture.read_bytes()[:-5])
+    index.write_bytes(index.read_bytes() + b"\x00" * (INDEX_ENTRY.size - 1))
+
+    assert len(read_index(str(index))) == 3
+
+    reader = CaptureReader(str(capture))
+    try:
+        assert len(list(reader.records())) == 3 * 3 - 1
+    finally:
+        reader.close()
+
+
+def test_read_index_rejects_other_files(tmp_path):
+
+    index = tmp_path / "run-0001.ffidx"
+    index.write_bytes(b"NOTANIDX" + INDEX_MAGIC)
+
+    with pytest.raises(ValueError):
+        read_index(str(index))
+
+    assert read_index(str(tmp_path / "missing.ffidx")) == []
+
+
+def test_close_does_not_block_when_the_writer_stopped(tmp_path):
+
+    recorder = Recorder(str(tmp_path / "run"), ["data"], max_queued=10)
+    recorder.start()
+
+    # Stop the writer as if the disk were full, then fill the queue.
+
+    recorder._queue.put(None)
+    recorder._thread.join(2.0)
+
+    for _ in range(20):
+        recorder.record(DATA_CHANNEL, [HK_DATA, b"x"])
+
+    start = time.monotonic()
+    recorder.close(timeout=0.5)
+
+    assert time.monotonic() - start < 0.5
@@ -0,0 +1,87 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("egse.fee.ffee")
+
+from f_fee_tui import workers  # noqa: E402
+from f_fee_tui.scheduler import CommandScheduler  # noqa: E402
+from f_fee_tui.workers import CommandRequest  # noqa: E402
+from f_fee_tui.workers import CommandWorker  # noqa: E402
+from f_fee_tui.workers import Commander  # noqa: E402
+
+
+class BlockingProxy:
+    """A proxy whose commands block until `release` is set."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __getattr__(self, name: str):
+        def command(*args, **kwargs):
+            self.started.set()
+            self.release.wait(5.0)
+            return name
+        return command
+
+
+class StubPool:
+
+    proxy = BlockingProxy()
+
+    def __init__(self, target: str):
+        self.target = target
+
+    def acquire(self, timeout: float = None, canceled: threading.Event = None):
+        return self.proxy
+
+    def release(self, proxy, healthy: bool = True):
+        pass
+
+    def probe(self, proxy) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+
+APP = SimpleNamespace(post_message=lambda message: None)
+
+
+def test_a_canceled_worker_cancels_the_command_it_took():
+
+    scheduler = CommandScheduler()
+    worker = CommandWorker(APP, scheduler, StubPool("DPU"))
+
+    future = scheduler.submit(CommandRequest("DPU", "deb_set_on_mode", [], {}))
+
+    worker.cancel()
+    worker.start()
+    worker.join(2.0)
+
+    assert not worker.is_alive()
+    assert future.cancelled()
+
+
+def test_shutdown_resolves_every_pending_command(monkeypatch):
+
+    proxy = StubPool.proxy = BlockingProxy()
+    monkeypatch.setattr(workers, "ProxyPool", StubPool)
+
+    commander = Commander(APP)
+
+    running = commander.submit("DPU", "deb_set_standby_mode")
+    assert proxy.started.wait(2.0)
+    queued = [commander.submit("DPU", "aeb_set_init_mode", [aeb_id]) for aeb_id in ("AEB1", "AEB2")]
+
+    commander.shutdown(timeout=0.1)
+
+    assert all(future.cancelled() for future in queued)
+    assert commander.submit("DPU", "deb_set_on_mode").cancelled()
+
+    # The command that was executing finishes normally.
+
+    proxy.release.set()
+    assert running.result(timeout=2.0).result == "deb_set_standby_mode"
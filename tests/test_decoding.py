@@ -0,0 +1,142 @@
+import random
+
+import pytest
+
+from f_fee_tui.decoding import FieldExtractor
+from f_fee_tui.decoding import RegisterMapDecoder
+from f_fee_tui.decoding import compile_fields
+from f_fee_tui.decoding import find_units
+from f_fee_tui.metrics import counters
+
+
+def decode(raw: bytes) -> tuple:
+    """Three fields: 6 bits over two bytes (big endian), 2 bits in one byte, the top nibble of a little endian word."""
+    return (
+        (int.from_bytes(raw[8:10], 'big') >> 6) & 0x3F,
+        raw[20] & 0x03,
+        int.from_bytes(raw[12:16], 'little') >> 28,
+    )
+
+
+def random_bytes(size: int, seed: int) -> bytes:
+    return bytes(random.Random(seed).getrandbits(8) for _ in range(size))
+
+
+def test_find_units():
+
+    assert find_units(decode, bytes(32), 1) == {8, 9, 15, 20}
+    assert find_units(decode, bytes(32), 4) == {2, 3, 5}
+
+
+def test_compile_fields():
+
+    raw = random_bytes(32, 1)
+    extractor = compile_fields(decode, raw, find_units(decode, raw, 1), 1)
+
+    assert extractor is not None
+    assert extractor.size == 32
+
+    for seed in range(100):
+        probe = random_bytes(32, seed)
+        assert extractor.extract(probe) == decode(probe)
+
+
+def test_compile_fields_rejects_what_is_not_a_bit_field():
+
+    def scaled(raw):
+        return (raw[3] * 3,)
+
+    raw = bytes(range(1, 33))
+
+    assert compile_fields(scaled, raw, find_units(scaled, raw, 1), 1) is None
+
+
+def test_insert_is_the_inverse_of_extract():
+
+    raw = random_bytes(32, 2)
+    extractor = compile_fields(decode, raw, find_units(decode, raw, 1), 1)
+
+    probe = bytearray(random_bytes(32, 3))
+    extractor.insert(probe, (0x2A, 0x01, 0x0F))
+
+    assert extractor.extract(bytes(probe)) == (0x2A, 0x01, 0x0F)
+    assert decode(bytes(probe)) == (0x2A, 0x01, 0x0F)
+
+
+def test_vectorized_extraction_matches_the_plain_extraction():
+
+    pytest.importorskip("numpy")
+
+    raw = random_bytes(32, 4)
+    table = compile_fields(decode, raw, find_units(decode, raw, 1), 1).table * 3
+
+    vectorized = FieldExtractor(table, 32)
+    plain = FieldExtractor(table[:2], 32)
+
+    assert vectorized._vectorized and not plain._vectorized
+
+    for seed in range(20):
+        probe = random_bytes(32, seed)
+        assert vectorized.extract(probe) == decode(probe) * 3
+        assert plain.extract(probe) == decode(probe)[:2]
+
+
+class WordDecoder(RegisterMapDecoder):
+    """Decodes the low byte of word 2 and bit 31 of word 6 from the memory map, without the egse RegisterMap."""
+
+    def __init__(self):
+        super().__init__(fields=(), setup=None)
+        self.n_decoded = 0
+
+    def _decode(self, memory_map) -> tuple:
+        self.n_decoded += 1
+        return memory_map[8], memory_map[27] >> 7
+
+
+def test_register_map_decoder_skips_unchanged_words():
+
+    decoder = WordDecoder()
+    raw = bytearray(32)
+
+    assert decoder.decode(bytes(raw)) == (0, 0)
+    assert decoder.words == {2, 6}
+
+    n_decoded = decoder.n_decoded
+    hits = counters["register_map.hit"]
+
+    raw[20] = 0xFF  # word 5 doesn't hold any of the fields
+    assert decoder.decode(bytes(raw)) == (0, 0)
+    assert counters["register_map.hit"] == hits + 1
+
+    raw[8] = 0x42
+    raw[27] = 0x80
+    assert decoder.decode(bytes(raw)) == (0x42, 1)
+
+    assert decoder.n_decoded == n_decoded, "the changed words shall be decoded by the extractor"
+
+
+def test_register_map_decoder_searches_the_words_only_once():
+
+    decoder = WordDecoder()
+    searches = []
+    find_words = decoder._find_words
+
+    def counting_find_words(raw, memory_map):
+        searches.append(raw)
+        return find_words(raw, memory_map)
+
+    decoder._find_words = counting_find_words
+
+    no_words = counters["register_map.no_words"]
+
+    # The words can't be found in a memory map that is not a whole number of words.
+
+    raw = bytearray(30)
+
+    for value in range(5):
+        raw[8] = value
+        assert decoder.decode(bytes(raw)) == (value, 0)
+
+    assert len(searches) == 1
+    assert decoder.words is None
+    assert counters["register_map.no_words"] == no_words + 1
@@ -0,0 +1,78 @@
+from f_fee_tui.metrics import Counters
+from f_fee_tui.metrics import Histogram
+from f_fee_tui.metrics import Timings
+
+
+def test_take_resets_the_counters():
+
+    process = Counters()
+    process.increment("hk.extracted", 3)
+    process.set("decoder.in_flight", 2)
+    process.maximum("decoder.max_in_flight", 4)
+
+    counts, gauges = process.take()
+
+    assert counts == {"hk.extracted": 3}
+    assert gauges == {"decoder.in_flight": ("set", 2), "decoder.max_in_flight": ("maximum", 4)}
+    assert process.take() == ({}, {})
+
+
+def test_merging_adds_counters_but_not_gauges():
+
+    app = Counters()
+    app.increment("hk.extracted", 1)
+
+    processes = [Counters() for _ in range(4)]
+    for idx, process in enumerate(processes):
+        process.increment("hk.extracted", 2)
+        process.set("decoder.in_flight", 3)
+        process.maximum("decoder.max_in_flight", idx + 1)
+
+    for process in processes:
+        app.merge(*process.take())
+
+    assert app["hk.extracted"] == 9
+    assert app["decoder.in_flight"] == 3, "a gauge takes the last value, it's not multiplied by the processes"
+    assert app["decoder.max_in_flight"] == 4
+
+    # A lower maximum doesn't replace the maximum, a later value replaces the last value.
+
+    process = processes[0]
+    process.set("decoder.in_flight", 1)
+    process.maximum("decoder.max_in_flight", 2)
+    app.merge(*process.take())
+
+    assert app["decoder.in_flight"] == 1
+    assert app["decoder.max_in_flight"] == 4
+
+
+def test_merging_timings():
+
+    app = Timings()
+    app.record("decode", "SYNC_HK_DATA", 0.001)
+
+    process = Timings()
+    process.record("decode", "SYNC_HK_DATA", 0.003)
+    process.record("unpickle", "SYNC_HK_DATA", 0.002)
+
+    app.merge(process.take())
+
+    summary = app.summary()
+    assert summary[("decode", "SYNC_HK_DATA")]["count"] == 2
+    assert summary[("decode", "SYNC_HK_DATA")]["max_ms"] == 3.0
+    assert summary[("unpickle", "SYNC_HK_DATA")]["count"] == 1
+    assert process.summary() == {}
+
+
+def test_histogram_merge():
+
+    first, second = Histogram(), Histogram()
+    for duration in (0.001, 0.002):
+        first.add(duration)
+    second.add(0.004)
+
+    first.merge(second)
+
+    assert first.count == 3
+    assert first.max == 0.004
+    assert sum(first.buckets) == 3
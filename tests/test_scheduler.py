@@ -0,0 +1,90 @@
+import time
+from types import SimpleNamespace
+
+from f_fee_tui.scheduler import CommandScheduler
+from f_fee_tui.scheduler import Priority
+
+
+def request(command: str, *args, priority: Priority = Priority.NORMAL, target: str = "DPU"):
+    """A stand-in for a CommandRequest, with the attributes that the scheduler uses."""
+    return SimpleNamespace(
+        target=target, command=command, args=list(args), kwargs={}, priority=priority, enqueued=time.monotonic()
+    )
+
+
+def drain(scheduler: CommandScheduler) -> list:
+    commands = []
+    while (item := scheduler.get(timeout=0)) is not None:
+        commands.append(item[1].command)
+    return commands
+
+
+def test_commands_are_dispatched_by_priority_then_in_order():
+
+    scheduler = CommandScheduler()
+
+    scheduler.submit(request("deb_set_standby_mode"))
+    scheduler.submit(request("aeb_set_init_mode", "AEB1", priority=Priority.HIGH))
+    scheduler.submit(request("deb_set_on_mode"))
+    scheduler.submit(request("deb_set_aeb_power_off", True, True, True, True, priority=Priority.EMERGENCY))
+    scheduler.submit(request("aeb_set_config_mode", "AEB1", priority=Priority.HIGH))
+
+    assert drain(scheduler) == [
+        "deb_set_aeb_power_off", "aeb_set_init_mode", "aeb_set_config_mode", "deb_set_standby_mode", "deb_set_on_mode"
+    ]
+
+
+def test_identical_commands_are_coalesced():
+
+    scheduler = CommandScheduler()
+
+    first = scheduler.submit(request("aeb_set_init_mode", "AEB1"))
+
+    assert scheduler.submit(request("aeb_set_init_mode", "AEB1")) is first
+    assert scheduler.submit(request("aeb_set_init_mode", "AEB2")) is not first
+    assert scheduler.submit(request("aeb_set_init_mode", "AEB1", priority=Priority.HIGH)) is not first
+    assert len(scheduler) == 3
+
+
+def test_a_dispatched_command_is_not_coalesced():
+
+    scheduler = CommandScheduler()
+
+    first = scheduler.submit(request("deb_set_on_mode"))
+    scheduler.get(timeout=0)
+
+    assert scheduler.submit(request("deb_set_on_mode")) is not first
+
+
+def test_immediate_on_drops_the_mode_changes_the_fpga_defaults_and_powering_on():
+
+    scheduler = CommandScheduler()
+
+    obsolete = [
+        scheduler.submit(request("deb_set_standby_mode")),
+        scheduler.submit(request("deb_set_windowing_mode")),
+        scheduler.submit(request("aeb_set_image_mode", "AEB3")),
+        scheduler.submit(request("set_fpga_defaults")),
+        scheduler.submit(request("deb_set_aeb_power_on", True, False, False, False)),
+    ]
+    power_off = scheduler.submit(request("deb_set_aeb_power_off", True, True, True, True))
+
+    immediate_on = scheduler.submit(request("deb_set_immediate_on", priority=Priority.EMERGENCY))
+
+    assert all(future.cancelled() for future in obsolete)
+    assert not power_off.cancelled()
+    assert not immediate_on.cancelled()
+
+    assert drain(scheduler) == ["deb_set_immediate_on", "deb_set_aeb_power_off"]
+
+
+def test_a_closed_scheduler_refuses_commands():
+
+    scheduler = CommandScheduler()
+
+    queued = scheduler.submit(request("deb_set_on_mode"))
+    scheduler.close()
+
+    assert queued.cancelled()
+    assert scheduler.get(timeout=0) is None
+    assert scheduler.submit(request("deb_set_on_mode")).cancelled()
@@ -0,0 +1,15 @@
+import pytest
+
+pytest.importorskip("egse.fee.ffee")
+
+from f_fee_tui.sequences import HK_CYCLE  # noqa: E402
+from f_fee_tui.sequences import immediate_on_sequence  # noqa: E402
+from f_fee_tui.sequences import set_fpga_defaults_sequence  # noqa: E402
+
+
+@pytest.mark.parametrize("sequence", [immediate_on_sequence(), set_fpga_defaults_sequence()], ids=lambda s: s.name)
+def test_confirmed_steps_wait_at_least_two_hk_cycles(sequence):
+
+    for step in sequence.steps:
+        if step.condition is not None or step.cycles:
+            assert step.timeout >= 2 * HK_CYCLE, step.description
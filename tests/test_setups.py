@@ -0,0 +1,103 @@
+import sys
+import time
+import types
+
+import pytest
+
+from f_fee_tui.setups import SetupLoader
+from f_fee_tui.setups import read_cached_setup
+
+
+class FakeSetup:
+
+    def __init__(self, setup_id: str):
+        self.setup_id = setup_id
+
+    def get_id(self):
+        return self.setup_id
+
+
+@pytest.fixture
+def configuration_manager(monkeypatch):
+    """Replaces `egse.setup.load_setup`, the configuration manager fails while `reachable` is False."""
+
+    manager = types.SimpleNamespace(reachable=False, setup=FakeSetup("42"), calls=0)
+
+    def load_setup():
+        manager.calls += 1
+        if not manager.reachable:
+            raise ConnectionError("The configuration manager is not reachable.")
+        return manager.setup
+
+    if "egse" not in sys.modules:
+        monkeypatch.setitem(sys.modules, "egse", types.ModuleType("egse"))
+    monkeypatch.setitem(sys.modules, "egse.setup", types.SimpleNamespace(load_setup=load_setup))
+
+    return manager
+
+
+def wait_until(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_load_returns_none_without_a_setup(configuration_manager, tmp_path):
+
+    loader = SetupLoader(directory=tmp_path)
+
+    assert loader.load() is None
+    assert loader.status == "No Setup"
+    assert not loader.confirmed
+
+
+def test_the_setup_is_published_when_the_configuration_manager_is_back(configuration_manager, tmp_path):
+
+    loader = SetupLoader(directory=tmp_path, retry_interval=0.01, max_retry_interval=0.05)
+
+    try:
+        assert loader.start().result(timeout=2.0) is None
+        assert loader.status == "No Setup"
+
+        assert wait_until(lambda: configuration_manager.calls >= 3), "the loader shall retry"
+        assert loader.setup is None
+
+        configuration_manager.reachable = True
+
+        assert wait_until(lambda: loader.confirmed)
+        assert loader.setup is configuration_manager.setup
+        assert loader.status == "Setup 42"
+        assert read_cached_setup(tmp_path).get_id() == "42"
+
+        # No more retries once the Setup is confirmed.
+
+        calls = configuration_manager.calls
+        time.sleep(0.1)
+        assert configuration_manager.calls == calls
+    finally:
+        loader.stop()
+
+
+def test_a_cached_setup_is_replaced_when_the_configuration_manager_is_back(configuration_manager, tmp_path):
+
+    configuration_manager.reachable = True
+    SetupLoader(directory=tmp_path).load()
+
+    configuration_manager.reachable = False
+    configuration_manager.setup = FakeSetup("43")
+
+    loader = SetupLoader(directory=tmp_path, retry_interval=0.01, max_retry_interval=0.05)
+
+    try:
+        assert loader.start().result(timeout=2.0).get_id() == "42"
+        assert wait_until(lambda: "not reachable" in loader.status)
+
+        configuration_manager.reachable = True
+
+        assert wait_until(lambda: loader.confirmed)
+        assert loader.setup.get_id() == "43"
+    finally:
+        loader.stop()
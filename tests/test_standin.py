@@ -0,0 +1,38 @@
+import json
+import pickle
+
+import pytest
+
+pytest.importorskip("egse.fee.ffee")
+
+from f_fee_tui.standin import error_reply  # noqa: E402
+from f_fee_tui.standin import parse_request  # noqa: E402
+
+
+def test_parse_request():
+
+    message = json.dumps({"command": "aeb_set_init_mode", "args": ["AEB1"], "kwargs": {}}).encode()
+
+    assert parse_request(message) == ("aeb_set_init_mode", ["AEB1"], {})
+    assert parse_request(b'{"command": "ping"}') == ("ping", [], {})
+
+
+@pytest.mark.parametrize("message", [
+    pickle.dumps(("deb_set_on_mode", [], {})),
+    b"not json",
+    b'{"args": []}',
+    b'{"command": 1}',
+    b'{"command": "ping", "args": {}}',
+    b'["ping", [], {}]',
+])
+def test_invalid_requests_are_rejected(message):
+
+    with pytest.raises(ValueError):
+        parse_request(message)
+
+
+def test_error_reply():
+
+    assert error_reply(AttributeError("No such command")) == {
+        "status": "error", "error": "AttributeError", "message": "No such command"
+    }
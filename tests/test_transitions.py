@@ -0,0 +1,76 @@
+import pytest
+
+ffee = pytest.importorskip("egse.fee.ffee")
+
+from f_fee_tui.transitions import AEB_STATE_COMMANDS  # noqa: E402
+from f_fee_tui.transitions import DEB_MODE_COMMANDS  # noqa: E402
+from f_fee_tui.transitions import DEB_TRANSITIONS  # noqa: E402
+from f_fee_tui.transitions import aeb_state_route  # noqa: E402
+from f_fee_tui.transitions import deb_mode_route  # noqa: E402
+from f_fee_tui.transitions import find_route  # noqa: E402
+
+aeb_state = ffee.aeb_state
+f_fee_mode = ffee.f_fee_mode
+
+
+@pytest.mark.parametrize("current, target, route", [
+    (f_fee_mode.ON_MODE, f_fee_mode.ON_MODE, []),
+    (f_fee_mode.ON_MODE, f_fee_mode.STANDBY_MODE, [f_fee_mode.STANDBY_MODE]),
+    (f_fee_mode.ON_MODE, f_fee_mode.FULL_IMAGE_MODE, [f_fee_mode.STANDBY_MODE, f_fee_mode.FULL_IMAGE_MODE]),
+    (f_fee_mode.ON_MODE, f_fee_mode.WINDOWING_MODE, [f_fee_mode.STANDBY_MODE, f_fee_mode.WINDOWING_MODE]),
+    (f_fee_mode.ON_MODE, f_fee_mode.WINDOWING_PATTERN_MODE, [f_fee_mode.WINDOWING_PATTERN_MODE]),
+    (f_fee_mode.FULL_IMAGE_MODE, f_fee_mode.ON_MODE, [f_fee_mode.STANDBY_MODE, f_fee_mode.ON_MODE]),
+    (
+        f_fee_mode.FULL_IMAGE_MODE, f_fee_mode.FULL_IMAGE_PATTERN_MODE,
+        [f_fee_mode.STANDBY_MODE, f_fee_mode.ON_MODE, f_fee_mode.FULL_IMAGE_PATTERN_MODE]
+    ),
+    (
+        f_fee_mode.WINDOWING_MODE, f_fee_mode.FULL_IMAGE_MODE,
+        [f_fee_mode.STANDBY_MODE, f_fee_mode.FULL_IMAGE_MODE]
+    ),
+    (
+        f_fee_mode.WINDOWING_PATTERN_MODE, f_fee_mode.STANDBY_MODE,
+        [f_fee_mode.ON_MODE, f_fee_mode.STANDBY_MODE]
+    ),
+])
+def test_deb_mode_route(current, target, route):
+    assert deb_mode_route(current, target) == route
+
+
+def test_every_deb_mode_reaches_every_other_deb_mode():
+
+    for current in DEB_TRANSITIONS:
+        for target in DEB_TRANSITIONS:
+            assert deb_mode_route(current, target) is not None, f"{current.name} -> {target.name}"
+
+
+def test_the_routes_between_the_commanded_modes_can_be_commanded():
+
+    for current in DEB_MODE_COMMANDS:
+        for target in DEB_MODE_COMMANDS:
+            assert all(mode in DEB_MODE_COMMANDS for mode in deb_mode_route(current, target))
+
+
+@pytest.mark.parametrize("current, target, route", [
+    (aeb_state.INIT, aeb_state.INIT, []),
+    (aeb_state.INIT, aeb_state.CONFIG, [aeb_state.CONFIG]),
+    (aeb_state.INIT, aeb_state.IMAGE, [aeb_state.CONFIG, aeb_state.IMAGE]),
+    (aeb_state.IMAGE, aeb_state.INIT, [aeb_state.INIT]),
+    (aeb_state.PATTERN, aeb_state.IMAGE, [aeb_state.CONFIG, aeb_state.IMAGE]),
+])
+def test_aeb_state_route(current, target, route):
+    assert aeb_state_route(current, target) == route
+    assert all(state in AEB_STATE_COMMANDS for state in route)
+
+
+@pytest.mark.parametrize("current", [aeb_state.OFF, aeb_state.POWER_UP, aeb_state.POWER_DOWN])
+def test_an_aeb_that_is_not_powered_on_can_not_be_commanded(current):
+    assert aeb_state_route(current, aeb_state.INIT) is None
+
+
+def test_find_route_returns_none_for_an_unreachable_state():
+
+    transitions = {"A": ("B",), "B": ("A",), "C": ("A",)}
+
+    assert find_route(transitions, "A", "C") is None
+    assert find_route(transitions, "C", "B") == ["A", "B"]